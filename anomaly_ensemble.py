@@ -0,0 +1,180 @@
+"""
+Ensemble anomaly scoring: Z-Score, Isolation Forest and LSTM autoencoder in one pass.
+- Shared features are computed once (returns, zscore_engine z-score,
+  filled Close/Volume matrix); the LSTM scales the shared close array with
+  its registry scaler instead of re-reading the frame
+- Detectors run against those features, optionally in parallel threads
+  (sklearn and TensorFlow release the GIL in their inner loops)
+- Per-detector scores are normalized so 1.0 is each detector's own threshold;
+  the ensemble score is their mean and the vote counts detectors that fired
+- Per-stage timings are returned with the results
+- Models come from the registry under the same provenance rule as the single
+  detectors: without a ticker, data the registry has not seen is refit, and a
+  reused Isolation Forest is refit when its flags drift (RetrainPolicy.flags_drifted)
+CLI (regenerates models/all_anomalies_combined.csv):
+    python anomaly_ensemble.py --out models/all_anomalies_combined.csv
+"""
+
+import time
+import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from instrumentation import instrument
+from model_registry import get_registry, DEFAULT_POLICY
+from zscore_engine import rolling_zscore_matrix
+from utils import (ISO_FEATURES, LSTM_PARAMS, iso_params, iso_drifted, fit_isolation_forest, fit_lstm_autoencoder,
+                   create_sequences, lstm_reconstruction_errors)
+
+DETECTORS = ("zscore", "isolation", "lstm")
+FLAG_COLUMNS = {"zscore": "anomaly_zscore", "isolation": "anomaly_iso", "lstm": "anomaly_lstm"}
+
+SharedFeatures = namedtuple("SharedFeatures", ["close", "returns", "z_score", "iso_frame"])
+DetectorResult = namedtuple("DetectorResult", ["flags", "score", "seconds"])
+
+
+def compute_features(df, window=30, extra_features=()):
+    close = df['Close'].to_numpy(dtype='float64')
+    # Same engine as utils.detect_anomalies_zscore, so both paths give identical z-scores
+    z, _ = rolling_zscore_matrix(close, window)
+    returns = np.empty_like(close)
+    returns[:1] = np.nan
+    returns[1:] = close[1:] / close[:-1] - 1.0
+    return SharedFeatures(
+        close=close,
+        returns=returns,
+        z_score=z,
+        iso_frame=df[ISO_FEATURES + list(extra_features)].bfill(),
+    )
+
+
+# === Detectors on shared features ===
+def _run_zscore(df, features, ticker, registry, policy, threshold):
+    with np.errstate(invalid="ignore"):
+        flags = (np.abs(features.z_score) > threshold).astype(int)
+    return flags, np.abs(features.z_score) / threshold
+
+
+def _run_isolation(df, features, ticker, registry, policy, threshold):
+    # extra columns in the shared frame (e.g. sentiment) become extra Isolation Forest inputs
+    params = iso_params(list(features.iso_frame.columns[len(ISO_FEATURES):]))
+    columns = list(features.iso_frame.columns)
+    entry = registry.get_or_fit("isolation_forest", ticker, params, df, fit_isolation_forest, policy, columns=columns)
+    scores = entry.artifacts["model"].score_samples(features.iso_frame)
+    if iso_drifted(features.iso_frame, scores < entry.artifacts["model"].offset_, entry.meta, policy):
+        entry = registry.fit("isolation_forest", ticker, params, df, fit_isolation_forest, columns)
+        scores = entry.artifacts["model"].score_samples(features.iso_frame)
+    iso = entry.artifacts["model"]
+    # score_samples < offset_ is exactly predict() == -1; normalize so the boundary is 1.0
+    return (scores < iso.offset_).astype(int), scores / iso.offset_
+
+
+def _lstm_errors(entry, features, window):
+    scaler = entry.artifacts["scaler"]
+    # MinMaxScaler.transform without a DataFrame round trip
+    scaled = (features.close * scaler.scale_[0] + scaler.min_[0]).astype('float32')
+    return lstm_reconstruction_errors(entry.artifacts["model"], create_sequences(scaled, window))
+
+
+def _run_lstm(df, features, ticker, registry, policy, threshold):
+    window = LSTM_PARAMS["window"]
+    entry = registry.get_or_fit("lstm_autoencoder", ticker, LSTM_PARAMS, df, fit_lstm_autoencoder, policy)
+    mse = _lstm_errors(entry, features, window)
+    if policy.has_drifted(entry.meta, mse.mean()):
+        entry = registry.fit("lstm_autoencoder", ticker, LSTM_PARAMS, df, fit_lstm_autoencoder)
+        mse = _lstm_errors(entry, features, window)
+    cutoff = np.percentile(mse, 95)
+    flags = np.zeros(len(df), dtype=int)
+    score = np.full(len(df), np.nan)
+    flags[window:] = (mse > cutoff).astype(int)
+    score[window:] = mse / cutoff if cutoff > 0 else 0.0
+    return flags, score
+
+
+RUNNERS = {"zscore": _run_zscore, "isolation": _run_isolation, "lstm": _run_lstm}
+
+
+def _timed(name, df, features, ticker, registry, policy, threshold):
+    start = time.perf_counter()
+    flags, score = RUNNERS[name](df, features, ticker, registry, policy, threshold)
+    return DetectorResult(flags, score, time.perf_counter() - start)
+
+
+@instrument()
+def detect_anomalies_ensemble(df, detectors=DETECTORS, ticker=None, window=30, threshold=3.0,
+                              min_votes=2, parallel=True, registry=None, policy=None, extra_features=()):
+    """
+    Parameters:
+        detectors: subset of ("zscore", "isolation", "lstm")
+        min_votes: detectors that must agree for anomaly_ensemble = 1
+        parallel: run detectors in a thread pool
+        extra_features: df columns added to the Isolation Forest inputs, e.g.
+                        sentiment_features.SENTIMENT_COLUMNS after join_sentiment
+    Returns:
+        (df with per-detector flags/scores and ensemble_score / ensemble_votes /
+         anomaly_ensemble columns, timings dict in seconds)
+    """
+    registry = registry or get_registry()
+    policy = policy or DEFAULT_POLICY
+    timings = {}
+    total_start = time.perf_counter()
+
+    start = time.perf_counter()
+    features = compute_features(df, window, extra_features)
+    timings["features"] = time.perf_counter() - start
+
+    args = (df, features, ticker, registry, policy, threshold)
+    if parallel and len(detectors) > 1:
+        with ThreadPoolExecutor(max_workers=len(detectors)) as pool:
+            futures = {name: pool.submit(_timed, name, *args) for name in detectors}
+            results = {name: f.result() for name, f in futures.items()}
+    else:
+        results = {name: _timed(name, *args) for name in detectors}
+
+    start = time.perf_counter()
+    df['returns'] = features.returns
+    df['z_score'] = features.z_score
+    for name, result in results.items():
+        df[FLAG_COLUMNS[name]] = result.flags
+        df[f"score_{name}"] = result.score
+        timings[name] = result.seconds
+    scores = np.column_stack([results[name].score for name in detectors])
+    with np.errstate(invalid="ignore"):
+        valid = ~np.isnan(scores)
+        df['ensemble_score'] = np.where(valid.any(axis=1), np.nansum(scores, axis=1) / np.maximum(valid.sum(axis=1), 1), np.nan)
+    df['ensemble_votes'] = np.sum([results[name].flags for name in detectors], axis=0)
+    df['anomaly_ensemble'] = (df['ensemble_votes'] >= min(min_votes, len(detectors))).astype(int)
+    timings["combine"] = time.perf_counter() - start
+    timings["total"] = time.perf_counter() - total_start
+    return df, timings
+
+
+if __name__ == "__main__":
+    from data_loader import load_data
+
+    parser = argparse.ArgumentParser(description="Ensemble anomaly scoring.")
+    parser.add_argument("--csv", default=None, help="price CSV (default: bundled GOOG data)")
+    parser.add_argument("--detectors", default=",".join(DETECTORS))
+    parser.add_argument("--min-votes", type=int, default=2)
+    parser.add_argument("--sequential", action="store_true")
+    parser.add_argument("--out", default=None, help="e.g. models/all_anomalies_combined.csv")
+    parser.add_argument("--sentiment", default=None, metavar="TICKER",
+                        help="add this ticker's news sentiment features (sentiment_features.py) to the Isolation Forest")
+    args = parser.parse_args()
+
+    df, extra = load_data(args.csv), ()
+    if args.sentiment:
+        from sentiment_features import join_sentiment, SENTIMENT_COLUMNS
+        df, extra = join_sentiment(df, args.sentiment), SENTIMENT_COLUMNS
+    result, timings = detect_anomalies_ensemble(df, tuple(args.detectors.split(",")), min_votes=args.min_votes,
+                                                parallel=not args.sequential, extra_features=extra)
+    for stage, seconds in timings.items():
+        print(f"{stage:10s} {seconds * 1e3:9.1f} ms")
+    print(result[[c for c in FLAG_COLUMNS.values() if c in result] + ['anomaly_ensemble']].sum().to_string())
+    if args.out:
+        columns = ['Close', 'Volume'] + [c for c in FLAG_COLUMNS.values() if c in result] + \
+                  ['ensemble_score', 'ensemble_votes', 'anomaly_ensemble']
+        result[columns].to_csv(args.out)
+        print(f"saved {args.out}")
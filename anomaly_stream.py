@@ -0,0 +1,387 @@
+"""
+Streaming anomaly detection over a live feed of OHLCV bars.
+- Rolling z-score per ticker (zscore_engine.StreamingZScore, O(1) per bar)
+- Isolation Forest and LSTM autoencoder models pre-fitted in the model
+  registry, scored in per-ticker micro-batches
+- The Isolation Forest is drift-checked every `iso_check_every` bars (flag rate vs
+  contamination, bars outside the training range; RetrainPolicy.flags_drifted) and
+  refit on the last `iso_refit_window` bars when the policy trips
+- Alerts go to a callback and/or a queue
+- End-to-end latency (bar received -> alert published) and throughput metrics
+Sources: CSV replay, a growing CSV file (tail), newline-delimited JSON over a socket.
+Replay harness:
+    python anomaly_stream.py replay --detectors zscore,isolation --check
+"""
+
+import json
+import time
+import queue
+import socket
+import argparse
+import threading
+from collections import namedtuple, deque, defaultdict
+
+import numpy as np
+import pandas as pd
+
+from zscore_engine import StreamingZScore
+from model_registry import get_registry, DEFAULT_POLICY
+from utils import (ISO_PARAMS, ISO_FEATURES, LSTM_PARAMS, fit_isolation_forest, fit_lstm_autoencoder,
+                   iso_drifted, lstm_reconstruction_errors, detect_anomalies_zscore)
+
+DETECTORS = ("zscore", "isolation", "lstm")
+ISO_REFIT_WINDOW = 500
+ISO_CHECK_EVERY = 50
+
+Bar = namedtuple("Bar", ["ticker", "timestamp", "open", "high", "low", "close", "volume", "received_at"])
+AnomalyEvent = namedtuple("AnomalyEvent", ["ticker", "timestamp", "detectors", "close", "z_score",
+                                           "iso_score", "lstm_error", "latency_ms"])
+
+
+def make_bar(ticker, timestamp, open, high, low, close, volume):
+    return Bar(ticker, timestamp, open, high, low, close, volume, time.perf_counter())
+
+
+class StreamMetrics:
+    """Counters plus a bounded sample of end-to-end latencies."""
+
+    def __init__(self, max_samples=100_000):
+        self.bars = 0
+        self.events = 0
+        self.batches = 0
+        self.latencies = deque(maxlen=max_samples)
+        self.started_at = None
+        self._lock = threading.Lock()
+
+    def record_batch(self, n_bars, n_events, latencies):
+        with self._lock:
+            if self.started_at is None:
+                self.started_at = time.perf_counter()
+            self.bars += n_bars
+            self.events += n_events
+            self.batches += 1
+            self.latencies.extend(latencies)
+
+    def snapshot(self):
+        with self._lock:
+            lat = np.asarray(self.latencies) * 1e3
+            elapsed = time.perf_counter() - self.started_at if self.started_at else 0.0
+            return {
+                "bars": self.bars,
+                "events": self.events,
+                "batches": self.batches,
+                "mean_batch_size": self.bars / self.batches if self.batches else 0.0,
+                "bars_per_sec": self.bars / elapsed if elapsed > 0 else 0.0,
+                "latency_ms_p50": float(np.percentile(lat, 50)) if lat.size else None,
+                "latency_ms_p95": float(np.percentile(lat, 95)) if lat.size else None,
+                "latency_ms_p99": float(np.percentile(lat, 99)) if lat.size else None,
+                "latency_ms_max": float(lat.max()) if lat.size else None,
+            }
+
+
+class StreamingAnomalyService:
+    """
+    Parameters:
+        detectors: any of "zscore", "isolation", "lstm"
+        on_alert: callback(AnomalyEvent), called on the processing thread
+        alert_queue: queue.Queue that also receives every AnomalyEvent
+        micro_batch, max_delay: the worker scores up to micro_batch bars at once,
+            waiting at most max_delay seconds for a batch to fill (0 = take only what
+            queued up while the previous batch was scored; batches grow with load)
+        lstm_threshold: error above which a window is anomalous
+            (default: the model's train_error_p95 from the registry)
+        policy: RetrainPolicy for the Isolation Forest drift check
+        iso_refit_window, iso_check_every: bars kept per ticker for a refit, and bars
+            between drift checks (the flag rate is measured over the bars since the last fit)
+    The LSTM scores the window ending at the new bar, so an alert fires on the bar itself.
+    """
+
+    def __init__(self, detectors=("zscore",), window=30, threshold=3.0, registry=None, on_alert=None,
+                 alert_queue=None, micro_batch=64, max_delay=0.0, lstm_threshold=None, policy=None,
+                 iso_refit_window=ISO_REFIT_WINDOW, iso_check_every=ISO_CHECK_EVERY):
+        unknown = set(detectors) - set(DETECTORS)
+        if unknown:
+            raise ValueError(f"Unknown detectors {sorted(unknown)}; choose from {DETECTORS}")
+        self.detectors = tuple(detectors)
+        self.registry = registry or get_registry()
+        self.on_alert = on_alert
+        self.alert_queue = alert_queue
+        self.micro_batch = micro_batch
+        self.max_delay = max_delay
+        self.lstm_threshold = lstm_threshold
+        self.policy = policy or DEFAULT_POLICY
+        self.iso_check_every = iso_check_every
+        self.zscore = StreamingZScore(window=window, threshold=threshold)
+        self.metrics = StreamMetrics()
+        self._models = {}
+        self._closes = defaultdict(lambda: deque(maxlen=LSTM_PARAMS["window"]))
+        self._iso_bars = defaultdict(lambda: deque(maxlen=iso_refit_window))  # (timestamp, close, volume)
+        self._iso_flags = defaultdict(list)  # flags since the current model was fitted
+        self.iso_refits = 0
+        self._inbox = queue.Queue()
+        self._worker = None
+
+    # --- Models ---
+    def preload(self, ticker, history=None):
+        """
+        Load pre-fitted models for a ticker from the registry (fitting them on
+        `history` if none exist yet) and warm the rolling state from `history`.
+        """
+        if history is not None:
+            self.zscore.seed(history['Close'].to_numpy(dtype='float64'), [ticker])
+            self._closes[ticker].extend(history['Close'].to_numpy(dtype='float64')[-LSTM_PARAMS["window"]:])
+            tail = history.iloc[-self._iso_bars[ticker].maxlen:]
+            self._iso_bars[ticker].extend(zip(tail.index, tail['Close'], tail['Volume']))
+        for detector, kind, params, fit_fn, columns in (
+            ("isolation", "isolation_forest", ISO_PARAMS, fit_isolation_forest, ['Close', 'Volume']),
+            ("lstm", "lstm_autoencoder", LSTM_PARAMS, fit_lstm_autoencoder, ['Close']),
+        ):
+            if detector not in self.detectors:
+                continue
+            entry = self.registry.latest(kind, ticker, params)
+            if entry is None and history is not None:
+                entry = self.registry.get_or_fit(kind, ticker, params, history, fit_fn, columns=columns)
+            self._models[(detector, ticker)] = entry
+            if detector == "isolation" and entry is not None and history is not None:
+                X = history[ISO_FEATURES].bfill()
+                if iso_drifted(X, entry.artifacts["model"].predict(X) == -1, entry.meta, self.policy):
+                    self._refit_isolation(ticker)
+
+    def _refit_isolation(self, ticker):
+        """Fit a fresh Isolation Forest on the ticker's last iso_refit_window bars."""
+        bars = self._iso_bars[ticker]
+        if len(bars) < self.iso_check_every:
+            return
+        timestamps, closes, volumes = zip(*bars)
+        df = pd.DataFrame({'Close': closes, 'Volume': volumes}, index=pd.Index(timestamps, name='Date'))
+        self._models[("isolation", ticker)] = self.registry.fit(
+            "isolation_forest", ticker, ISO_PARAMS, df.bfill().fillna(0.0), fit_isolation_forest, columns=ISO_FEATURES)
+        self._iso_flags[ticker] = []
+        self.iso_refits += 1
+
+    def _check_isolation(self, ticker, bars, flags):
+        """Record scored bars; every iso_check_every bars, refit if the flags drifted."""
+        self._iso_bars[ticker].extend((bar.timestamp, bar.close, bar.volume) for bar in bars)
+        recent = self._iso_flags[ticker]
+        recent.extend(flags)
+        if len(recent) // self.iso_check_every == (len(recent) - len(flags)) // self.iso_check_every:
+            return
+        entry = self._models[("isolation", ticker)]
+        window = list(self._iso_bars[ticker])[-len(recent):]
+        X = pd.DataFrame([(close, volume) for _, close, volume in window], columns=ISO_FEATURES)
+        if iso_drifted(X, recent, entry.meta, self.policy):
+            self._refit_isolation(ticker)
+
+    def _model(self, detector, ticker):
+        if (detector, ticker) not in self._models:
+            kind, params = {"isolation": ("isolation_forest", ISO_PARAMS),
+                            "lstm": ("lstm_autoencoder", LSTM_PARAMS)}[detector]
+            self._models[(detector, ticker)] = self.registry.latest(kind, ticker, params)
+        return self._models[(detector, ticker)]
+
+    # --- Scoring ---
+    def process(self, bars):
+        """Score a micro-batch of bars synchronously and publish alerts. Returns the events."""
+        bars = list(bars)
+        if not bars:
+            return []
+        n = len(bars)
+        z = np.full(n, np.nan)
+        flags = {d: np.zeros(n, dtype=bool) for d in self.detectors}
+        iso_score = np.full(n, np.nan)
+        lstm_error = np.full(n, np.nan)
+
+        if "zscore" in self.detectors:
+            # StreamingZScore takes each ticker at most once per update: split into rounds
+            seen, rounds = defaultdict(int), defaultdict(list)
+            for i, bar in enumerate(bars):
+                rounds[seen[bar.ticker]].append(i)
+                seen[bar.ticker] += 1
+            for idx in rounds.values():
+                zr, fr = self.zscore.update([bars[i].close for i in idx], [bars[i].ticker for i in idx])
+                z[idx] = zr
+                flags["zscore"][idx] = fr.astype(bool)
+
+        by_ticker = defaultdict(list)
+        for i, bar in enumerate(bars):
+            by_ticker[bar.ticker].append(i)
+        for ticker, idx in by_ticker.items():
+            closes = [bars[i].close for i in idx]
+            if "isolation" in self.detectors and self._model("isolation", ticker) is not None:
+                iso = self._model("isolation", ticker).artifacts["model"]
+                X = pd.DataFrame({'Close': closes, 'Volume': [bars[i].volume for i in idx]}).bfill().fillna(0.0)
+                scores = iso.score_samples(X)
+                flags["isolation"][idx] = scores < iso.offset_  # same as predict() == -1, one tree pass
+                iso_score[idx] = -scores
+                self._check_isolation(ticker, [bars[i] for i in idx], flags["isolation"][idx].tolist())
+            if "lstm" in self.detectors:
+                self._score_lstm(ticker, idx, closes, flags["lstm"], lstm_error)
+
+        now = time.perf_counter()
+        events = []
+        for i, bar in enumerate(bars):
+            fired = tuple(d for d in self.detectors if flags[d][i])
+            if fired:
+                events.append(AnomalyEvent(bar.ticker, bar.timestamp, fired, bar.close,
+                                           None if np.isnan(z[i]) else float(z[i]),
+                                           None if np.isnan(iso_score[i]) else float(iso_score[i]),
+                                           None if np.isnan(lstm_error[i]) else float(lstm_error[i]),
+                                           (now - bar.received_at) * 1e3))
+        for event in events:
+            if self.on_alert:
+                self.on_alert(event)
+            if self.alert_queue is not None:
+                self.alert_queue.put(event)
+        self.metrics.record_batch(n, len(events), [now - bar.received_at for bar in bars])
+        return events
+
+    def _score_lstm(self, ticker, idx, closes, flags, errors):
+        history = self._closes[ticker]
+        entry = self._model("lstm", ticker)
+        window = LSTM_PARAMS["window"]
+        windows, positions = [], []
+        for pos, close in zip(idx, closes):
+            history.append(close)
+            if len(history) == window:
+                windows.append(list(history))
+                positions.append(pos)
+        if entry is None or not windows:
+            return
+        scaler = entry.artifacts["scaler"]
+        scaled = scaler.transform(pd.DataFrame({'Close': np.ravel(windows)})).astype('float32')
+        err = lstm_reconstruction_errors(entry.artifacts["model"], scaled.reshape(len(windows), window, 1))
+        threshold = self.lstm_threshold or entry.meta.get("stats", {}).get("train_error_p95", np.inf)
+        errors[positions] = err
+        flags[positions] = err > threshold
+
+    # --- Background worker ---
+    def submit(self, bar):
+        self._inbox.put(bar)
+
+    def start(self):
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._run, name="anomaly-stream", daemon=True)
+            self._worker.start()
+        return self
+
+    def stop(self):
+        if self._worker is not None:
+            self._inbox.put(None)
+            self._worker.join()
+            self._worker = None
+
+    def _run(self):
+        while True:
+            bar = self._inbox.get()
+            if bar is None:
+                return
+            batch = [bar]
+            deadline = time.perf_counter() + self.max_delay
+            while len(batch) < self.micro_batch:
+                try:
+                    remaining = deadline - time.perf_counter()
+                    bar = self._inbox.get(timeout=remaining) if remaining > 0 else self._inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if bar is None:
+                    self._safe_process(batch)
+                    return
+                batch.append(bar)
+            self._safe_process(batch)
+
+    def _safe_process(self, batch):
+        try:
+            self.process(batch)
+        except Exception as e:
+            print(f"[Anomaly Stream Error] {e}")
+
+
+# === Bar sources ===
+def _row_to_bar(ticker, row):
+    return make_bar(ticker, row['Date'], row.get('Open'), row.get('High'), row.get('Low'),
+                    float(row['Close']), float(row.get('Volume', np.nan)))
+
+
+def replay_csv(path="data/cleaned_google_stock.csv", ticker="GOOG", speed=None, start_at=0):
+    """Yield bars from a CSV in time order; speed=None replays as fast as possible, else bars/sec."""
+    df = pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'])
+    df = df.sort_values('Date').dropna().iloc[start_at:]
+    tickers = df['Ticker'] if 'Ticker' in df.columns else None
+    for i, row in enumerate(df.to_dict("records")):
+        if speed:
+            time.sleep(1.0 / speed)
+        yield _row_to_bar(tickers.iloc[i] if tickers is not None else ticker, row)
+
+
+def tail_csv(path, ticker="GOOG", poll=0.5, stop_event=None):
+    """Follow a CSV file that is being appended to (header on the first line)."""
+    with open(path) as f:
+        header = f.readline().strip().split(",")
+        f.seek(0, 2)
+        while not (stop_event and stop_event.is_set()):
+            line = f.readline()
+            if not line:
+                time.sleep(poll)
+                continue
+            row = dict(zip(header, line.strip().split(",")))
+            row['Date'] = pd.Timestamp(row['Date'])
+            yield _row_to_bar(row.get('Ticker', ticker), row)
+
+
+def socket_bars(host, port):
+    """Newline-delimited JSON bars ({"ticker", "Date", "Close", "Volume", ...}) from a TCP socket."""
+    with socket.create_connection((host, port)) as conn:
+        for line in conn.makefile("r"):
+            if line.strip():
+                row = json.loads(line)
+                yield _row_to_bar(row.get("ticker", "GOOG"), row)
+
+
+# === Replay harness ===
+def replay(service, bars, threaded=True):
+    """Push bars through the service and return its metrics snapshot."""
+    if threaded:
+        service.start()
+        for bar in bars:
+            service.submit(bar)
+        service.stop()
+    else:
+        for bar in bars:
+            service.process([bar])
+    return service.metrics.snapshot()
+
+
+def check_zscore_against_batch(path="data/cleaned_google_stock.csv", window=30, threshold=3.0):
+    """Streaming z-score flags must equal utils.detect_anomalies_zscore on the same file."""
+    events = []
+    service = StreamingAnomalyService(("zscore",), window, threshold, on_alert=events.append)
+    replay(service, replay_csv(path), threaded=False)
+    df = pd.read_csv(path)
+    df['Date'] = pd.to_datetime(df['Date'])
+    batch = detect_anomalies_zscore(df.set_index('Date').sort_index().dropna(), window, threshold)
+    expected = set(batch.index[batch['anomaly_zscore'] == 1])
+    return expected == {e.timestamp for e in events}, len(expected)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming anomaly detection.")
+    parser.add_argument("command", choices=["replay"])
+    parser.add_argument("--csv", default="data/cleaned_google_stock.csv")
+    parser.add_argument("--ticker", default="GOOG")
+    parser.add_argument("--detectors", default="zscore")
+    parser.add_argument("--speed", type=float, default=None, help="bars/sec (default: as fast as possible)")
+    parser.add_argument("--warmup", type=int, default=500, help="bars used to preload models and state")
+    parser.add_argument("--micro-batch", type=int, default=64)
+    parser.add_argument("--check", action="store_true", help="compare streaming z-score with the batch detector")
+    args = parser.parse_args()
+
+    if args.check:
+        ok, n = check_zscore_against_batch(args.csv)
+        print(f"streaming z-score matches batch detector: {ok} ({n} anomalies)")
+
+    service = StreamingAnomalyService(tuple(args.detectors.split(",")), micro_batch=args.micro_batch,
+                                      on_alert=lambda e: print(f"🚨 {e.timestamp} {e.ticker} {e.detectors} close={e.close}"))
+    history = pd.read_csv(args.csv, parse_dates=['Date']).sort_values('Date').dropna()
+    service.preload(args.ticker, history.set_index('Date').iloc[:args.warmup])
+    print(json.dumps(replay(service, replay_csv(args.csv, args.ticker, args.speed, start_at=args.warmup)), indent=2))
@@ -1,20 +1,61 @@
+import os
+import time
+import pandas as pd
 import streamlit as st
+from model_loader import prewarm
+from job_manager import get_job_manager, DONE, FAILED
+import instrumentation
+from instrumentation import track
 from data_loader import load_data
 from utils import detect_anomalies_zscore, detect_anomalies_isolation, detect_anomalies_lstm
-from forecast_engine import run_prophet_forecast, run_arima_forecast
+from anomaly_ensemble import detect_anomalies_ensemble
+from forecast_cache import cached_prophet_forecast, cached_arima_forecast
 from plots import plot_anomalies, plot_forecast
 from rag_assistant import ask_question
-from portfolio_analyzer import analyze_portfolio_risk
-from news_fetcher import get_latest_news
+from portfolio_analyzer import analyze_portfolio_risk, analyze_portfolio_var
+from news_async import get_latest_news
 from sentiment_model import analyze_sentiment
+from sentiment_features import join_sentiment, SENTIMENT_COLUMNS
 
-query = "What happened to Google stock in 2023?"
-file_path = "data/google_stock_news.txt"
+# Heavy models load on first use; PREWARM=finbert,tensorflow loads them in the background
+prewarm(os.getenv("PREWARM", "").split(","))
 
-answers = ask_question(file_path, query)
+# Slow work (LSTM / Prophet fits, FinBERT, RAG) runs as background jobs; reruns poll the same job
+jobs = get_job_manager()
+
+
+def job_result(slot, label):
+    """Result of this session's job in `slot`, or None while it runs (progress is shown instead)."""
+    job_id = st.session_state[f"job:{slot}"]["id"]
+    status = jobs.status(job_id)
+    if status is None:
+        # Pruned (or the server restarted): forget it, the next submit starts a fresh job
+        jobs.clear_session_job(st.session_state, slot)
+        return None
+    if status.state == DONE:
+        return jobs.result(job_id)
+    if status.state == FAILED:
+        st.error(f"❌ {label} failed: {status.error}")
+        if st.button("Retry", key=f"retry:{slot}"):
+            jobs.clear_session_job(st.session_state, slot)
+            st.rerun()
+        return None
+    st.progress(status.progress, text=f"⏳ {label}: {status.message or status.state}")
+    return None
+
+
+def run_job(slot, label, fn, *args, **submit_kwargs):
+    jobs.session_job(st.session_state, slot, fn, *args, **submit_kwargs)
+    return job_result(slot, label)
+
+
+def sentiment_option(df, key):
+    """Checkbox + ticker: as-of news sentiment columns (no look-ahead) to feed the models as extra inputs."""
+    if not st.checkbox("Add news sentiment features", key=f"{key}_sentiment"):
+        return df, None
+    ticker = st.text_input("News ticker", "GOOG", key=f"{key}_ticker")
+    return join_sentiment(df, ticker), SENTIMENT_COLUMNS
 
-for i, answer in enumerate(answers, 1):
-    print(f"Answer {i}:\n{answer}\n")
 
 st.set_page_config(page_title="TradeWatch AI", layout="wide")
 st.title("📈 TradeWatch AI – Stock Intelligence Agent")
@@ -30,55 +71,89 @@ tabs = st.tabs([
 ])
 
 # === 1. ANOMALY DETECTION ===
-with tabs[0]:
+with tabs[0], track("tab.anomaly"):
     st.subheader("📊 Anomaly Detection (Z-Score, Isolation Forest, LSTM Autoencoder)")
     upload = st.file_uploader("Upload your stock CSV (Date, Open, High, Low, Close, Volume)", type="csv")
     df = load_data(upload)
 
-    model = st.selectbox("Choose Detection Method", ["Z-Score", "Isolation Forest", "LSTM Autoencoder"])
+    model = st.selectbox("Choose Detection Method", ["Z-Score", "Isolation Forest", "LSTM Autoencoder", "Ensemble (all three)"])
+    extra_features, timings = None, None
+    if model in ("Isolation Forest", "Ensemble (all three)"):
+        df, extra_features = sentiment_option(df, "anomaly")
     if model == "Z-Score":
-        df = detect_anomalies_zscore(df)
-        plot_anomalies(df, "anomaly_zscore")
+        df, flag_col = detect_anomalies_zscore(df), "anomaly_zscore"
     elif model == "Isolation Forest":
-        df = detect_anomalies_isolation(df)
-        plot_anomalies(df, "anomaly_iso")
+        df, flag_col = detect_anomalies_isolation(df, extra_features=extra_features or ()), "anomaly_iso"
     elif model == "LSTM Autoencoder":
-        df = detect_anomalies_lstm(df)
-        plot_anomalies(df, "anomaly_lstm")
+        df, flag_col = run_job("anomaly", "Training LSTM autoencoder", detect_anomalies_lstm, df,
+                               kind="anomaly.lstm", executor="process"), "anomaly_lstm"
+    else:
+        result = run_job("anomaly", "Running ensemble", detect_anomalies_ensemble, df,
+                         kind="anomaly.ensemble", executor="process", extra_features=extra_features or ())
+        df, timings = result if result is not None else (None, None)
+        flag_col = "anomaly_ensemble"
+
+    if df is not None:
+        # Only the visible range is downsampled and sent to the browser
+        first, last = df.index.min().to_pydatetime(), df.index.max().to_pydatetime()
+        visible = st.slider("Visible range", min_value=first, max_value=last, value=(first, last)) if first < last else None
+        st.plotly_chart(plot_anomalies(df, flag_col, x_range=visible), use_container_width=True)
+        if timings:
+            st.caption(" | ".join(f"{stage}: {seconds * 1e3:.0f} ms" for stage, seconds in timings.items()))
 
-    st.download_button("💾 Download Results", df.to_csv(index=True), "Anomaly_Results.csv")
+        st.download_button("💾 Download Results", df.to_csv(index=True), "Anomaly_Results.csv")
 
 # === 2. FORECASTING ===
-with tabs[1]:
+with tabs[1], track("tab.forecasting"):
     st.subheader("🔮 Forecasting (Prophet / ARIMA)")
     df = load_data(upload)
     method = st.radio("Choose Forecast Model", ["Prophet", "ARIMA"])
+    df, regressors = sentiment_option(df, "forecast")
 
     if method == "Prophet":
-        forecast, changepoints = run_prophet_forecast(df)
-        plot_forecast(forecast, changepoints)
+        result = run_job("forecast", "Fitting Prophet", cached_prophet_forecast, df,
+                         kind="forecast.prophet", executor="process", regressors=regressors)
+        if result is not None:
+            forecast, changepoints = result
+            st.plotly_chart(plot_forecast(forecast, changepoints), use_container_width=True)
     else:
-        forecast = run_arima_forecast(df)
+        forecast = cached_arima_forecast(df, regressors=regressors)
         st.line_chart(forecast.set_index("ds")["yhat"])
 
 # === 3. RAG FINANCIAL ASSISTANT ===
-with tabs[2]:
+with tabs[2], track("tab.rag"):
     st.subheader("🧠 Ask Financial Questions (RAG+LLM)")
     question = st.text_input("Ask a question (e.g. 'What caused the dip in Jan 2021?')")
     if question:
-        answer = ask_question(question)
-        st.success(answer)
+        # Thread job: the index and retriever stay loaded in this process between questions
+        answer = run_job("rag", "Searching the knowledge base", ask_question, question, kind="rag")
+        if answer is not None:
+            st.success(answer)
 
 # === 4. PORTFOLIO RISK ANALYZER ===
-with tabs[3]:
+with tabs[3], track("tab.portfolio"):
     st.subheader("📂 Portfolio Risk Analyzer (CSV)")
     portfolio_file = st.file_uploader("Upload Portfolio CSV (Asset, Weight, Return, Volatility)", type="csv", key="portfolio")
+    prices_file = st.file_uploader("Optional: price history CSV (Date, Ticker, Close) for VaR / CVaR", type="csv", key="portfolio_prices")
     if portfolio_file:
         risk_report = analyze_portfolio_risk(portfolio_file)
         st.write(risk_report)
+    if portfolio_file and prices_file:
+        alpha = st.select_slider("Confidence level", options=[0.9, 0.95, 0.975, 0.99], value=0.95)
+        portfolio_file.seek(0)
+        var_report = analyze_portfolio_var(portfolio_file, prices_file, alpha=alpha)
+        if isinstance(var_report, str):
+            st.write(var_report)
+        else:
+            st.write(var_report["summary"])
+            st.markdown("**Risk contributions**")
+            st.dataframe(var_report["contributions"])
+            if var_report["rolling"] is not None:
+                st.markdown("**Rolling 1-year risk**")
+                st.line_chart(var_report["rolling"][["hist_var", "hist_cvar", "param_var", "param_cvar"]])
 
 # === 5. FINANCIAL NEWS ===
-with tabs[4]:
+with tabs[4], track("tab.news"):
     st.subheader("📰 Real-Time Financial News")
     news = get_latest_news()
     for article in news:
@@ -88,11 +163,49 @@ with tabs[4]:
         st.markdown(f"[Read more]({article['url']})")
 
 # === 6. SENTIMENT ANALYSIS ===
-with tabs[5]:
+with tabs[5], track("tab.sentiment"):
     st.subheader("📈 Sentiment Analysis")
     news_input = st.text_area("Enter financial news or text:")
     model_choice = st.radio("Choose Sentiment Model", ["VADER", "FinBERT"])
     if st.button("Analyze Sentiment"):
-        sentiment = analyze_sentiment(news_input, model_choice)
+        # Thread job: FinBERT stays loaded in this process and torch releases the GIL
+        jobs.session_job(st.session_state, "sentiment", analyze_sentiment, news_input, model_choice, kind="sentiment")
+    sentiment = job_result("sentiment", "Scoring sentiment") if "job:sentiment" in st.session_state else None
+    if sentiment is not None:
         st.metric("Sentiment Score", sentiment["score"])
         st.write("Interpretation:", sentiment["label"])
+
+# === DIAGNOSTICS (sidebar) ===
+with st.sidebar.expander("⏱️ Diagnostics"):
+    profiling = st.checkbox("Record timings", value=instrumentation.is_enabled())
+    if profiling and not instrumentation.is_enabled():
+        instrumentation.enable()
+        st.caption("Timings start with the next rerun.")
+    elif not profiling and instrumentation.is_enabled():
+        instrumentation.disable()
+
+    stages = instrumentation.snapshot()
+    if stages:
+        tab_rows = [(name[4:], s["wall_p50_s"] * 1e3, s["wall_max_s"] * 1e3, s["calls"])
+                    for name, s in stages.items() if name.startswith("tab.")]
+        st.markdown("**Per-tab latency (ms)**")
+        st.dataframe(pd.DataFrame(tab_rows, columns=["tab", "p50", "max", "reruns"]).set_index("tab"))
+        for name, _, _, _ in tab_rows:
+            children = instrumentation.breakdown(f"tab.{name}")
+            if children:
+                st.caption(f"{name} (total): " + ", ".join(f"{stage.split('.')[-1]} {seconds * 1e3:.0f} ms"
+                                                   for stage, seconds in children))
+        job_stages = {name[4:]: s for name, s in stages.items() if name.startswith("job.")}
+        if job_stages:
+            # process jobs report their stages once they finish
+            st.caption("Background jobs (p50): " + ", ".join(f"{kind} {s['wall_p50_s'] * 1e3:.0f} ms"
+                                                              for kind, s in job_stages.items()))
+        st.download_button("JSON", instrumentation.to_json(), "timings.json")
+        st.download_button("Prometheus", instrumentation.to_prometheus(), "timings.prom")
+        if st.button("Reset timings"):
+            instrumentation.reset()
+
+# Poll running jobs: rerun until every job this session is waiting on has finished
+if jobs.session_busy(st.session_state):
+    time.sleep(1)
+    st.rerun()
@@ -0,0 +1,289 @@
+"""
+Append-only, indexed store for scraped news articles.
+- SQLite file at ./data/articles.sqlite; rows are only ever inserted
+- Exact duplicates (same normalized URL, or same normalized title when there
+  is no URL) are skipped
+- Near duplicates (MinHash over word shingles + LSH banding) are kept but
+  marked with dup_of, and hidden from queries by default
+- Fast queries by ticker and time range
+- Per-consumer cursors, so the RAG loader and the sentiment batcher only
+  process articles they have not seen yet
+"""
+
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import numpy as np
+import pandas as pd
+
+STORE_PATH = "./data/articles.sqlite"
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SHINGLE_SIZE = 3
+NEAR_DUP_THRESHOLD = 0.8
+
+_PRIME = np.uint64((1 << 31) - 1)
+_rng = np.random.default_rng(20240101)
+_PERM_A = _rng.integers(1, (1 << 31) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, (1 << 31) - 1, size=NUM_PERM, dtype=np.uint64)
+TRACKING_PARAMS = re.compile(r"^(utm_|guccounter|guce_|fbclid|gclid|\.tsrc)")
+
+
+# === Normalization and hashing ===
+def normalize_url(url):
+    if not url:
+        return ""
+    parts = urlsplit(url.strip())
+    query = urlencode(sorted((k, v) for k, v in parse_qsl(parts.query) if not TRACKING_PARAMS.match(k)))
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower() or "https", parts.netloc.lower(), path, query, ""))
+
+
+def normalize_title(title):
+    return re.sub(r"\s+", " ", re.sub(r"[^\w\s]", " ", (title or "").lower())).strip()
+
+
+def article_key(article):
+    url = normalize_url(article.get("url"))
+    basis = f"url:{url}" if url else f"title:{normalize_title(article.get('title'))}"
+    return hashlib.sha256(basis.encode("utf-8")).hexdigest()
+
+
+def shingles(text, k=SHINGLE_SIZE):
+    words = re.findall(r"\w+", (text or "").lower())
+    if len(words) <= k:
+        return {" ".join(words)}
+    return {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+
+
+def minhash_signature(text):
+    """NUM_PERM universal-hash minimums over the text's word shingles."""
+    hashed = np.array(
+        [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") & 0x7FFFFFFF
+         for s in shingles(text)],
+        dtype=np.uint64,
+    )
+    return ((np.outer(_PERM_A, hashed) + _PERM_B[:, None]) % _PRIME).min(axis=1).astype(np.uint32)
+
+
+def lsh_buckets(signature):
+    return [hashlib.blake2b(signature[b * ROWS:(b + 1) * ROWS].tobytes(), digest_size=8).hexdigest()
+            for b in range(BANDS)]
+
+
+def _to_epoch(value):
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return pd.Timestamp(value).timestamp()
+
+
+# === Store ===
+class ArticleStore:
+    def __init__(self, path=STORE_PATH, near_dup_threshold=NEAR_DUP_THRESHOLD):
+        self.path = path
+        self.near_dup_threshold = near_dup_threshold
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                key TEXT NOT NULL UNIQUE,
+                ticker TEXT,
+                title TEXT NOT NULL,
+                summary TEXT,
+                source TEXT,
+                url TEXT,
+                published_at REAL NOT NULL,
+                fetched_at REAL NOT NULL,
+                signature BLOB NOT NULL,
+                dup_of INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS idx_articles_ticker_time ON articles(ticker, published_at);
+            CREATE INDEX IF NOT EXISTS idx_articles_time ON articles(published_at);
+            CREATE TABLE IF NOT EXISTS lsh (band INTEGER NOT NULL, bucket TEXT NOT NULL, article_id INTEGER NOT NULL);
+            CREATE INDEX IF NOT EXISTS idx_lsh ON lsh(band, bucket);
+            CREATE TABLE IF NOT EXISTS cursors (consumer TEXT PRIMARY KEY, last_id INTEGER NOT NULL);
+        """)
+        self._conn.commit()
+
+    def _find_near_duplicate(self, signature, buckets):
+        candidates = set()
+        for band, bucket in enumerate(buckets):
+            rows = self._conn.execute("SELECT article_id FROM lsh WHERE band = ? AND bucket = ?", (band, bucket))
+            candidates.update(r[0] for r in rows)
+        best_id, best_sim = None, 0.0
+        for cid in candidates:
+            row = self._conn.execute("SELECT signature, dup_of FROM articles WHERE id = ?", (cid,)).fetchone()
+            sim = float(np.mean(np.frombuffer(row["signature"], dtype=np.uint32) == signature))
+            if sim > best_sim:
+                best_id, best_sim = (row["dup_of"] or cid), sim
+        return best_id if best_sim >= self.near_dup_threshold else None
+
+    def add_articles(self, articles, ticker=None):
+        """
+        Append scraped articles ({title, summary, source, url[, published_at, ticker]}).
+        Returns:
+            dict: counts of inserted, exact duplicates skipped and near duplicates marked
+        """
+        stats = {"inserted": 0, "duplicates": 0, "near_duplicates": 0}
+        now = time.time()
+        with self._lock:
+            for article in articles:
+                key = article_key(article)
+                if self._conn.execute("SELECT 1 FROM articles WHERE key = ?", (key,)).fetchone():
+                    stats["duplicates"] += 1
+                    continue
+                signature = minhash_signature(f"{article.get('title', '')} {article.get('summary', '')}")
+                buckets = lsh_buckets(signature)
+                dup_of = self._find_near_duplicate(signature, buckets)
+                cur = self._conn.execute(
+                    "INSERT INTO articles (key, ticker, title, summary, source, url, published_at, fetched_at, signature, dup_of) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, article.get("ticker", ticker), article.get("title", ""), article.get("summary", ""),
+                     article.get("source"), article.get("url"), _to_epoch(article.get("published_at")) or now,
+                     now, signature.tobytes(), dup_of),
+                )
+                self._conn.executemany(
+                    "INSERT INTO lsh (band, bucket, article_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cur.lastrowid) for band, bucket in enumerate(buckets)],
+                )
+                stats["near_duplicates" if dup_of else "inserted"] += 1
+            self._conn.commit()
+        return stats
+
+    @staticmethod
+    def _row_to_article(row):
+        return {
+            "id": row["id"],
+            "ticker": row["ticker"],
+            "title": row["title"],
+            "summary": row["summary"],
+            "source": row["source"],
+            "url": row["url"],
+            "published_at": pd.Timestamp(row["published_at"], unit="s").isoformat(),
+            "dup_of": row["dup_of"],
+        }
+
+    def query(self, ticker=None, start=None, end=None, include_duplicates=False, after_id=None, limit=None):
+        """Articles by ticker and published time range, oldest first."""
+        sql = "SELECT * FROM articles WHERE 1=1"
+        args = []
+        if ticker is not None:
+            sql += " AND ticker = ?"
+            args.append(ticker)
+        if start is not None:
+            sql += " AND published_at >= ?"
+            args.append(_to_epoch(start))
+        if end is not None:
+            sql += " AND published_at <= ?"
+            args.append(_to_epoch(end))
+        if after_id is not None:
+            sql += " AND id > ?"
+            args.append(after_id)
+        if not include_duplicates:
+            sql += " AND dup_of IS NULL"
+        sql += " ORDER BY published_at, id"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._lock:
+            return [self._row_to_article(r) for r in self._conn.execute(sql, args)]
+
+    # --- Consumer cursors ---
+    def cursor(self, consumer):
+        row = self._conn.execute("SELECT last_id FROM cursors WHERE consumer = ?", (consumer,)).fetchone()
+        return row[0] if row else 0
+
+    def fetch_new(self, consumer, include_duplicates=False, limit=None):
+        """Articles appended since `consumer` last called commit_cursor, in insertion order."""
+        sql = "SELECT * FROM articles WHERE id > ?"
+        if not include_duplicates:
+            sql += " AND dup_of IS NULL"
+        sql += " ORDER BY id"
+        args = [self.cursor(consumer)]
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._lock:
+            return [self._row_to_article(r) for r in self._conn.execute(sql, args)]
+
+    def commit_cursor(self, consumer, last_id):
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO cursors (consumer, last_id) VALUES (?, ?) "
+                "ON CONFLICT(consumer) DO UPDATE SET last_id = MAX(last_id, excluded.last_id)",
+                (consumer, last_id),
+            )
+            self._conn.commit()
+
+    def count(self, include_duplicates=True):
+        sql = "SELECT COUNT(*) FROM articles" + ("" if include_duplicates else " WHERE dup_of IS NULL")
+        return self._conn.execute(sql).fetchone()[0]
+
+
+# === Knowledge base export for the RAG index ===
+def export_new_to_kb(store, kb_dir="knowledge_base", consumer="rag"):
+    """
+    Append articles new to `consumer` into per-day files (news_YYYY-MM-DD.txt),
+    so the RAG index only re-embeds the day files that grew.
+    """
+    articles = store.fetch_new(consumer)
+    if not articles:
+        return 0
+    os.makedirs(kb_dir, exist_ok=True)
+    by_day = {}
+    for a in articles:
+        by_day.setdefault(a["published_at"][:10], []).append(a)
+    for day, items in by_day.items():
+        with open(os.path.join(kb_dir, f"news_{day}.txt"), "a", encoding="utf-8") as f:
+            for item in items:
+                f.write(f"📰 News {item['id']}\n")
+                if item["ticker"]:
+                    f.write(f"Ticker: {item['ticker']}\n")
+                f.write(f"Date: {item['published_at']}\n")
+                f.write(f"Title: {item['title']}\n")
+                f.write(f"Summary: {item['summary']}\n\n")
+    store.commit_cursor(consumer, articles[-1]["id"])
+    return len(articles)
+
+
+def save_articles(news, ticker="GOOG", kb_dir="knowledge_base"):
+    """Append to the article store (duplicates skipped) and export only new articles to the knowledge base."""
+    store = get_article_store()
+    stats = store.add_articles(news, ticker=ticker)
+    exported = export_new_to_kb(store, kb_dir=kb_dir)
+    return stats, exported
+
+
+def save_summary(stats, exported, kb_dir="knowledge_base"):
+    return (f"✅ {stats['inserted']} new, {stats['duplicates']} duplicate, {stats['near_duplicates']} near-duplicate "
+            f"articles; {exported} exported to {kb_dir}/")
+
+
+_STORE = None
+
+
+def get_article_store():
+    global _STORE
+    if _STORE is None:
+        _STORE = ArticleStore()
+    return _STORE
+
+
+if __name__ == "__main__":
+    store = get_article_store()
+    print(f"{store.count()} articles ({store.count(include_duplicates=False)} unique)")
+    for a in store.query(limit=10):
+        print(f"{a['published_at'][:16]} [{a['ticker']}] {a['title']}")
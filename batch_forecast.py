@@ -0,0 +1,199 @@
+"""
+Batch forecasting across a universe of tickers.
+- Accepts a long-format (Date, Ticker, Close) frame
+- Fans Prophet / ARIMA fits out over a process pool with per-series timeouts
+- A failing or slow series is reported, it never takes the batch down
+- Series whose input and config did not change since the last run are skipped
+  and their previous forecasts are reused
+Returns:
+    forecasts: one tidy table (ds, ticker, model, yhat, yhat_lower, yhat_upper)
+    report: per-series status and fit time
+CLI:
+    python batch_forecast.py prices.csv --model arima --workers 8 --timeout 120
+"""
+
+import os
+import json
+import time
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+
+from model_registry import data_fingerprint, params_key
+
+STATE_DIR = "models/batch_forecast"
+FORECAST_COLUMNS = ["ds", "ticker", "model", "yhat", "yhat_lower", "yhat_upper"]
+REPORT_COLUMNS = ["ticker", "status", "fit_seconds", "error"]
+
+
+class ForecastTimeout(Exception):
+    pass
+
+
+def _raise_timeout(signum, frame):
+    raise ForecastTimeout()
+
+
+def split_by_ticker(df, date_col="Date", ticker_col="Ticker", value_col="Close"):
+    """Long frame -> {ticker: DataFrame indexed by Date with a Close column}."""
+    frame = df.reset_index() if date_col not in df.columns else df
+    series = {}
+    for ticker, group in frame.groupby(ticker_col, sort=True):
+        s = group[[date_col, value_col]].rename(columns={date_col: "Date", value_col: "Close"})
+        s["Date"] = pd.to_datetime(s["Date"])
+        series[ticker] = s.set_index("Date").sort_index().dropna()
+    return series
+
+
+def forecast_one(ticker, series_df, model="prophet", days=30, order=(5, 1, 0), timeout=None, include_history=False):
+    """
+    Fit and forecast a single series; never raises.
+    The timeout uses SIGALRM, so it applies in pool workers and the main thread only.
+    """
+    from forecast_engine import run_prophet_forecast, run_arima_forecast
+    logging.getLogger("cmdstanpy").setLevel(logging.WARNING)
+
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM") and threading.current_thread() is threading.main_thread()
+    if use_alarm:
+        previous_handler = signal.signal(signal.SIGALRM, _raise_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+
+    start = time.perf_counter()
+    table, status, error = None, "ok", ""
+    try:
+        if model == "prophet":
+            forecast, _ = run_prophet_forecast(series_df, days)
+            if not include_history:
+                forecast = forecast.tail(days)
+        elif model == "arima":
+            forecast = run_arima_forecast(series_df, days, order=order)
+        else:
+            raise ValueError(f"Unknown model '{model}'")
+        table = forecast[["ds", "yhat", "yhat_lower", "yhat_upper"]].reset_index(drop=True)
+        table.insert(1, "ticker", ticker)
+        table.insert(2, "model", model)
+    except ForecastTimeout:
+        status, error = "timeout", f"exceeded {timeout}s"
+    except Exception as e:
+        status, error = "failed", f"{type(e).__name__}: {e}"
+    finally:
+        if use_alarm:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    return {"ticker": ticker, "status": status, "error": error,
+            "fit_seconds": round(time.perf_counter() - start, 4), "forecast": table}
+
+
+# === Run state (what was forecast last time, from which input) ===
+def _state_paths(state_dir, model):
+    return os.path.join(state_dir, f"{model}_state.json"), os.path.join(state_dir, f"{model}_forecasts.csv")
+
+
+def _load_state(state_dir, model):
+    state_path, table_path = _state_paths(state_dir, model)
+    state, previous = {}, pd.DataFrame(columns=FORECAST_COLUMNS)
+    if os.path.exists(state_path) and os.path.exists(table_path):
+        with open(state_path) as f:
+            state = json.load(f)
+        previous = pd.read_csv(table_path, parse_dates=["ds"])
+    return state, previous
+
+
+def _save_state(state_dir, model, state, table):
+    os.makedirs(state_dir, exist_ok=True)
+    state_path, table_path = _state_paths(state_dir, model)
+    table.to_csv(table_path + ".tmp", index=False)
+    os.replace(table_path + ".tmp", table_path)
+    with open(state_path + ".tmp", "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(state_path + ".tmp", state_path)
+
+
+def forecast_batch(df, model="prophet", days=30, order=(5, 1, 0), workers=None, timeout=300,
+                   skip_unchanged=True, include_history=False, state_dir=STATE_DIR,
+                   date_col="Date", ticker_col="Ticker", value_col="Close"):
+    """
+    Parameters:
+        df: long-format frame with date, ticker and close columns (date may be the index)
+        workers: process pool size (None = CPU count, 0 = run inline in this process)
+        timeout: per-series limit in seconds (None disables it)
+        skip_unchanged: reuse last run's forecasts for series with the same input and config
+    Returns:
+        (forecasts DataFrame, report DataFrame)
+    """
+    series = split_by_ticker(df, date_col, ticker_col, value_col)
+    config_key = params_key({"model": model, "days": days, "order": list(order) if model == "arima" else None,
+                             "include_history": include_history})
+    state, previous = _load_state(state_dir, model)
+
+    results, todo = [], {}
+    for ticker, s in series.items():
+        fingerprint = data_fingerprint(s)
+        last = state.get(ticker)
+        if skip_unchanged and last and last["fingerprint"] == fingerprint and last["config"] == config_key:
+            rows = previous[previous["ticker"] == ticker]
+            if len(rows):
+                results.append({"ticker": ticker, "status": "skipped", "error": "", "fit_seconds": 0.0, "forecast": rows})
+                continue
+        todo[ticker] = (s, fingerprint)
+
+    args = (model, days, tuple(order), timeout, include_history)
+    if workers == 0:
+        results.extend(forecast_one(t, s, *args) for t, (s, _) in todo.items())
+    elif todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(forecast_one, t, s, *args): t for t, (s, _) in todo.items()}
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    results.append(future.result())
+                except Exception as e:  # worker died (e.g. BrokenProcessPool)
+                    results.append({"ticker": ticker, "status": "failed", "error": f"{type(e).__name__}: {e}",
+                                    "fit_seconds": 0.0, "forecast": None})
+
+    now = time.time()
+    for r in results:
+        if r["status"] == "ok":
+            state[r["ticker"]] = {"fingerprint": todo[r["ticker"]][1], "config": config_key, "updated_at": now}
+        elif r["status"] != "skipped":
+            state.pop(r["ticker"], None)
+
+    tables = [r["forecast"] for r in results if r["forecast"] is not None]
+    forecasts = pd.concat(tables, ignore_index=True) if tables else pd.DataFrame(columns=FORECAST_COLUMNS)
+    forecasts = forecasts.sort_values(["ticker", "ds"]).reset_index(drop=True)
+    report = pd.DataFrame([{k: r[k] for k in REPORT_COLUMNS} for r in results], columns=REPORT_COLUMNS)
+    report = report.sort_values("ticker").reset_index(drop=True)
+
+    # Tickers outside this batch keep their stored forecasts
+    others = previous[~previous["ticker"].isin(series.keys())]
+    stored = pd.concat([others, forecasts], ignore_index=True) if len(others) else forecasts
+    _save_state(state_dir, model, {t: v for t, v in state.items() if t in set(stored["ticker"])}, stored)
+    return forecasts, report
+
+
+# === CLI ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Forecast every ticker in a long-format price CSV.")
+    parser.add_argument("csv", help="CSV with Date, Ticker, Close columns")
+    parser.add_argument("--model", choices=["prophet", "arima"], default="prophet")
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--force", action="store_true", help="refit series even if unchanged")
+    parser.add_argument("--out", default=None, help="write the forecast table here")
+    args = parser.parse_args()
+
+    prices = pd.read_csv(args.csv, parse_dates=["Date"])
+    start = time.perf_counter()
+    forecasts, report = forecast_batch(prices, args.model, args.days, workers=args.workers,
+                                       timeout=args.timeout, skip_unchanged=not args.force)
+    print(report.to_string(index=False))
+    print(f"\n✅ {len(report)} series in {time.perf_counter() - start:.1f}s "
+          f"({report['status'].value_counts().to_dict()})")
+    if args.out:
+        forecasts.to_csv(args.out, index=False)
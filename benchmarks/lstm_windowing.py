@@ -0,0 +1,60 @@
+"""
+Memory benchmark for the LSTM autoencoder windowing (utils.create_sequences).
+- "legacy": list of slices copied into a (n_windows, window, 1) array
+- "strided": zero-copy strided view scored chunk by chunk (lstm_reconstruction_errors)
+- Each mode runs in a fresh spawned process so peak RSS is measured in isolation (Unix only)
+Benchmark:
+    python benchmarks/lstm_windowing.py --rows 1000000 --window 30
+"""
+
+import os
+import sys
+import time
+import argparse
+import multiprocessing as mp
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import create_sequences, lstm_reconstruction_errors  # noqa: E402
+
+
+def _windowing_run(mode, n_rows, window, queue):
+    import resource  # Unix only; imported here so the module still imports elsewhere
+    rng = np.random.default_rng(0)
+    data = np.cumsum(rng.normal(size=(n_rows, 1)), axis=0)
+    data = (data - data.min()) / (data.max() - data.min())
+    # Stand-in reconstruction (window mean) keeps the benchmark about memory, not LSTM speed
+    reconstruct = lambda X: np.repeat(X.mean(axis=1, keepdims=True), X.shape[1], axis=1)
+
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.perf_counter()
+    if mode == "legacy":
+        X = np.array([data[i:i+window] for i in range(len(data) - window)])
+        X = X.reshape((X.shape[0], X.shape[1], 1))
+        errors = np.mean(np.power(X - reconstruct(X), 2), axis=(1, 2))
+    else:
+        errors = lstm_reconstruction_errors(reconstruct, create_sequences(data, window))
+    elapsed = time.perf_counter() - start
+    peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss) / 1024
+    queue.put((elapsed, peak_mb, float(errors.mean())))
+
+
+def benchmark_lstm_windowing(n_rows=1_000_000, window=30):
+    ctx = mp.get_context("spawn")
+    for mode in ("legacy", "strided"):
+        queue = ctx.Queue()
+        proc = ctx.Process(target=_windowing_run, args=(mode, n_rows, window, queue))
+        proc.start()
+        elapsed, peak_mb, mean_err = queue.get()
+        proc.join()
+        print(f"{mode:8s} {n_rows:,} rows: {elapsed:6.2f}s, peak RSS +{peak_mb:7.1f} MB, mean error {mean_err:.6f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LSTM windowing memory benchmark.")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--window", type=int, default=30)
+    args = parser.parse_args()
+    benchmark_lstm_windowing(args.rows, args.window)
@@ -0,0 +1,241 @@
+"""
+Performance regression suite for the TrendWatch pipeline (definitions in suites.py).
+- Every benchmark is warmed up once, then timed in `--repeat` samples (or
+  until `--max-seconds` is spent); the best per-call time is compared with
+  the baseline since it is the least affected by other load on the machine
+- A result slower than baseline x threshold is a regression and the run exits
+  with status 1; per-benchmark thresholds in baselines.json override the default
+- Synthetic inputs and caches live in a scratch directory, never under the repo
+- baselines.json is recorded with the numpy / pandas versions pinned in
+  requirements.txt; --save-baseline warns when the running ones differ
+Usage:
+    python benchmarks/run_benchmarks.py                      # quick profile vs baselines.json
+    python benchmarks/run_benchmarks.py --filter anomaly     # regex on benchmark names
+    python benchmarks/run_benchmarks.py --profile full --baseline benchmarks/baselines_full.json
+    python benchmarks/run_benchmarks.py --save-baseline      # record this machine's timings
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import tempfile
+import argparse
+import platform
+import statistics
+import traceback
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path[:0] = [ROOT, HERE]
+
+from suites import BENCHMARKS, SkipBenchmark, missing_requirements, param_grid  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(HERE, "baselines.json")
+DEFAULT_THRESHOLD = 1.3
+
+
+def result_key(name, params):
+    return f"{name}[{','.join(f'{k}={v}' for k, v in params.items())}]" if params else name
+
+
+def machine_info():
+    import numpy as np
+    import pandas as pd
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "processor": platform.processor() or platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def pinned_mismatches(requirements=os.path.join(ROOT, "requirements.txt")):
+    """["numpy 1.26.4 != 1.23.5", ...] for libraries whose version differs from the pin."""
+    if not os.path.exists(requirements):
+        return []
+    with open(requirements, encoding="utf-8") as f:
+        pins = dict(line.strip().split("==", 1) for line in f if "==" in line and not line.startswith("#"))
+    info = machine_info()
+    return [f"{lib} {info[lib]} != {pins[lib]}" for lib in ("numpy", "pandas") if lib in pins and info[lib] != pins[lib]]
+
+
+def time_callable(fn, repeat=5, max_seconds=10.0, min_sample=0.2):
+    """
+    Warm-up call, then up to `repeat` timed samples (at least one) within max_seconds.
+    Fast callables run several times per sample so each sample lasts about
+    min_sample seconds; reported times are per call.
+    """
+    start = time.perf_counter()
+    fn()
+    number = max(1, int(min_sample / max(time.perf_counter() - start, 1e-9)))
+    times = []
+    budget_start = time.perf_counter()
+    while len(times) < repeat:
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+        if time.perf_counter() - budget_start > max_seconds:
+            break
+    return {"min": min(times), "median": statistics.median(times), "runs": len(times) * number}
+
+
+def run_suite(profile="quick", pattern=None, repeat=5, max_seconds=10.0, workdir=None):
+    """
+    Returns:
+        dict: result key -> {"min", "median", "runs"} or {"skipped": reason} / {"error": message}
+    """
+    results = {}
+    selector = re.compile(pattern) if pattern else None
+    cwd = os.getcwd()
+    scratch = workdir or tempfile.mkdtemp(prefix="trendwatch_bench_")
+    os.makedirs(scratch, exist_ok=True)
+    os.chdir(scratch)
+    try:
+        for name, bench in BENCHMARKS.items():
+            if selector and not selector.search(name):
+                continue
+            missing = missing_requirements(bench)
+            for params in param_grid(bench, profile):
+                key = result_key(name, params)
+                if missing:
+                    results[key] = {"skipped": f"missing {', '.join(missing)}"}
+                else:
+                    try:
+                        results[key] = time_callable(bench.setup(**params), repeat, max_seconds)
+                    except SkipBenchmark as e:
+                        results[key] = {"skipped": str(e)}
+                    except Exception as e:
+                        traceback.print_exc()
+                        results[key] = {"error": f"{type(e).__name__}: {e}"}
+                print(format_line(key, results[key]), flush=True)
+    finally:
+        os.chdir(cwd)
+        if workdir is None:
+            shutil.rmtree(scratch, ignore_errors=True)
+    return results
+
+
+def _fmt_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:8.1f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:8.1f} ms"
+    return f"{seconds:8.2f} s "
+
+
+def format_line(key, result):
+    if "skipped" in result:
+        return f"{key:55s} skipped ({result['skipped']})"
+    if "error" in result:
+        return f"{key:55s} ERROR {result['error']}"
+    return f"{key:55s} {_fmt_seconds(result['min'])}  (median {_fmt_seconds(result['median']).strip()}, {result['runs']} runs)"
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """
+    Returns:
+        dict: result key -> (status, ratio) with status "regression", "improved", "ok" or "new"
+    """
+    reference = baseline.get("results", {})
+    overrides = baseline.get("thresholds", {})
+    report = {}
+    for key, result in results.items():
+        if "min" not in result:
+            continue
+        if key not in reference:
+            report[key] = ("new", None)
+            continue
+        limit = overrides.get(key, overrides.get(key.split("[")[0], threshold))
+        ratio = result["min"] / reference[key]["min"]
+        status = "regression" if ratio > limit else "improved" if ratio < 1 / limit else "ok"
+        report[key] = (status, ratio)
+    return report
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, profile, previous=None):
+    """Merge timed results into the baseline file, keeping hand-tuned thresholds."""
+    baseline = previous or {}
+    merged = dict(baseline.get("results", {}))
+    merged.update({k: {"min": float(f"{v['min']:.4g}"), "median": float(f"{v['median']:.4g}")}
+                   for k, v in results.items() if "min" in v})
+    payload = {
+        "profile": profile,
+        "machine": machine_info(),
+        "recorded": time.strftime("%Y-%m-%d"),
+        "thresholds": baseline.get("thresholds", {}),
+        "results": dict(sorted(merged.items())),
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, indent=2)
+        f.write("\n")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="TrendWatch performance regression suite.")
+    parser.add_argument("--profile", choices=["quick", "full"], default="quick")
+    parser.add_argument("--filter", default=None, help="regex on benchmark names")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="time budget per benchmark")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="regression when min time > baseline x threshold")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--output", default=None, help="write this run's results as JSON")
+    parser.add_argument("--workdir", default=None, help="keep synthetic data here between runs")
+    parser.add_argument("--list", action="store_true")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        for name, bench in BENCHMARKS.items():
+            grid = param_grid(bench, args.profile)
+            print(f"{name:35s} {len(grid)} size(s)  {', '.join(result_key('', p).strip('[]') for p in grid)}")
+        return 0
+
+    baseline = load_baseline(args.baseline)
+    if baseline and baseline.get("machine") != machine_info():
+        print(f"⚠️ {args.baseline} was recorded on a different machine / library versions; "
+              f"re-record it with --save-baseline before trusting the comparison.\n")
+
+    results = run_suite(args.profile, args.filter, args.repeat, args.max_seconds, args.workdir)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"profile": args.profile, "machine": machine_info(), "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        save_baseline(args.baseline, results, args.profile, baseline)
+        print(f"\nsaved baseline {args.baseline}")
+        mismatches = pinned_mismatches()
+        if mismatches:
+            print(f"⚠️ recorded on unpinned versions ({', '.join(mismatches)}); "
+                  f"re-record in an environment installed from requirements.txt")
+        return 0
+    if not baseline:
+        print(f"\nno baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    report = compare(results, baseline, args.threshold)
+    print("\nComparison with baseline:")
+    for key, (status, ratio) in report.items():
+        if status != "ok":
+            print(f"  {status.upper():10s} {key:55s} {'' if ratio is None else f'{ratio:5.2f}x'}")
+    regressions = [k for k, (status, _) in report.items() if status == "regression"]
+    errors = [k for k, r in results.items() if "error" in r]
+    print(f"  {len(report)} compared, {len(regressions)} regression(s), {len(errors)} error(s)")
+    return 1 if regressions or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,390 @@
+"""
+Benchmark definitions for run_benchmarks.py.
+Each benchmark is a setup function taking one parameter combination and
+returning the zero-argument callable to time; data generation, model fits
+and index builds stay outside the timed region.
+- Sizes come from the profile: "quick" (1k-100k rows, 1-100 tickers) for
+  every commit, "full" (up to 10M rows, 5k tickers) for release checks
+- Benchmarks whose optional backend (Prophet, TensorFlow, FinBERT weights,
+  matplotlib) is missing are reported as skipped, not failed
+- All data is synthetic and seeded, so timings are comparable across runs
+"""
+
+import os
+import importlib.util
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+Benchmark = namedtuple("Benchmark", ["name", "setup", "params", "requires"])
+
+BENCHMARKS = {}
+
+ROWS = {"quick": [1_000, 100_000], "full": [1_000, 100_000, 1_000_000, 10_000_000]}
+TICKERS = {"quick": [1, 100], "full": [1, 100, 1_000, 5_000]}
+TRADING_DAYS = 252
+
+
+class SkipBenchmark(Exception):
+    """Raised by a setup function when the benchmark cannot run in this environment."""
+
+
+def benchmark(name, requires=(), **params):
+    """
+    Register a setup function.
+    Parameters:
+        requires: importable module names; missing ones skip the benchmark
+        params: parameter name -> {profile: [values]} (or one list for every profile)
+    """
+    def decorator(setup):
+        BENCHMARKS[name] = Benchmark(name, setup, params, tuple(requires))
+        return setup
+    return decorator
+
+
+def missing_requirements(bench):
+    return [mod for mod in bench.requires if importlib.util.find_spec(mod) is None]
+
+
+def param_grid(bench, profile):
+    """List of {param: value} dicts for one profile (cartesian product)."""
+    grid = [{}]
+    for key, values in bench.params.items():
+        values = values.get(profile, values.get("quick")) if isinstance(values, dict) else values
+        grid = [dict(combo, **{key: value}) for combo in grid for value in values]
+    return grid
+
+
+# === Synthetic data ===
+def synthetic_prices(n_rows, seed=0):
+    """Single-ticker OHLCV frame indexed by Date, shaped like load_data() output."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.standard_normal(n_rows) * 0.01))
+    # Injected spikes so the detectors have something to find
+    spikes = rng.choice(n_rows, size=max(1, n_rows // 500), replace=False)
+    close[spikes] *= 1 + rng.choice([-1, 1], size=len(spikes)) * 0.08
+    dates = pd.date_range("1990-01-01", periods=n_rows, freq="min" if n_rows > 20_000 else "B")
+    return pd.DataFrame({
+        'Open': close * 0.995,
+        'High': close * 1.01,
+        'Low': close * 0.99,
+        'Close': close,
+        'Volume': rng.integers(100_000, 10_000_000, n_rows).astype(float),
+    }, index=pd.Index(dates, name='Date'))
+
+
+def synthetic_long_prices(n_tickers, n_days=TRADING_DAYS * 10, seed=0):
+    """Long (Date, Ticker, Close) frame with a common market factor."""
+    rng = np.random.default_rng(seed)
+    market = rng.standard_normal((n_days, 1)) * 0.01
+    returns = market * rng.uniform(0.5, 1.5, n_tickers) + rng.standard_normal((n_days, n_tickers)) * 0.015
+    close = 100 * np.exp(np.cumsum(returns, axis=0))
+    dates = pd.bdate_range("2015-01-02", periods=n_days)
+    return pd.DataFrame({
+        'Date': np.repeat(dates, n_tickers),
+        'Ticker': np.tile([f"T{i:04d}" for i in range(n_tickers)], n_days),
+        'Close': close.ravel(),
+    })
+
+
+def synthetic_returns(n_tickers, n_days=TRADING_DAYS * 10, seed=0):
+    from risk_engine import returns_matrix
+    returns = returns_matrix(synthetic_long_prices(n_tickers, n_days, seed))
+    weights = np.random.default_rng(seed + 1).uniform(1, 10, returns.shape[1])
+    return returns, pd.Series(weights / weights.sum(), index=returns.columns)
+
+
+HEADLINE_PARTS = (
+    ["Shares of", "Analysts upgrade", "Investors dump", "Regulators probe", "Traders cheer"],
+    ["Alphabet", "Apple", "Tesla", "Nvidia", "Amazon", "Microsoft", "Meta", "Netflix"],
+    ["after record quarterly earnings", "amid antitrust fears", "as guidance disappoints",
+     "on strong cloud growth", "following a surprise CEO exit", "despite weak ad revenue"],
+)
+
+
+def synthetic_headlines(n, seed=0):
+    """Unique headlines (a numeric suffix defeats the FinBERT result cache)."""
+    rng = np.random.default_rng(seed)
+    picks = [rng.integers(0, len(part), n) for part in HEADLINE_PARTS]
+    return [f"{HEADLINE_PARTS[0][a]} {HEADLINE_PARTS[1][b]} {HEADLINE_PARTS[2][c]} ({i})"
+            for i, (a, b, c) in enumerate(zip(*picks))]
+
+
+def _workdir(*parts):
+    path = os.path.join(os.getcwd(), *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+# === Data loading ===
+@benchmark("data.load_data_csv", rows=ROWS)
+def setup_load_data_csv(rows):
+    from data_loader import load_data
+    path = os.path.join(_workdir("data"), f"prices_{rows}.csv")
+    if not os.path.exists(path):
+        synthetic_prices(rows).to_csv(path)
+    return lambda: load_data(path, use_cache=False)
+
+
+@benchmark("data.load_data_parquet", rows=ROWS)
+def setup_load_data_parquet(rows):
+    import data_loader
+    path = os.path.join(_workdir("data"), f"prices_{rows}.csv")
+    if not os.path.exists(path):
+        synthetic_prices(rows).to_csv(path)
+    data_loader.load_data(path)  # one-off conversion
+
+    def run():
+        data_loader._memory.clear()  # time the Parquet read, not the LRU hit
+        return data_loader.load_data(path)
+    return run
+
+
+@benchmark("data.load_dataset_one_ticker", tickers=TICKERS)
+def setup_load_dataset(tickers):
+    from data_loader import build_dataset, load_dataset
+    root = _workdir("dataset", str(tickers))
+    build_dataset(synthetic_long_prices(tickers), root=root)
+    return lambda: load_dataset(root, tickers=["T0000"], start="2018-01-01", end="2018-12-31")
+
+
+# === Anomaly detectors (utils.py) ===
+@benchmark("anomaly.zscore", rows=ROWS)
+def setup_zscore(rows):
+    from utils import detect_anomalies_zscore
+    df = synthetic_prices(rows)
+    return lambda: detect_anomalies_zscore(df)
+
+
+@benchmark("anomaly.zscore_long", tickers=TICKERS)
+def setup_zscore_long(tickers):
+    from zscore_engine import rolling_zscore_long
+    long_df = synthetic_long_prices(tickers)
+    return lambda: rolling_zscore_long(long_df)
+
+
+@benchmark("anomaly.isolation_fit", rows=ROWS)
+def setup_isolation_fit(rows):
+    from utils import fit_isolation_forest
+    df = synthetic_prices(rows)
+    return lambda: fit_isolation_forest(df)
+
+
+@benchmark("anomaly.isolation", rows=ROWS)
+def setup_isolation(rows):
+    from model_registry import ModelRegistry
+    from utils import detect_anomalies_isolation
+    df = synthetic_prices(rows)
+    registry = ModelRegistry(_workdir("registry"))
+    detect_anomalies_isolation(df, ticker="BENCH", registry=registry)  # fit outside the timed region
+    return lambda: detect_anomalies_isolation(df, ticker="BENCH", registry=registry)
+
+
+@benchmark("anomaly.lstm_scoring", rows=ROWS)
+def setup_lstm_scoring(rows):
+    """Windowing + chunked error computation with a near-identity stand-in for the autoencoder."""
+    from sklearn.preprocessing import MinMaxScaler
+    from utils import score_lstm_autoencoder
+    df = synthetic_prices(rows)
+    scaler = MinMaxScaler().fit(df[['Close']])
+    return lambda: score_lstm_autoencoder(df, lambda X: X * 0.99, scaler)
+
+
+@benchmark("anomaly.lstm", requires=("tensorflow",), rows={"quick": [1_000], "full": [1_000, 100_000]})
+def setup_lstm(rows):
+    from model_registry import ModelRegistry
+    from utils import detect_anomalies_lstm
+    df = synthetic_prices(rows)
+    registry = ModelRegistry(_workdir("registry"))
+    detect_anomalies_lstm(df, ticker="BENCH", registry=registry)
+    return lambda: detect_anomalies_lstm(df, ticker="BENCH", registry=registry)
+
+
+@benchmark("plots.anomaly_figure", rows=ROWS)
+def setup_anomaly_figure(rows):
+    """Downsampled figure build + JSON serialization (the payload Streamlit sends)."""
+    from plots import plot_anomalies
+    from utils import detect_anomalies_zscore
+    df = detect_anomalies_zscore(synthetic_prices(rows))
+    return lambda: plot_anomalies(df, "anomaly_zscore").to_json()
+
+
+# === Forecasters (forecast_engine.py) ===
+FORECAST_ROWS = {"quick": [1_000], "full": [1_000, 10_000, 100_000]}
+
+
+@benchmark("forecast.arima", requires=("statsmodels",), rows=FORECAST_ROWS)
+def setup_arima(rows):
+    from forecast_engine import run_arima_forecast
+    df = synthetic_prices(rows)
+    return lambda: run_arima_forecast(df, days=30)
+
+
+@benchmark("forecast.prophet", requires=("prophet",), rows=FORECAST_ROWS)
+def setup_prophet(rows):
+    from forecast_engine import run_prophet_forecast
+    df = synthetic_prices(rows)
+    return lambda: run_prophet_forecast(df, days=30)
+
+
+# === Sentiment (sentiment_model.py) ===
+@benchmark("sentiment.vader", texts={"quick": [1_000, 10_000], "full": [1_000, 10_000, 100_000]})
+def setup_vader(texts):
+    from sentiment_model import batch_sentiment
+    headlines = synthetic_headlines(texts)
+    return lambda: batch_sentiment(headlines, method="vader")
+
+
+@benchmark("sentiment.finbert", requires=("transformers", "torch"),
+           texts={"quick": [256], "full": [256, 4_096]})
+def setup_finbert(texts):
+    from huggingface_hub import try_to_load_from_cache
+    import sentiment_model
+    if not isinstance(try_to_load_from_cache("yiyanghkust/finbert-tone", "config.json"), str):
+        raise SkipBenchmark("FinBERT weights not in the local Hugging Face cache")
+    headlines = synthetic_headlines(texts)
+
+    def run():
+        sentiment_model.finbert_cache.clear()  # time inference, not cache hits
+        return sentiment_model.batch_sentiment(headlines, method="finbert")
+    return run
+
+
+def _sentiment_store(history, start, end, name, seed=0):
+    from sentiment_features import SentimentFeatureStore, bucket_scores
+    rng = np.random.default_rng(seed)
+    store = SentimentFeatureStore(_workdir("sentiment_features", name))
+    times = pd.Series(pd.to_datetime(rng.integers(pd.Timestamp(start).value, pd.Timestamp(end).value, size=history)))
+    store.ingest(bucket_scores(np.full(history, "T000"), times, rng.uniform(-1, 1, history)), 1)
+    return store
+
+
+@benchmark("sentiment.feature_update", history={"quick": [10_000, 1_000_000], "full": [10_000, 1_000_000, 10_000_000]})
+def setup_feature_update(history):
+    """1,000 new scored articles into a store holding `history` (should not grow with history)."""
+    from itertools import count
+    from sentiment_features import bucket_scores
+    store = _sentiment_store(history, "2015-01-01", "2025-01-01", f"update_{history}")
+    rng = np.random.default_rng(1)
+    times = pd.Series(pd.to_datetime(rng.integers(pd.Timestamp("2025-01-01").value, pd.Timestamp("2025-01-02").value, 1_000)))
+    scores = rng.uniform(-1, 1, 1_000)
+    ids = count(2)
+    return lambda: store.ingest(bucket_scores(np.full(1_000, "T000"), times, scores), next(ids))
+
+
+@benchmark("sentiment.asof_join", rows=ROWS)
+def setup_asof_join(rows):
+    from sentiment_features import join_sentiment
+    df = synthetic_prices(rows)
+    store = _sentiment_store(max(rows // 10, 100), df.index[0], df.index[-1], f"join_{rows}")
+    store.bars("T000")
+    return lambda: join_sentiment(df, "T000", store)
+
+
+# === Portfolio ===
+@benchmark("portfolio.risk", tickers=TICKERS)
+def setup_portfolio_risk(tickers):
+    from risk_engine import portfolio_risk
+    returns, weights = synthetic_returns(tickers)
+    return lambda: portfolio_risk(returns, weights)
+
+
+@benchmark("portfolio.rolling_risk", tickers=TICKERS)
+def setup_rolling_risk(tickers):
+    from risk_engine import rolling_portfolio_risk
+    returns, weights = synthetic_returns(tickers)
+    return lambda: rolling_portfolio_risk(returns, weights)
+
+
+@benchmark("portfolio.risk_metrics", requires=("matplotlib", "seaborn"), tickers=TICKERS)
+def setup_risk_metrics(tickers):
+    from portfolio_analyzer import compute_risk_metrics
+    prices = synthetic_long_prices(tickers)
+    return lambda: compute_risk_metrics(prices)
+
+
+@benchmark("portfolio.analyze_var", requires=("matplotlib", "seaborn"), tickers=TICKERS)
+def setup_analyze_var(tickers):
+    from portfolio_analyzer import analyze_portfolio_var
+    workdir = _workdir("portfolio", str(tickers))
+    prices_path = os.path.join(workdir, "prices.csv")
+    portfolio_path = os.path.join(workdir, "portfolio.csv")
+    synthetic_long_prices(tickers).to_csv(prices_path, index=False)
+    pd.DataFrame({
+        'Ticker': [f"T{i:04d}" for i in range(tickers)],
+        'Qty': np.arange(1, tickers + 1) * 10,
+        'Entry_Price': 100.0,
+    }).to_csv(portfolio_path, index=False)
+
+    def run():
+        result = analyze_portfolio_var(portfolio_path, prices_path)
+        if isinstance(result, str):  # errors come back as a message, not an exception
+            raise RuntimeError(result)
+        return result
+    return run
+
+
+@benchmark("portfolio.monte_carlo", paths={"quick": [10_000], "full": [10_000, 100_000]},
+           tickers={"quick": [10], "full": [10, 100]})
+def setup_monte_carlo(paths, tickers):
+    from monte_carlo import simulate_paths
+    returns, weights = synthetic_returns(tickers, n_days=TRADING_DAYS * 3)
+    mu, cov = returns.mean().to_numpy(), returns.cov().to_numpy()
+    return lambda: simulate_paths(mu, cov, weights.to_numpy(), n_paths=paths, steps=TRADING_DAYS, seed=0)
+
+
+# === RAG retrieval (stub embedder, no API calls) ===
+def _synthetic_kb(folder, n_docs):
+    os.makedirs(folder, exist_ok=True)
+    headlines = synthetic_headlines(n_docs * 5, seed=3)
+    for i in range(n_docs):
+        with open(os.path.join(folder, f"doc_{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write("\n".join(headlines[i * 5:(i + 1) * 5]))
+
+
+@benchmark("rag.retrieval", requires=("faiss",), docs={"quick": [100, 1_000], "full": [100, 1_000, 10_000]})
+def setup_rag_retrieval(docs):
+    from embedding_backends import HashEmbeddings
+    from index_store import IndexStore
+    kb_dir = _workdir("kb", str(docs))
+    _synthetic_kb(kb_dir, docs)
+    store = IndexStore(kb_dir, index_dir=_workdir("index", str(docs)), embeddings=HashEmbeddings())
+    store.sync()
+    queries = synthetic_headlines(50, seed=7)
+
+    def run():
+        return [store.vectordb.similarity_search(q, k=4) for q in queries]
+    return run
+
+
+@benchmark("rag.hybrid_retrieval", requires=("faiss",), docs={"quick": [100, 1_000], "full": [100, 1_000, 10_000]},
+           queries=["tickers", "plain"])
+def setup_rag_hybrid_retrieval(docs, queries):
+    from embedding_backends import HashEmbeddings
+    from hybrid_retriever import HybridRetriever
+    from index_store import IndexStore
+    kb_dir = _workdir("kb", str(docs))
+    _synthetic_kb(kb_dir, docs)
+    store = IndexStore(kb_dir, index_dir=_workdir("index", str(docs)), embeddings=HashEmbeddings())
+    store.sync()
+    retriever = HybridRetriever.from_index_store(store)
+    questions = synthetic_headlines(50, seed=7)
+    if queries == "plain":
+        # no company named, so there is no ticker filter to apply
+        for company in HEADLINE_PARTS[1]:
+            questions = [q.replace(f" {company} ", " ") for q in questions]
+
+    def run():
+        return [retriever.retrieve(q) for q in questions]
+    return run
+
+
+@benchmark("rag.index_build", requires=("faiss",), docs={"quick": [100], "full": [100, 1_000]})
+def setup_rag_index_build(docs):
+    from embedding_backends import HashEmbeddings
+    from index_store import IndexStore
+    kb_dir = _workdir("kb", str(docs))
+    _synthetic_kb(kb_dir, docs)
+    store = IndexStore(kb_dir, index_dir=_workdir("index_build", str(docs)), embeddings=HashEmbeddings())
+    return store.rebuild
@@ -1,12 +1,293 @@
+"""
+Price data loading.
+CSV sources (the bundled file or an upload) are converted once to Parquet
+under ./cache/data, keyed by a hash of the file contents, and read back with
+explicit dtypes, column projection and date-range predicates. A small
+in-process LRU serves Streamlit reruns from memory.
+Many tickers: build_dataset / load_dataset keep one Ticker-partitioned Parquet dataset.
+Benchmark:
+    python data_loader.py bench --tickers 200
+"""
+
+import os
+import io
+import time
+import json
+import hashlib
+import argparse
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from instrumentation import instrument
+
+DEFAULT_CSV = "data/cleaned_google_stock.csv"
+CACHE_DIR = "./cache/data"
+DATASET_DIR = "./data/dataset"
+MEMORY_ENTRIES = 8
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+
+_memory = OrderedDict()
+_path_hashes = {}
+_lock = threading.Lock()
 
-def load_data(file):
-    if file:
-        df = pd.read_csv(file)
-    else:
-        df = pd.read_csv("data/cleaned_google_stock.csv")  
 
+# === Source hashing and conversion ===
+def _read_bytes(file):
+    if hasattr(file, "getvalue"):
+        return file.getvalue()
+    if hasattr(file, "read"):
+        pos = file.tell() if hasattr(file, "tell") else None
+        data = file.read()
+        if pos is not None:
+            file.seek(pos)
+        return data.encode("utf-8") if isinstance(data, str) else data
+    with open(file, "rb") as f:
+        return f.read()
+
+
+def source_hash(file):
+    """sha256 of the source contents; paths are re-hashed only when size or mtime change."""
+    if isinstance(file, (str, os.PathLike)):
+        stat = os.stat(file)
+        sig = (os.path.abspath(file), stat.st_size, stat.st_mtime_ns)
+        if sig not in _path_hashes:
+            _path_hashes[sig] = hashlib.sha256(_read_bytes(file)).hexdigest()
+        return _path_hashes[sig]
+    return hashlib.sha256(_read_bytes(file)).hexdigest()
+
+
+def _parse_csv(raw):
+    df = pd.read_csv(io.BytesIO(raw))
     df['Date'] = pd.to_datetime(df['Date'])
-    df = df.set_index('Date').sort_index()
-    df = df.dropna()
-    return df
+    return df.sort_values('Date', kind="stable").dropna().reset_index(drop=True)
+
+
+def convert_to_parquet(file, cache_dir=CACHE_DIR):
+    """Parse a CSV source once and store it as Parquet. Returns the Parquet path."""
+    path = os.path.join(cache_dir, f"{source_hash(file)[:32]}.parquet")
+    if not os.path.exists(path):
+        os.makedirs(cache_dir, exist_ok=True)
+        table = pa.Table.from_pandas(_parse_csv(_read_bytes(file)), preserve_index=False)
+        pq.write_table(table, path + ".tmp")
+        os.replace(path + ".tmp", path)
+    return path
+
+
+def _end_bound(end):
+    """(op, bound) for `end`: a date without a time part includes that whole day (bars are stamped 16:00)."""
+    end = pd.Timestamp(end)
+    if end == end.normalize():
+        return "<", end + pd.Timedelta(days=1)
+    return "<=", end
+
+
+def _date_filters(start, end, date_col="Date"):
+    filters = []
+    if start is not None:
+        filters.append((date_col, ">=", pd.Timestamp(start)))
+    if end is not None:
+        filters.append((date_col, *_end_bound(end)))
+    return filters or None
+
+
+def _finish(df, dtype, index_col="Date"):
+    if dtype is not None:
+        floats = df.select_dtypes(include="floating").columns
+        df[floats] = df[floats].astype(dtype)
+    return df.set_index(index_col) if index_col in df.columns else df
+
+
+@instrument()
+def load_data(file, columns=None, start=None, end=None, dtype=None, use_cache=True):
+    """
+    Parameters:
+        file: uploaded file / path, or None for the bundled GOOG data
+        columns: subset of price columns to load (Date is always loaded)
+        start, end: inclusive date range pushed down to the Parquet reader
+            (an `end` without a time part keeps all bars of that day)
+        dtype: e.g. "float32" to halve memory of price columns
+        use_cache: False reads the CSV directly (original behaviour)
+    Returns:
+        DataFrame indexed by Date, sorted, without NaN rows
+    """
+    file = file or DEFAULT_CSV
+    if not use_cache:
+        df = _parse_csv(_read_bytes(file))
+        if columns is not None:
+            df = df[['Date'] + list(columns)]
+        if start is not None:
+            df = df[df['Date'] >= pd.Timestamp(start)]
+        if end is not None:
+            op, bound = _end_bound(end)
+            df = df[df['Date'] < bound] if op == "<" else df[df['Date'] <= bound]
+        return _finish(df, dtype)
+
+    digest = source_hash(file)
+    key = (digest, tuple(columns) if columns is not None else None, str(start), str(end), str(dtype))
+    with _lock:
+        if key in _memory:
+            _memory.move_to_end(key)
+            return _memory[key].copy()
+
+    read_columns = None if columns is None else ['Date'] + [c for c in columns if c != 'Date']
+    df = pd.read_parquet(convert_to_parquet(file), columns=read_columns, filters=_date_filters(start, end))
+    df = _finish(df, dtype)
+    with _lock:
+        _memory[key] = df
+        if len(_memory) > MEMORY_ENTRIES:
+            _memory.popitem(last=False)
+    return df.copy()
+
+
+# === Multi-ticker partitioned dataset ===
+def build_dataset(sources, root=DATASET_DIR, ticker_col="Ticker"):
+    """
+    Write or refresh a Ticker-partitioned Parquet dataset.
+    Parameters:
+        sources: {ticker: csv path / file}, or one long CSV / DataFrame with a Ticker column
+    Only tickers whose source contents changed are rewritten (hashes in _manifest.json).
+    Returns:
+        list of tickers written
+    """
+    os.makedirs(root, exist_ok=True)
+    manifest_path = os.path.join(root, "_manifest.json")
+    manifest = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+
+    if isinstance(sources, dict):
+        frames = {}
+        for ticker, file in sources.items():
+            digest = source_hash(file)
+            if manifest.get(ticker) != digest:
+                frames[ticker] = (digest, _parse_csv(_read_bytes(file)))
+    else:
+        long_df = sources if isinstance(sources, pd.DataFrame) else _parse_csv(_read_bytes(sources))
+        long_df = long_df.copy()
+        long_df['Date'] = pd.to_datetime(long_df['Date'])
+        frames = {}
+        for ticker, group in long_df.groupby(ticker_col, sort=False):
+            group = group.drop(columns=ticker_col).sort_values('Date', kind="stable").dropna()
+            digest = hashlib.sha256(pd.util.hash_pandas_object(group, index=False).to_numpy().tobytes()).hexdigest()
+            if manifest.get(ticker) != digest:
+                frames[ticker] = (digest, group.reset_index(drop=True))
+
+    for ticker, (digest, df) in frames.items():
+        part_dir = os.path.join(root, f"{ticker_col}={ticker}")
+        os.makedirs(part_dir, exist_ok=True)
+        path = os.path.join(part_dir, "part-0.parquet")
+        pq.write_table(pa.Table.from_pandas(df, preserve_index=False), path + ".tmp")
+        os.replace(path + ".tmp", path)
+        manifest[ticker] = digest
+
+    with open(manifest_path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_path + ".tmp", manifest_path)
+    return list(frames)
+
+
+def load_dataset(root=DATASET_DIR, tickers=None, columns=None, start=None, end=None, dtype=None, ticker_col="Ticker"):
+    """
+    Read a long (Date, Ticker, ...) frame from the partitioned dataset.
+    Ticker and date predicates prune partitions and row groups before any data is decoded.
+    """
+    dataset = ds.dataset(root, format="parquet", partitioning="hive", exclude_invalid_files=True)
+    expr = None
+    conditions = []
+    if tickers is not None:
+        conditions.append(ds.field(ticker_col).isin(list(tickers)))
+    if start is not None:
+        conditions.append(ds.field('Date') >= pa.scalar(pd.Timestamp(start), type=pa.timestamp("ns")))
+    if end is not None:
+        op, bound = _end_bound(end)
+        bound = pa.scalar(bound, type=pa.timestamp("ns"))
+        conditions.append(ds.field('Date') < bound if op == "<" else ds.field('Date') <= bound)
+    for condition in conditions:
+        expr = condition if expr is None else expr & condition
+    read_columns = None if columns is None else ['Date', ticker_col] + [c for c in columns if c not in ('Date', ticker_col)]
+    df = dataset.to_table(columns=read_columns, filter=expr).to_pandas()
+    df[ticker_col] = df[ticker_col].astype(str)
+    df = df.sort_values([ticker_col, 'Date'], kind="stable").reset_index(drop=True)
+    return _finish(df, dtype, index_col=None)
+
+
+# === Benchmark ===
+def _synthetic_long_csv(path, n_tickers=200, n_days=2520, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range("2015-01-02", periods=n_days) + pd.Timedelta(hours=16)
+    close = 100 * np.exp(np.cumsum(rng.standard_normal((n_days, n_tickers)) * 0.02, axis=0))
+    frame = pd.DataFrame({
+        'Date': np.repeat(dates, n_tickers),
+        'Ticker': np.tile([f"T{i:04d}" for i in range(n_tickers)], n_days),
+        'Open': close.ravel() * 0.995,
+        'High': close.ravel() * 1.01,
+        'Low': close.ravel() * 0.99,
+        'Close': close.ravel(),
+        'Volume': rng.integers(1e5, 1e7, n_days * n_tickers).astype(float),
+    })
+    frame.to_csv(path, index=False)
+
+
+def _timed(fn, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def benchmark(n_tickers=200, workdir="./cache/data_bench"):
+    os.makedirs(workdir, exist_ok=True)
+    csv_path = os.path.join(workdir, f"prices_{n_tickers}.csv")
+    if not os.path.exists(csv_path):
+        _synthetic_long_csv(csv_path, n_tickers)
+    cache_dir = os.path.join(workdir, "single")
+    root = os.path.join(workdir, "dataset")
+
+    def mb(df):
+        return df.memory_usage(deep=True).sum() / 1e6
+
+    print(f"Bundled file ({DEFAULT_CSV}):")
+    t_csv, df = _timed(lambda: load_data(None, use_cache=False))
+    print(f"  CSV parse every call      : {t_csv * 1e3:8.1f} ms, {mb(df):6.2f} MB")
+    _memory.clear()
+    t_pq, df = _timed(lambda: (_memory.clear(), load_data(None))[1])
+    print(f"  Parquet (converted once)  : {t_pq * 1e3:8.1f} ms, {mb(df):6.2f} MB")
+    t_mem, df = _timed(lambda: load_data(None))
+    print(f"  in-memory LRU (rerun)     : {t_mem * 1e3:8.1f} ms")
+
+    size_mb = os.path.getsize(csv_path) / 1e6
+    print(f"\n{n_tickers} tickers x 10y long CSV ({size_mb:.0f} MB):")
+    t_csv, df = _timed(lambda: _parse_csv(_read_bytes(csv_path)), repeat=1)
+    print(f"  CSV parse                 : {t_csv:8.2f} s,  {mb(df):6.1f} MB")
+    start = time.perf_counter()
+    build_dataset(csv_path, root=root)
+    print(f"  one-off partitioned build : {time.perf_counter() - start:8.2f} s")
+    t_all, df = _timed(lambda: load_dataset(root))
+    print(f"  dataset, all tickers      : {t_all:8.2f} s,  {mb(df):6.1f} MB")
+    t_f32, df = _timed(lambda: load_dataset(root, columns=['Close'], dtype="float32"))
+    print(f"  dataset, Close as float32 : {t_f32:8.2f} s,  {mb(df):6.1f} MB")
+    t_one, df = _timed(lambda: load_dataset(root, tickers=['T0001'], start="2020-01-01", end="2020-12-31"))
+    print(f"  dataset, 1 ticker x 1 year: {t_one * 1e3:8.1f} ms, {len(df)} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Columnar price data layer.")
+    parser.add_argument("command", choices=["bench", "build"])
+    parser.add_argument("--tickers", type=int, default=200, help="synthetic tickers for bench")
+    parser.add_argument("--source", help="long CSV with a Ticker column (build)")
+    parser.add_argument("--root", default=DATASET_DIR)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark(args.tickers)
+    else:
+        print(f"rewrote {len(build_dataset(args.source, root=args.root))} ticker partitions under {args.root}")
@@ -0,0 +1,104 @@
+"""
+Pluggable embedding backends for the RAG assistant.
+- openai: OpenAIEmbeddings (default, needs OPENAI_API_KEY)
+- huggingface: local sentence-transformers model, no API calls
+- hash: deterministic hashing embedder for offline runs and checks
+The backend is picked by name or by the EMBEDDINGS_BACKEND env variable.
+Backends are wrapped in the on-disk embedding cache unless EMBEDDINGS_CACHE=0.
+"""
+
+import os
+import re
+import hashlib
+import functools
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+DEFAULT_BACKEND = "openai"
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+@functools.lru_cache(maxsize=1 << 16)
+def _token_slot(token, dim):
+    """(bucket, sign) of a token; cached since a corpus repeats a small vocabulary."""
+    digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest[:4], "little") % dim, 1.0 if digest[4] & 1 else -1.0
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Deterministic stand-in embedder (signed feature hashing of word tokens).
+    Same text -> same vector on every machine, so indexes built offline
+    can be compared byte for byte.
+    """
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.model = f"hash-{dim}"
+
+    def _embed(self, text):
+        vec = np.zeros(self.dim, dtype="float32")
+        slots = [_token_slot(token, self.dim) for token in TOKEN_PATTERN.findall(text.lower())]
+        if slots:
+            buckets, signs = zip(*slots)
+            np.add.at(vec, list(buckets), signs)
+        norm = np.linalg.norm(vec)
+        if norm > 0:
+            vec /= norm
+        return vec.tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+def _openai_backend():
+    from langchain.embeddings import OpenAIEmbeddings
+    return OpenAIEmbeddings()
+
+
+def _huggingface_backend():
+    from langchain.embeddings import HuggingFaceEmbeddings
+    model_name = os.getenv("HF_EMBEDDINGS_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    return HuggingFaceEmbeddings(model_name=model_name)
+
+
+def _hash_backend():
+    return HashEmbeddings(dim=int(os.getenv("HASH_EMBEDDINGS_DIM", "384")))
+
+
+EMBEDDING_BACKENDS = {
+    "openai": _openai_backend,
+    "huggingface": _huggingface_backend,
+    "hash": _hash_backend,
+}
+
+
+def register_embeddings(name, factory):
+    """Register a zero-argument factory returning a langchain Embeddings object."""
+    EMBEDDING_BACKENDS[name] = factory
+
+
+def get_embeddings(name=None, cache=None):
+    name = (name or os.getenv("EMBEDDINGS_BACKEND", DEFAULT_BACKEND)).lower()
+    if name not in EMBEDDING_BACKENDS:
+        raise ValueError(f"Unknown embeddings backend '{name}'. Choose from: {sorted(EMBEDDING_BACKENDS)}")
+    embeddings = EMBEDDING_BACKENDS[name]()
+
+    if cache is None:
+        cache = os.getenv("EMBEDDINGS_CACHE", "1") != "0"
+    if cache:
+        from embedding_cache import CachedEmbeddings, get_embedding_cache
+        embeddings = CachedEmbeddings(embeddings, get_embedding_cache(), embedding_model_id(embeddings))
+    return embeddings
+
+
+def embedding_model_id(embeddings):
+    """Stable identifier of an embeddings object, stored next to the index."""
+    if hasattr(embeddings, "underlying"):
+        return embedding_model_id(embeddings.underlying)
+    model = getattr(embeddings, "model", None) or getattr(embeddings, "model_name", None)
+    return f"{type(embeddings).__name__}:{model}"
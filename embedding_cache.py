@@ -0,0 +1,184 @@
+"""
+Content-addressed embedding cache for the RAG pipeline.
+- Key: sha256 of model id + chunk text, so identical news text is embedded once
+- Stored in SQLite on disk, bounded in size with least-recently-used eviction
+- Batched lookups/inserts and hit/miss counters
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+import numpy as np
+from langchain.embeddings.base import Embeddings
+
+CACHE_PATH = "./cache/embeddings.sqlite"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+LOOKUP_BATCH = 500
+
+
+def cache_key(model_id, text):
+    return hashlib.sha256(f"{model_id}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    def __init__(self, path=CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, vector BLOB NOT NULL, nbytes INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON embeddings(last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys):
+        """
+        Returns:
+            dict: key -> list[float] for the keys found in the cache
+        """
+        found = {}
+        now = time.time()
+        with self._lock:
+            for start in range(0, len(keys), LOOKUP_BATCH):
+                batch = keys[start:start + LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype="float32").tolist()
+            if found:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?", [(now, k) for k in found]
+                )
+                self._conn.commit()
+            unique = set(keys)
+            self.hits += len(unique & found.keys())
+            self.misses += len(unique - found.keys())
+        return found
+
+    def put_many(self, items):
+        """Store (key, vector) pairs, then evict least recently used rows over the size limit."""
+        now = time.time()
+        rows = []
+        for key, vector in items:
+            blob = np.asarray(vector, dtype="float32").tobytes()
+            rows.append((key, blob, len(blob), now))
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, nbytes, last_used) VALUES (?, ?, ?, ?)", rows
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(nbytes), 0) FROM embeddings").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return
+        victims = []
+        for key, nbytes in self._conn.execute("SELECT key, nbytes FROM embeddings ORDER BY last_used"):
+            victims.append((key,))
+            excess -= nbytes
+            if excess <= 0:
+                break
+        self._conn.executemany("DELETE FROM embeddings WHERE key = ?", victims)
+        self.evictions += len(victims)
+
+    def stats(self):
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(nbytes), 0) FROM embeddings"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Wraps any langchain Embeddings; only texts missing from the cache
+    reach the underlying model, in a single batched call.
+    """
+
+    def __init__(self, underlying, cache, model_id):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_id = model_id
+
+    def embed_documents(self, texts):
+        keys = [cache_key(self.model_id, t) for t in texts]
+        found = self.cache.get_many(keys)
+
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self.cache.put_many(fresh.items())
+            found.update(fresh)
+        return [found[k] for k in keys]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+_CACHES = {}
+
+
+def get_embedding_cache(path=CACHE_PATH):
+    if path not in _CACHES:
+        max_mb = os.getenv("EMBEDDINGS_CACHE_MAX_MB")
+        max_bytes = int(float(max_mb) * 1024 * 1024) if max_mb else DEFAULT_MAX_BYTES
+        _CACHES[path] = EmbeddingCache(path, max_bytes=max_bytes)
+    return _CACHES[path]
+
+
+# === Re-ingest benchmark ===
+if __name__ == "__main__":
+    import tempfile
+    from embedding_backends import HashEmbeddings
+
+    class CountingEmbeddings(HashEmbeddings):
+        calls = 0
+        texts = 0
+
+        def embed_documents(self, texts):
+            CountingEmbeddings.calls += 1
+            CountingEmbeddings.texts += len(texts)
+            time.sleep(0.002 * len(texts))  # stand-in for API latency
+            return super().embed_documents(texts)
+
+    chunks = [f"News {i}: Alphabet shares move after headline number {i}" for i in range(2000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        cached = CachedEmbeddings(CountingEmbeddings(), EmbeddingCache(os.path.join(tmp, "c.sqlite")), "bench")
+        for run, feed in enumerate([chunks, chunks[:1900] + [c + " (updated)" for c in chunks[1900:]]], 1):
+            CountingEmbeddings.texts = 0
+            start = time.perf_counter()
+            cached.embed_documents(feed)
+            print(f"Run {run}: {time.perf_counter() - start:.3f}s, {CountingEmbeddings.texts} texts embedded")
+        print(cached.cache.stats())
@@ -0,0 +1,172 @@
+"""
+Forecast result cache around forecast_engine.
+- Key: hash of the input series, model type, order/params and horizon
+- Results stored as Parquet files (columnar, typed) under ./cache/forecasts
+- TTL and total-size eviction (least recently used first)
+- A small in-process LRU in front of the files, so Streamlit reruns are served from memory
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import instrument
+from model_registry import data_fingerprint, params_key
+
+CACHE_DIR = "./cache/forecasts"
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_BYTES = 200 * 1024 * 1024
+MEMORY_ENTRIES = 32
+
+
+def forecast_key(df, model, regressors=None, **params):
+    fingerprint = data_fingerprint(df, ["Close"] + list(regressors or []))
+    if regressors:
+        params["regressors"] = list(regressors)
+    return hashlib.sha256(f"{fingerprint}:{model}:{params_key(params)}".encode("utf-8")).hexdigest()[:32]
+
+
+class ForecastCache:
+    def __init__(self, cache_dir=CACHE_DIR, ttl=DEFAULT_TTL, max_bytes=DEFAULT_MAX_BYTES, memory_entries=MEMORY_ENTRIES):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet")
+
+    def get(self, key):
+        """
+        Returns:
+            (DataFrame, meta dict) or None when missing or expired
+        """
+        with self._lock:
+            now = time.time()
+            entry = self._memory.get(key)
+            if entry and now - entry[2] <= self.ttl:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0].copy(), entry[1]
+
+            self._memory.pop(key, None)
+            path = self._path(key)
+            meta = None
+            if os.path.exists(path):
+                table = pq.read_table(path)
+                meta = json.loads(table.schema.metadata.get(b"forecast_meta", b"{}"))
+                if now - meta.get("created_at", 0) > self.ttl:
+                    os.remove(path)
+                    meta = None
+            if meta is None:
+                self.misses += 1
+                return None
+
+            frame = table.to_pandas()
+            os.utime(path)  # mtime = last use, for size eviction; TTL counts from created_at
+            self._remember(key, frame, meta, meta["created_at"])
+            self.hits += 1
+            return frame.copy(), meta
+
+    def put(self, key, frame, meta=None):
+        meta = dict(meta or {}, created_at=time.time())
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        schema_meta = dict(table.schema.metadata or {})
+        schema_meta[b"forecast_meta"] = json.dumps(meta).encode("utf-8")
+        table = table.replace_schema_metadata(schema_meta)
+
+        with self._lock:
+            path = self._path(key)
+            pq.write_table(table, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            self._remember(key, frame.copy(), meta, meta["created_at"])
+            self._evict()
+
+    def _remember(self, key, frame, meta, created_at):
+        self._memory[key] = (frame, meta, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _evict(self):
+        now = time.time()
+        files = []
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".parquet"):
+                continue
+            path = os.path.join(self.cache_dir, name)
+            st = os.stat(path)
+            files.append((st.st_mtime, st.st_size, path))
+        # mtime is the last use, so anything untouched for longer than the TTL is expired too
+        total = sum(size for _, size, _ in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.max_bytes and now - mtime <= self.ttl:
+                continue
+            os.remove(path)
+            self._memory.pop(os.path.basename(path)[:-len(".parquet")], None)
+            total -= size
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".parquet"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def stats(self):
+        sizes = [os.path.getsize(os.path.join(self.cache_dir, n)) for n in os.listdir(self.cache_dir) if n.endswith(".parquet")]
+        return {"entries": len(sizes), "bytes": sum(sizes), "in_memory": len(self._memory),
+                "hits": self.hits, "misses": self.misses}
+
+
+_CACHE = None
+
+
+def get_forecast_cache():
+    global _CACHE
+    if _CACHE is None:
+        _CACHE = ForecastCache()
+    return _CACHE
+
+
+# === Cached versions of the forecast_engine entry points ===
+@instrument()
+def cached_prophet_forecast(df, days=30, cache=None, regressors=None):
+    cache = cache or get_forecast_cache()
+    key = forecast_key(df, "prophet", regressors, days=days)
+    hit = cache.get(key)
+    if hit is not None:
+        forecast, meta = hit
+        return forecast, pd.Series(pd.to_datetime(meta["changepoints"]), name="ds")
+
+    from forecast_engine import run_prophet_forecast
+    forecast, changepoints = run_prophet_forecast(df, days, regressors)
+    cache.put(key, forecast, {"model": "prophet", "days": days,
+                              "changepoints": [ts.isoformat() for ts in changepoints]})
+    return forecast, changepoints
+
+
+@instrument()
+def cached_arima_forecast(df, days=30, order=(5, 1, 0), cache=None, regressors=None):
+    cache = cache or get_forecast_cache()
+    key = forecast_key(df, "arima", regressors, days=days, order=list(order))
+    hit = cache.get(key)
+    if hit is not None:
+        return hit[0]
+
+    from forecast_engine import run_arima_forecast
+    forecast = run_arima_forecast(df, days, order=order, regressors=regressors)
+    cache.put(key, forecast, {"model": "arima", "days": days, "order": list(order)})
+    return forecast
@@ -1,37 +1,176 @@
-# === ✅ FIXED forecast_engine.py ===
+import numpy as np
 import pandas as pd
-from prophet import Prophet
-from statsmodels.tsa.arima.model import ARIMA
-from sklearn.metrics import mean_absolute_error
+
+import model_loader
+from instrumentation import instrument
+
+# Prophet (Stan) and statsmodels load on first use, see model_loader
+def _prophet_cls():
+    return model_loader.load("prophet").Prophet
+
+def _arima_cls():
+    return model_loader.load("arima").ARIMA
 
 # --- Prophet forecast ---
-def run_prophet_forecast(df, days=30):
-    df_prophet = df.reset_index()[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'})
-    model = Prophet()
+@instrument()
+def run_prophet_forecast(df, days=30, regressors=None):
+    """
+    regressors: extra df columns (e.g. sentiment_features.SENTIMENT_COLUMNS);
+    future values are unknown, so the last observed value is held over the horizon.
+    """
+    regressors = list(regressors or [])
+    df_prophet = df.reset_index()[['Date', 'Close'] + regressors].rename(columns={'Date': 'ds', 'Close': 'y'})
+    model = _prophet_cls()()
+    for name in regressors:
+        model.add_regressor(name)
     model.fit(df_prophet)
     future = model.make_future_dataframe(periods=days)
+    if regressors:
+        future = pd.merge_asof(future, df_prophet[['ds'] + regressors], on='ds')
     forecast = model.predict(future)
     changepoints = model.changepoints
     return forecast, model.changepoints
 
 # --- ARIMA forecast ---
-def run_arima_forecast(df, days=30):
+@instrument()
+def run_arima_forecast(df, days=30, order=(5, 1, 0), regressors=None):
     series = df['Close']
-    model = ARIMA(series, order=(5, 1, 0))
+    regressors = list(regressors or [])
+    exog = df[regressors].to_numpy() if regressors else None
+    # Fit on plain values: trading-day indexes carry no freq, and the future dates are built below
+    model = _arima_cls()(series.to_numpy(), exog=exog, order=order)
     model_fit = model.fit()
-    forecast = model_fit.forecast(steps=days)
+    # Regressors are held at their last observed value over the horizon
+    forecast = model_fit.get_forecast(steps=days, exog=None if exog is None else np.repeat(exog[-1:], days, axis=0))
+    bounds = np.asarray(forecast.conf_int())
     future_dates = pd.date_range(start=series.index[-1], periods=days+1, freq='B')[1:]
-    return pd.DataFrame({'ds': future_dates, 'yhat': forecast})
+    return pd.DataFrame({
+        'ds': future_dates,
+        'yhat': np.asarray(forecast.predicted_mean),
+        'yhat_lower': bounds[:, 0],
+        'yhat_upper': bounds[:, 1],
+    })
 
 # --- Evaluation (optional) ---
 def evaluate_forecast(true, predicted):
+    from sklearn.metrics import mean_absolute_error
     return mean_absolute_error(true, predicted)
 
+# --- Incremental updates (one new bar at a time) ---
+def prophet_warm_start_params(model):
+    """Fitted Prophet parameters in the form accepted by Prophet.fit(init=...)."""
+    params = {name: model.params[name][0][0] for name in ['k', 'm', 'sigma_obs']}
+    params.update({name: model.params[name][0] for name in ['delta', 'beta']})
+    return params
+
+
+class IncrementalForecaster:
+    """
+    Keeps the last fitted model and updates it as new bars arrive.
+    - ARIMA: new observations are filtered through the fitted state
+      (results.extend), no maximum-likelihood refit
+    - Prophet: refit warm-started from the previous fit's parameters
+    A cold, full refit runs every `full_refit_every` updates, or when
+    already-seen history changed.
+    """
+
+    def __init__(self, model="arima", order=(5, 1, 0), full_refit_every=20):
+        if model not in ("arima", "prophet"):
+            raise ValueError(f"Unknown model '{model}'")
+        self.model = model
+        self.order = order
+        self.full_refit_every = full_refit_every
+        self.fitted = None
+        self.history = None
+        self.updates_since_refit = 0
+
+    def _full_fit(self, df):
+        if self.model == "arima":
+            self.fitted = _arima_cls()(df['Close'].to_numpy(), order=self.order).fit()
+        else:
+            self.fitted = _prophet_cls()()
+            self.fitted.fit(df.reset_index()[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'}))
+        self.updates_since_refit = 0
+
+    def _incremental_fit(self, df, new_rows):
+        if self.model == "arima":
+            self.fitted = self.fitted.extend(new_rows['Close'].to_numpy())
+        else:
+            init = prophet_warm_start_params(self.fitted)
+            self.fitted = _prophet_cls()()
+            self.fitted.fit(df.reset_index()[['Date', 'Close']].rename(columns={'Date': 'ds', 'Close': 'y'}), init=init)
+        self.updates_since_refit += 1
+
+    def update(self, df, days=30):
+        """
+        Parameters:
+            df: full history (Date index, Close column); only rows after the
+                last seen bar are treated as new
+        Returns:
+            same output as run_arima_forecast / run_prophet_forecast
+        """
+        df = df.sort_index()
+        seen = None if self.history is None else df.loc[:self.history.index[-1], 'Close']
+        history_changed = seen is None or not seen.equals(self.history['Close'])
+
+        if self.fitted is None or history_changed:
+            self._full_fit(df)
+        else:
+            new_rows = df.loc[df.index > self.history.index[-1]]
+            if len(new_rows) and self.updates_since_refit + 1 >= self.full_refit_every:
+                self._full_fit(df)
+            elif len(new_rows):
+                self._incremental_fit(df, new_rows)
+        self.history = df[['Close']].copy()
+        return self.forecast(days)
+
+    def forecast(self, days=30):
+        if self.model == "arima":
+            forecast = self.fitted.get_forecast(steps=days)
+            bounds = np.asarray(forecast.conf_int())
+            future_dates = pd.date_range(start=self.history.index[-1], periods=days+1, freq='B')[1:]
+            return pd.DataFrame({
+                'ds': future_dates,
+                'yhat': np.asarray(forecast.predicted_mean),
+                'yhat_lower': bounds[:, 0],
+                'yhat_upper': bounds[:, 1],
+            })
+        future = self.fitted.make_future_dataframe(periods=days)
+        return self.fitted.predict(future), self.fitted.changepoints
+
+
+def benchmark_incremental(df, model="arima", n_updates=10):
+    """Per-bar latency: full refit on every bar vs IncrementalForecaster.update."""
+    import time
+    start_len = len(df) - n_updates
+    runner = run_arima_forecast if model == "arima" else run_prophet_forecast
+
+    start = time.perf_counter()
+    for i in range(n_updates):
+        runner(df.iloc[:start_len + i + 1])
+    full = (time.perf_counter() - start) / n_updates
+
+    forecaster = IncrementalForecaster(model, full_refit_every=n_updates + 1)
+    forecaster.update(df.iloc[:start_len])
+    start = time.perf_counter()
+    for i in range(n_updates):
+        forecaster.update(df.iloc[:start_len + i + 1])
+    incremental = (time.perf_counter() - start) / n_updates
+
+    print(f"{model}: full refit {full * 1e3:.1f} ms/bar, incremental {incremental * 1e3:.1f} ms/bar "
+          f"({full / incremental:.0f}x) over {len(df)} bars")
+
 # --- Manual test run ---
 if __name__ == '__main__':
+    import sys
     import matplotlib.pyplot as plt
     df = pd.read_csv('data/cleaned_google_stock.csv', parse_dates=['Date'], index_col='Date')
 
+    if sys.argv[1:] == ['bench']:
+        benchmark_incremental(df, "arima")
+        benchmark_incremental(df, "prophet", n_updates=3)
+        sys.exit()
+
     forecast, model = run_prophet_forecast(df)
     model.plot(forecast)
     plt.title('Prophet Forecast')
@@ -0,0 +1,640 @@
+"""
+Hybrid lexical + vector retrieval for the RAG assistant.
+- Chunks carry ticker and date metadata, extracted at ingest (index_store.load_file_chunks)
+- An inverted BM25 index (hashed term counts in a sparse matrix) lives next to
+  the FAISS index and is updated by the same incremental sync
+- Questions are parsed for tickers and dates ("Jan 2021", "Q1 2021", "2021-01-15",
+  "$GOOG", "Alphabet"); only chunks matching them are scored, lexically and in FAISS
+- Lexical and vector rankings are fused (reciprocal rank fusion by default); on small
+  knowledge bases a question without tickers or dates is answered by FAISS alone
+- Retrieved context is capped at a token budget before it reaches the LLM
+Runs offline with embedding_backends.HashEmbeddings and a stub LLM.
+CLI:
+    python hybrid_retriever.py query "What caused the dip in Jan 2021?" --kb ./knowledge_base
+    python hybrid_retriever.py bench --chunks 10000,100000,1000000
+"""
+
+import os
+import re
+import json
+import time
+import argparse
+import datetime as dt
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+import scipy.sparse as sp
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.utils import murmurhash3_32
+
+N_FEATURES = 2 ** 20
+BM25_K1 = 1.5
+BM25_B = 0.75
+RRF_K = 60
+FETCH_K = 50
+CONTEXT_TOKENS = 1500
+CHARS_PER_TOKEN = 4  # rough English average, avoids a tokenizer dependency
+SMALL_KB_CHUNKS = 1000  # up to this many chunks an unfiltered question is answered by FAISS alone
+NO_DATE_MIN = np.iinfo(np.int32).max
+NO_DATE_MAX = np.iinfo(np.int32).min
+
+TICKER_ALIASES = {
+    "GOOG": ["goog", "googl", "google", "alphabet"],
+    "AAPL": ["aapl", "apple"],
+    "MSFT": ["msft", "microsoft"],
+    "AMZN": ["amzn", "amazon"],
+    "TSLA": ["tsla", "tesla"],
+    "NVDA": ["nvda", "nvidia"],
+    "META": ["meta", "facebook"],
+    "NFLX": ["nflx", "netflix"],
+}
+_ALIAS_TO_TICKER = {alias: ticker for ticker, aliases in TICKER_ALIASES.items() for alias in aliases}
+
+MONTHS = {m: i for i, m in enumerate(
+    ["jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"], 1)}
+_MONTH = r"(jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+DATE_PATTERNS = [
+    # most specific first; matched spans are blanked so "Jan 2021" doesn't also match "2021"
+    ("iso", re.compile(r"\b(\d{4})-(\d{2})-(\d{2})")),
+    ("month_day_year", re.compile(rf"\b{_MONTH}\s+(\d{{1,2}}),?\s+(\d{{4}})\b", re.I)),
+    ("quarter", re.compile(r"\bq([1-4])\s*(\d{4})\b", re.I)),
+    ("month_year", re.compile(rf"\b{_MONTH}\s+(\d{{4}})\b", re.I)),
+    ("year", re.compile(r"\b((?:19|20)\d{2})\b")),
+]
+_YEAR_DIGITS = re.compile(r"\d{4}")  # every date pattern needs a 4-digit year
+TICKER_LINE = re.compile(r"^Ticker:\s*([A-Z][A-Z.\-]{0,9})\s*$", re.M)
+CASHTAG = re.compile(r"\$([A-Z]{1,5})\b")
+WORD = re.compile(r"[a-z0-9]+")
+
+QueryFilter = namedtuple("QueryFilter", ["tickers", "start", "end"])
+
+
+# === Ticker / date extraction ===
+def _month_end(year, month):
+    return dt.date(year + month // 12, month % 12 + 1, 1) - dt.timedelta(days=1)
+
+
+def find_date_ranges(text):
+    """[(start, end)] date ranges mentioned in text."""
+    ranges = []
+    if not _YEAR_DIGITS.search(text):
+        return ranges
+    for kind, pattern in DATE_PATTERNS:
+        def _collect(m):
+            try:
+                if kind == "iso":
+                    day = dt.date(int(m[1]), int(m[2]), int(m[3]))
+                    ranges.append((day, day))
+                elif kind == "month_day_year":
+                    day = dt.date(int(m[3]), MONTHS[m[1][:3].lower()], int(m[2]))
+                    ranges.append((day, day))
+                elif kind == "quarter":
+                    year, first = int(m[2]), 3 * int(m[1]) - 2
+                    ranges.append((dt.date(year, first, 1), _month_end(year, first + 2)))
+                elif kind == "month_year":
+                    year, month = int(m[2]), MONTHS[m[1][:3].lower()]
+                    ranges.append((dt.date(year, month, 1), _month_end(year, month)))
+                else:
+                    ranges.append((dt.date(int(m[1]), 1, 1), dt.date(int(m[1]), 12, 31)))
+            except ValueError:
+                return m[0]  # not a real date (e.g. 2021-13-45): leave it for later patterns
+            return " "
+        text = pattern.sub(_collect, text)
+    return ranges
+
+
+def find_tickers(text, known=()):
+    """Tickers from "Ticker:" lines, $cashtags, company names and known upper-case symbols."""
+    tickers = set(TICKER_LINE.findall(text)) | set(CASHTAG.findall(text))
+    tickers.update(_ALIAS_TO_TICKER[w] for w in WORD.findall(text.lower()) if w in _ALIAS_TO_TICKER)
+    if known:
+        tickers.update(w for w in re.findall(r"\b[A-Z][A-Z.\-]{0,9}\b", text) if w in known)
+    return tickers
+
+
+def chunk_metadata(text, source_file=""):
+    """
+    Returns:
+        {"tickers": [...], "date_min": "YYYY-MM-DD" | None, "date_max": ...}
+        Dates fall back to a YYYY-MM-DD in the file name (news_2024-05-01.txt).
+    """
+    stem_tickers, stem_ranges = _file_name_metadata(os.path.splitext(os.path.basename(source_file))[0])
+    tickers = find_tickers(text) | stem_tickers
+    ranges = find_date_ranges(text) or stem_ranges
+    return {
+        "tickers": sorted(tickers),
+        "date_min": min(r[0] for r in ranges).isoformat() if ranges else None,
+        "date_max": max(r[1] for r in ranges).isoformat() if ranges else None,
+    }
+
+
+@lru_cache(maxsize=4096)
+def _file_name_metadata(stem):
+    """(tickers, date ranges) of a file name, shared by all chunks of the file."""
+    return frozenset(find_tickers(stem.replace("_", " "))), tuple(find_date_ranges(stem))
+
+
+def parse_query(query, known_tickers=()):
+    """QueryFilter(tickers or None, start or None, end or None) from a question."""
+    tickers = find_tickers(query, known_tickers)
+    ranges = find_date_ranges(query)
+    return QueryFilter(
+        tickers=sorted(tickers) or None,
+        start=min(r[0] for r in ranges) if ranges else None,
+        end=max(r[1] for r in ranges) if ranges else None,
+    )
+
+
+def _day(value, default):
+    return default if value is None else int(np.datetime64(value, "D").astype(np.int64))
+
+
+# === BM25 inverted index ===
+class BM25Index:
+    """
+    Okapi BM25 over hashed term counts (stateless vocabulary, so chunks can be
+    added and removed incrementally). Counts are kept row-major (one row per chunk,
+    cheap to append and save); term postings are the columns of a CSC copy built
+    on the first search after a change, so a query touches only its own terms.
+    """
+
+    def __init__(self, n_features=N_FEATURES, k1=BM25_K1, b=BM25_B):
+        self.n_features = n_features
+        self.k1 = k1
+        self.b = b
+        self.vectorizer = HashingVectorizer(n_features=n_features, token_pattern=r"[a-z0-9]+",
+                                            stop_words="english", alternate_sign=False,
+                                            norm=None, dtype=np.float32)
+        self._analyzer = self.vectorizer.build_analyzer()
+        self.ids = []
+        self.tickers = []
+        self.id_to_row = {}
+        self.version = 0
+        self._blocks = []
+        self._matrix = sp.csr_matrix((0, n_features), dtype=np.float32)
+        self._postings = None
+        self._doc_len = np.empty(0, dtype=np.float32)
+        self._alive = np.empty(0, dtype=bool)
+        self._date_min = np.empty(0, dtype=np.int32)
+        self._date_max = np.empty(0, dtype=np.int32)
+        self._df = None
+        self._ticker_rows = None
+
+    def __len__(self):
+        return int(self._alive.sum())
+
+    def add(self, ids, texts, metadatas=None):
+        metadatas = metadatas or [{} for _ in ids]
+        self.remove([i for i in ids if i in self.id_to_row])
+        counts = self.vectorizer.transform(texts).tocsr()
+        start = len(self.ids)
+        for offset, (chunk_id, meta) in enumerate(zip(ids, metadatas)):
+            self.id_to_row[chunk_id] = start + offset
+            self.ids.append(chunk_id)
+            self.tickers.append(list(meta.get("tickers") or []))
+        self._blocks.append(counts)
+        self._doc_len = np.concatenate([self._doc_len, np.asarray(counts.sum(axis=1), dtype=np.float32).ravel()])
+        self._alive = np.concatenate([self._alive, np.ones(len(ids), dtype=bool)])
+        self._date_min = np.concatenate([self._date_min, np.array(
+            [_day(m.get("date_min"), NO_DATE_MIN) for m in metadatas], dtype=np.int32)])
+        self._date_max = np.concatenate([self._date_max, np.array(
+            [_day(m.get("date_max"), NO_DATE_MAX) for m in metadatas], dtype=np.int32)])
+        self._invalidate()
+
+    def remove(self, ids):
+        rows = [self.id_to_row.pop(i) for i in ids if i in self.id_to_row]
+        if rows:
+            self._alive[rows] = False
+            self._invalidate()
+
+    def _invalidate(self):
+        self.version += 1
+        self._df = None
+        self._ticker_rows = None
+
+    @property
+    def matrix(self):
+        """Chunk x term counts (CSR)."""
+        if self._blocks:
+            self._matrix = sp.vstack([self._matrix] + self._blocks, format="csr")
+            self._blocks = []
+            self._postings = None
+        return self._matrix
+
+    @property
+    def postings(self):
+        """Term x chunk view of `matrix` (CSC): column j holds the postings of term j."""
+        matrix = self.matrix
+        if self._postings is None:
+            self._postings = matrix.tocsc()
+        return self._postings
+
+    def _term_ids(self, query):
+        # same columns as vectorizer.transform([query]) (alternate_sign=False), without
+        # building a sparse matrix per question
+        hashes = [abs(murmurhash3_32(term, seed=0)) % self.n_features for term in self._analyzer(query)]
+        return np.unique(np.asarray(hashes, dtype=np.int64))
+
+    def _document_frequency(self):
+        if self._df is None:
+            matrix = self.postings
+            # live postings per column: differences of a running count at the column boundaries
+            running = np.concatenate([[0], np.cumsum(self._alive[matrix.indices])])
+            self._df = np.diff(running[matrix.indptr]).astype(np.float32)
+        return self._df
+
+    def known_tickers(self):
+        return set(self._rows_by_ticker())
+
+    def _rows_by_ticker(self):
+        if self._ticker_rows is None:
+            rows = {}
+            for row, tickers in enumerate(self.tickers):
+                if self._alive[row]:
+                    for ticker in tickers:
+                        rows.setdefault(ticker, []).append(row)
+            self._ticker_rows = {t: np.asarray(r, dtype=np.int64) for t, r in rows.items()}
+        return self._ticker_rows
+
+    def candidates(self, query_filter):
+        """Rows matching the filter's tickers and date range, or None when it has neither."""
+        if not query_filter.tickers and query_filter.start is None:
+            return None
+        mask = self._alive.copy()
+        if query_filter.tickers:
+            by_ticker = self._rows_by_ticker()
+            ticker_mask = np.zeros(len(mask), dtype=bool)
+            for ticker in query_filter.tickers:
+                ticker_mask[by_ticker.get(ticker, [])] = True
+            mask &= ticker_mask
+        if query_filter.start is not None:
+            mask &= (self._date_min <= _day(query_filter.end, 0)) & (self._date_max >= _day(query_filter.start, 0))
+        return np.flatnonzero(mask)
+
+    def search(self, query, k=FETCH_K, rows=None):
+        """
+        Returns:
+            (rows, scores) of the top-k chunks, best first; `rows` restricts scoring to those rows
+        """
+        terms = self._term_ids(query)
+        if not len(terms) or not len(self.ids):
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        matrix = self.postings
+        allowed = self._alive if rows is None else np.zeros(len(self.ids), dtype=bool)
+        if rows is not None:
+            allowed[rows] = True
+        n_docs = max(len(self), 1)
+        avg_len = float(self._doc_len[self._alive].mean()) if len(self) else 1.0
+        df = self._document_frequency()
+        # all postings of the query terms in one gather instead of a loop over terms
+        lo, hi = matrix.indptr[terms], matrix.indptr[terms + 1]
+        lengths = hi - lo
+        at = np.arange(lengths.sum()) + np.repeat(lo - np.cumsum(lengths) + lengths, lengths)
+        posting, tf = matrix.indices[at], matrix.data[at]
+        idf = np.repeat(np.log1p((n_docs - df[terms] + 0.5) / (df[terms] + 0.5)), lengths)
+        keep = allowed[posting]
+        posting, tf, idf = posting[keep], tf[keep], idf[keep]
+        norm = self.k1 * (1 - self.b + self.b * self._doc_len[posting] / avg_len)
+        scores = np.bincount(posting, weights=idf * tf * (self.k1 + 1) / (tf + norm),
+                             minlength=len(self.ids)).astype(np.float32)
+        hits = np.flatnonzero(scores)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k)[:k]]
+        top = hits[np.argsort(-scores[hits], kind="stable")]
+        return top, scores[top]
+
+    def compact(self):
+        """Drop rows of removed chunks (updated or deleted files)."""
+        keep = np.flatnonzero(self._alive)
+        self._matrix = self.matrix[keep]
+        self._postings = None
+        self._doc_len, self._date_min, self._date_max = self._doc_len[keep], self._date_min[keep], self._date_max[keep]
+        self._alive = np.ones(len(keep), dtype=bool)
+        self.ids = [self.ids[r] for r in keep]
+        self.tickers = [self.tickers[r] for r in keep]
+        self.id_to_row = {cid: row for row, cid in enumerate(self.ids)}
+        self._invalidate()
+
+    # --- persistence ---
+    def save(self, folder):
+        if len(self.ids) > 2 * len(self):
+            self.compact()
+        matrix = self.matrix  # row-major on disk: indptr is per chunk, not per hashed term
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, "bm25.npz")
+        with open(path + ".tmp", "wb") as f:
+            np.savez(f, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                     doc_len=self._doc_len, alive=self._alive, date_min=self._date_min, date_max=self._date_max)
+        os.replace(path + ".tmp", path)
+        meta_path = os.path.join(folder, "bm25.json")
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(json.dumps({"n_features": self.n_features, "k1": self.k1, "b": self.b,
+                                "ids": self.ids, "tickers": self.tickers}))
+        os.replace(meta_path + ".tmp", meta_path)
+
+    @classmethod
+    def load(cls, folder):
+        """Saved index, or None if missing or built with other settings."""
+        path, meta_path = os.path.join(folder, "bm25.npz"), os.path.join(folder, "bm25.json")
+        if not (os.path.exists(path) and os.path.exists(meta_path)):
+            return None
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+        if (meta["n_features"], meta["k1"], meta["b"]) != (N_FEATURES, BM25_K1, BM25_B):
+            return None
+        index = cls()
+        with np.load(path) as arrays:
+            index._matrix = sp.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]),
+                                          shape=(len(meta["ids"]), index.n_features))
+            index._doc_len, index._alive = arrays["doc_len"], arrays["alive"]
+            index._date_min, index._date_max = arrays["date_min"], arrays["date_max"]
+        index.ids, index.tickers = meta["ids"], meta["tickers"]
+        index.id_to_row = {cid: row for row, cid in enumerate(index.ids) if index._alive[row]}
+        return index
+
+    @classmethod
+    def from_documents(cls, ids, docs):
+        index = cls()
+        index.add(ids, [d.page_content for d in docs], [d.metadata for d in docs])
+        return index
+
+
+# === Hybrid retriever ===
+def fuse_rankings(rankings, method="rrf", weights=None):
+    """
+    Parameters:
+        rankings: list of (rows, scores) with rows best first; higher score = better
+        method: "rrf" (reciprocal rank fusion) or "weighted" (min-max normalized scores)
+    Returns:
+        (rows, fused scores) best first
+    """
+    weights = weights or [1.0] * len(rankings)
+    all_rows, all_contrib = [], []
+    for (rows, scores), weight in zip(rankings, weights):
+        if not len(rows):
+            continue
+        if method == "rrf":
+            contrib = weight / (RRF_K + np.arange(1, len(rows) + 1))
+        else:
+            span = float(scores.max() - scores.min())
+            contrib = weight * ((scores - scores.min()) / span if span > 0 else np.ones(len(scores)))
+        all_rows.append(np.asarray(rows, dtype=np.int64))
+        all_contrib.append(contrib)
+    if not all_rows:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    unique, first, inverse = np.unique(np.concatenate(all_rows), return_index=True, return_inverse=True)
+    fused = np.bincount(inverse, weights=np.concatenate(all_contrib))
+    order = np.lexsort((first, -fused))  # ties keep the order rows were first ranked in
+    return unique[order], fused[order]
+
+
+class HybridRetriever:
+    """
+    Parameters:
+        vectordb: langchain FAISS store (the IndexStore's vectordb)
+        bm25: BM25Index over the same chunk ids
+        k: chunks returned at most
+        fetch_k: candidates taken from each ranking before fusion
+        fusion: "rrf" or "weighted"; alpha weighs the vector side of "weighted"
+        max_context_tokens: budget for the returned chunks (None = unlimited)
+        use_filters: pre-filter by tickers / dates parsed from the question
+        small_kb_chunks: up to this many chunks, a question without a filter skips BM25
+            and is ranked by FAISS alone (0 = always fuse)
+    """
+
+    def __init__(self, vectordb, bm25, k=4, fetch_k=FETCH_K, fusion="rrf", alpha=0.5,
+                 max_context_tokens=CONTEXT_TOKENS, use_filters=True, small_kb_chunks=SMALL_KB_CHUNKS):
+        self.vectordb = vectordb
+        self.bm25 = bm25
+        self.k = k
+        self.fetch_k = fetch_k
+        self.fusion = fusion
+        self.alpha = alpha
+        self.max_context_tokens = max_context_tokens
+        self.use_filters = use_filters
+        self.small_kb_chunks = small_kb_chunks
+        self._positions = None
+        self._positions_key = None
+
+    @classmethod
+    def from_index_store(cls, store, **kwargs):
+        return cls(store.vectordb, store.bm25, **kwargs)
+
+    def _position_maps(self):
+        """BM25 row -> FAISS position and back (rebuilt after every sync)."""
+        key = (self.vectordb.index.ntotal, self.bm25.version)
+        if self._positions_key != key:
+            row_to_pos = np.full(len(self.bm25.ids), -1, dtype=np.int64)
+            pos_to_row = np.full(self.vectordb.index.ntotal, -1, dtype=np.int64)
+            for pos, chunk_id in self.vectordb.index_to_docstore_id.items():
+                row = self.bm25.id_to_row.get(chunk_id)
+                if row is not None:
+                    row_to_pos[row], pos_to_row[pos] = pos, row
+            self._positions, self._positions_key = (row_to_pos, pos_to_row), key
+        return self._positions
+
+    def _embed_query(self, query):
+        embedder = self.vectordb.embedding_function
+        vector = embedder.embed_query(query) if hasattr(embedder, "embed_query") else embedder(query)
+        return np.asarray([vector], dtype=np.float32)
+
+    def vector_search(self, query, k, rows=None):
+        """FAISS search restricted to `rows` via an ID selector. Returns (rows, -distance)."""
+        import faiss
+        row_to_pos, pos_to_row = self._position_maps()
+        params = None
+        if rows is not None:
+            positions = row_to_pos[rows]
+            positions = positions[positions >= 0]
+            if not len(positions):
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+            k = min(k, len(positions))
+            params = faiss.SearchParameters(sel=faiss.IDSelectorBatch(positions))
+        k = min(k, self.vectordb.index.ntotal)
+        if k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        distances, positions = self.vectordb.index.search(self._embed_query(query), k, params=params)
+        found = positions[0] >= 0
+        rows = pos_to_row[positions[0][found]]
+        keep = rows >= 0  # vectors with no BM25 row (pos_to_row == -1) must not reach fuse_rankings
+        return rows[keep], -distances[0][found][keep]
+
+    def search(self, query, k=None):
+        """
+        Returns:
+            (list of (Document, fused score), QueryFilter applied or None)
+        """
+        k = k or self.k
+        query_filter, rows = None, None
+        if self.use_filters:
+            query_filter = parse_query(query, self.bm25.known_tickers())
+            rows = self.bm25.candidates(query_filter)
+            if rows is not None and not len(rows):
+                query_filter, rows = None, None  # nothing matches: fall back to the whole corpus
+        vector = self.vector_search(query, self.fetch_k, rows)
+        if rows is None and len(self.bm25) <= self.small_kb_chunks:
+            rankings, weights = [vector], None
+        else:
+            rankings = [vector, self.bm25.search(query, self.fetch_k, rows)]
+            weights = [self.alpha, 1 - self.alpha] if self.fusion == "weighted" else None
+        fused_rows, fused_scores = fuse_rankings(rankings, self.fusion, weights)
+        docstore = self.vectordb.docstore
+        results = []
+        for row, score in zip(fused_rows[:k].tolist(), fused_scores[:k].tolist()):
+            doc = docstore.search(self.bm25.ids[row])
+            if not isinstance(doc, str):  # docstore returns a message string for unknown ids
+                results.append((doc, score))
+        return results, query_filter
+
+    def retrieve(self, query):
+        """Top chunks for the question, trimmed to the context budget."""
+        from langchain.docstore.document import Document
+        results, _ = self.search(query)
+        if self.max_context_tokens is None:
+            return [doc for doc, _ in results]
+        budget = self.max_context_tokens * CHARS_PER_TOKEN
+        docs = []
+        for doc, _ in results:
+            if len(doc.page_content) <= budget:
+                docs.append(doc)
+                budget -= len(doc.page_content)
+            elif not docs:
+                docs.append(Document(page_content=doc.page_content[:budget], metadata=doc.metadata))
+                break
+        return docs
+
+    def as_langchain(self):
+        from langchain_core.retrievers import BaseRetriever
+
+        hybrid = self
+
+        class _Retriever(BaseRetriever):
+            def _get_relevant_documents(self, query, *, run_manager=None):
+                return hybrid.retrieve(query)
+
+        return _Retriever()
+
+
+# === Benchmark: recall / latency vs corpus size (offline) ===
+BENCH_TICKERS = [f"{a}{b}{c}" for a in "ABCDEFGH" for b in "KLMN" for c in "XYZ"]  # 96 symbols
+BENCH_EVENTS = ["earnings miss", "antitrust probe", "product recall", "ceo resignation", "guidance cut",
+                "supply shortage", "data breach", "buyback announcement", "rating downgrade", "lawsuit settlement"]
+BENCH_FILLER = ["shares", "traded", "investors", "market", "session", "analysts", "volume", "stock",
+                "index", "sector", "outlook", "quarter", "revenue", "growth", "pressure", "rally"]
+
+
+class _LazyDocstore:
+    """Builds Documents on demand, so a 1M chunk benchmark doesn't hold 1M objects."""
+
+    def __init__(self, texts, metadatas):
+        self.texts, self.metadatas = texts, metadatas
+
+    def search(self, chunk_id):
+        from langchain.docstore.document import Document
+        i = int(chunk_id)
+        return Document(page_content=self.texts[i], metadata=dict(self.metadatas[i], chunk_id=chunk_id))
+
+
+def _bench_corpus(n_chunks, n_queries, seed=0):
+    """
+    Synthetic news chunks and queries about one (ticker, event, month) each.
+    Every chunk with that ticker, event and month is relevant (3 are planted, more
+    occur by chance in large corpora).
+    """
+    rng = np.random.default_rng(seed)
+    start = np.datetime64("2015-01-01")
+    days = start + rng.integers(0, 3650, n_chunks)
+    tickers = rng.integers(0, len(BENCH_TICKERS), n_chunks)
+    events = rng.integers(0, len(BENCH_EVENTS), n_chunks)
+    filler = rng.integers(0, len(BENCH_FILLER), (n_chunks, 8))
+
+    targets = []
+    for rows in rng.choice(n_chunks, size=(n_queries, 3), replace=False):
+        ticker, event = rng.integers(len(BENCH_TICKERS)), rng.integers(len(BENCH_EVENTS))
+        month = days[rows[0]].astype("datetime64[M]")
+        tickers[rows], events[rows] = ticker, event
+        days[rows] = month.astype("datetime64[D]") + rng.integers(0, 28, 3)
+        targets.append((ticker, event, month))
+
+    texts, metadatas = [], []
+    for i in range(n_chunks):
+        day, ticker = str(days[i]), BENCH_TICKERS[tickers[i]]
+        body = " ".join(BENCH_FILLER[j] for j in filler[i])
+        texts.append(f"Ticker: {ticker}\nDate: {day}\nTitle: {ticker} {BENCH_EVENTS[events[i]]} {body}")
+        metadatas.append({"tickers": [ticker], "date_min": day, "date_max": day})
+
+    months = days.astype("datetime64[M]")
+    queries, relevant = [], []
+    for ticker, event, month in targets:
+        label = dt.date.fromisoformat(f"{month}-01").strftime("%b %Y")
+        queries.append(f"What caused the {BENCH_EVENTS[event]} at {BENCH_TICKERS[ticker]} in {label}?")
+        rows = np.flatnonzero((tickers == ticker) & (events == event) & (months == month))
+        relevant.append({str(r) for r in rows})
+    return texts, metadatas, queries, relevant
+
+
+def benchmark(chunk_counts=(10_000, 100_000), n_queries=50, k=4, dim=128, seed=0):
+    import faiss
+    from langchain_community.vectorstores import FAISS
+    from embedding_backends import HashEmbeddings
+
+    embeddings = HashEmbeddings(dim=dim)
+    for n_chunks in chunk_counts:
+        texts, metadatas, queries, relevant = _bench_corpus(n_chunks, n_queries, seed)
+        start = time.perf_counter()
+        index = faiss.IndexFlatL2(dim)
+        for lo in range(0, n_chunks, 50_000):
+            index.add(np.asarray(embeddings.embed_documents(texts[lo:lo + 50_000]), dtype=np.float32))
+        ids = [str(i) for i in range(n_chunks)]
+        vectordb = FAISS(embeddings, index, _LazyDocstore(texts, metadatas), dict(enumerate(ids)))
+        bm25 = BM25Index()
+        for lo in range(0, n_chunks, 100_000):
+            bm25.add(ids[lo:lo + 100_000], texts[lo:lo + 100_000], metadatas[lo:lo + 100_000])
+        bm25.postings
+        print(f"\n{n_chunks:,} chunks (indexed in {time.perf_counter() - start:.1f}s)")
+
+        configs = {
+            "vector only (as_retriever)": lambda q: [(d, 0) for d in vectordb.similarity_search(q, k=k)],
+            "hybrid, no filters": lambda q, r=HybridRetriever(vectordb, bm25, k, use_filters=False): r.search(q)[0],
+            "hybrid + ticker/date filter": lambda q, r=HybridRetriever(vectordb, bm25, k): r.search(q)[0],
+        }
+        for label, run in configs.items():
+            run(queries[0])  # warm-up (position maps, CSC conversion)
+            latencies, recall = [], []
+            for query, answer in zip(queries, relevant):
+                t0 = time.perf_counter()
+                results = run(query)
+                latencies.append(time.perf_counter() - t0)
+                recall.append(len(answer & {d.metadata["chunk_id"] for d, _ in results}) / min(k, len(answer)))
+            print(f"  {label:28s} recall@{k}: {np.mean(recall):5.2f}   "
+                  f"p50 {np.percentile(latencies, 50) * 1e3:7.1f} ms   p95 {np.percentile(latencies, 95) * 1e3:7.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hybrid BM25 + vector retrieval.")
+    parser.add_argument("command", choices=["query", "bench"])
+    parser.add_argument("question", nargs="?")
+    parser.add_argument("--kb", default="./knowledge_base")
+    parser.add_argument("--embeddings", default=None, help="embedding backend, e.g. hash for offline use")
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--chunks", default="10000,100000", help="corpus sizes for bench")
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark([int(n) for n in args.chunks.split(",")], args.queries, args.k)
+    else:
+        from embedding_backends import get_embeddings
+        from index_store import get_index_store
+        store = get_index_store(args.kb, embeddings=get_embeddings(args.embeddings))
+        store.sync()
+        if store.vectordb is None:
+            print("❌ No documents found in the specified knowledge base.")
+        else:
+            results, query_filter = HybridRetriever.from_index_store(store, k=args.k).search(args.question)
+            print(f"filter: {query_filter}")
+            for doc, score in results:
+                print(f"{score:.4f}  {doc.metadata.get('source_file')}  {doc.metadata.get('tickers')} "
+                      f"{doc.metadata.get('date_min')}..{doc.metadata.get('date_max')}")
+                print(f"        {doc.page_content[:120]!r}")
@@ -0,0 +1,297 @@
+"""
+Persistent FAISS index for the RAG assistant.
+- Built once and kept on disk (FAISS index + JSON docstore + manifest)
+- Reloaded with memory-mapped reads at startup
+- Incremental sync: only new or changed knowledge base files are chunked
+  and embedded, chunks of deleted files are removed
+- Chunks carry ticker / date metadata and a BM25 index is kept in step with
+  FAISS for hybrid_retriever.py
+CLI:
+    python index_store.py rebuild --kb ./knowledge_base
+    python index_store.py update  --kb ./knowledge_base
+    python index_store.py verify  --kb ./knowledge_base --embeddings hash
+"""
+
+import os
+import json
+import hashlib
+import argparse
+
+import faiss
+from langchain.vectorstores import FAISS
+from langchain.docstore.document import Document
+from langchain.docstore.in_memory import InMemoryDocstore
+from langchain.text_splitter import CharacterTextSplitter
+from langchain.document_loaders import TextLoader
+
+from embedding_backends import get_embeddings, embedding_model_id
+from hybrid_retriever import BM25Index, chunk_metadata
+
+KB_DIR = "./knowledge_base"
+INDEX_ROOT = "./vector_index"
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 100
+MANIFEST_VERSION = 2
+
+# Older faiss builds only honour the flag for IVF lists; flat indexes load normally
+MMAP_FLAG = getattr(faiss, "IO_FLAG_MMAP", 0)
+
+
+# === Knowledge base helpers ===
+def list_kb_files(folder_path):
+    return sorted(
+        f for f in os.listdir(folder_path)
+        if (f.endswith(".txt") or f.endswith(".md")) and os.path.isfile(os.path.join(folder_path, f))
+    )
+
+
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def split_documents(docs):
+    splitter = CharacterTextSplitter(chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP)
+    return splitter.split_documents(docs)
+
+
+def load_file_chunks(folder_path, name, digest):
+    docs = TextLoader(os.path.join(folder_path, name), encoding="utf-8").load()
+    chunks = split_documents(docs)
+    ids = [f"{name}:{digest[:16]}:{i}" for i in range(len(chunks))]
+    for chunk, chunk_id in zip(chunks, ids):
+        chunk.metadata["source_file"] = name
+        chunk.metadata["chunk_id"] = chunk_id
+        chunk.metadata.update(chunk_metadata(chunk.page_content, name))
+    return chunks, ids
+
+
+def _write_json(path, payload):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(json.dumps(payload, ensure_ascii=False))  # json.dump streams through the pure-Python encoder
+    os.replace(tmp, path)
+
+
+# === On-disk index store ===
+class IndexStore:
+    def __init__(self, kb_dir=KB_DIR, index_dir=None, embeddings=None):
+        self.kb_dir = kb_dir
+        self.index_dir = index_dir or default_index_dir(kb_dir)
+        self.embeddings = embeddings or get_embeddings()
+        self.model_id = embedding_model_id(self.embeddings)
+        self.vectordb = None
+        self.bm25 = BM25Index()
+        self.manifest = self._empty_manifest()
+        self.load()
+
+    @property
+    def index_path(self):
+        return os.path.join(self.index_dir, "index.faiss")
+
+    @property
+    def docstore_path(self):
+        return os.path.join(self.index_dir, "docstore.json")
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.index_dir, "manifest.json")
+
+    @property
+    def bm25_paths(self):
+        return os.path.join(self.index_dir, "bm25.npz"), os.path.join(self.index_dir, "bm25.json")
+
+    def _empty_manifest(self):
+        return {
+            "version": MANIFEST_VERSION,
+            "embeddings": self.model_id,
+            "chunk_size": CHUNK_SIZE,
+            "chunk_overlap": CHUNK_OVERLAP,
+            "files": {},
+        }
+
+    def load(self):
+        if not os.path.exists(self.manifest_path):
+            return False
+        with open(self.manifest_path, encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        expected = self._empty_manifest()
+        if any(manifest.get(k) != expected[k] for k in ("version", "embeddings", "chunk_size", "chunk_overlap")):
+            print("⚠️ Index was built with different settings, it will be rebuilt.")
+            return False
+
+        if os.path.exists(self.index_path):
+            index = faiss.read_index(self.index_path, MMAP_FLAG)
+            with open(self.docstore_path, encoding="utf-8") as f:
+                stored = json.load(f)
+            docstore = InMemoryDocstore({
+                cid: Document(page_content=doc["page_content"], metadata=doc["metadata"])
+                for cid, doc in stored["docs"].items()
+            })
+            self.vectordb = FAISS(self.embeddings, index, docstore, dict(enumerate(stored["ids"])))
+            self.bm25 = BM25Index.load(self.index_dir)
+            if self.bm25 is None or len(self.bm25) != index.ntotal:
+                ids = stored["ids"]
+                self.bm25 = BM25Index.from_documents(ids, [docstore.search(cid) for cid in ids])
+        self.manifest = manifest
+        return True
+
+    def save(self):
+        os.makedirs(self.index_dir, exist_ok=True)
+        if self.vectordb is not None:
+            ids = [self.vectordb.index_to_docstore_id[i] for i in range(self.vectordb.index.ntotal)]
+            docs = {}
+            for cid in ids:
+                doc = self.vectordb.docstore.search(cid)
+                docs[cid] = {"page_content": doc.page_content, "metadata": doc.metadata}
+            faiss.write_index(self.vectordb.index, self.index_path + ".tmp")
+            os.replace(self.index_path + ".tmp", self.index_path)
+            _write_json(self.docstore_path, {"ids": ids, "docs": docs})
+            self.bm25.save(self.index_dir)
+        else:
+            for path in (self.index_path, self.docstore_path, *self.bm25_paths):
+                if os.path.exists(path):
+                    os.remove(path)
+        _write_json(self.manifest_path, self.manifest)
+
+    def sync(self):
+        """
+        Bring the index in line with the knowledge base folder.
+        Returns:
+            dict: counts of added / updated / removed / unchanged files and embedded chunks
+        """
+        files = self.manifest["files"]
+        current = list_kb_files(self.kb_dir)
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "chunks_embedded": 0}
+        stale_ids, new_chunks, new_ids, new_entries = [], [], [], {}
+        dirty = False
+
+        for name in current:
+            path = os.path.join(self.kb_dir, name)
+            st = os.stat(path)
+            entry = files.get(name)
+            # Cheap stat check first, hash only when mtime/size moved
+            if entry and entry["mtime"] == st.st_mtime and entry["size"] == st.st_size:
+                stats["unchanged"] += 1
+                continue
+            digest = file_sha256(path)
+            if entry and entry["sha256"] == digest:
+                entry["mtime"], entry["size"] = st.st_mtime, st.st_size
+                stats["unchanged"] += 1
+                dirty = True
+                continue
+            try:
+                chunks, ids = load_file_chunks(self.kb_dir, name, digest)
+            except Exception as e:
+                print(f"❌ Failed to load {name}: {e}")
+                continue
+            if entry:
+                stale_ids.extend(entry["chunk_ids"])
+                stats["updated"] += 1
+            else:
+                stats["added"] += 1
+            new_chunks.extend(chunks)
+            new_ids.extend(ids)
+            new_entries[name] = {"sha256": digest, "mtime": st.st_mtime, "size": st.st_size, "chunk_ids": ids}
+
+        for name in set(files) - set(current):
+            stale_ids.extend(files.pop(name)["chunk_ids"])
+            stats["removed"] += 1
+
+        if stale_ids and self.vectordb is not None:
+            present = set(self.vectordb.index_to_docstore_id.values())
+            self.vectordb.delete([cid for cid in stale_ids if cid in present])
+        self.bm25.remove(stale_ids)
+        if new_chunks:
+            if self.vectordb is None:
+                self.vectordb = FAISS.from_documents(new_chunks, self.embeddings, ids=new_ids)
+            else:
+                self.vectordb.add_documents(new_chunks, ids=new_ids)
+            self.bm25.add(new_ids, [c.page_content for c in new_chunks], [c.metadata for c in new_chunks])
+            stats["chunks_embedded"] = len(new_chunks)
+        if self.vectordb is not None and self.vectordb.index.ntotal == 0:
+            self.vectordb = None
+            self.bm25 = BM25Index()
+
+        files.update(new_entries)
+        if dirty or stale_ids or new_chunks or stats["removed"]:
+            self.save()
+        return stats
+
+    def rebuild(self):
+        self.vectordb = None
+        self.bm25 = BM25Index()
+        self.manifest = self._empty_manifest()
+        return self.sync()
+
+    def verify(self):
+        """
+        Check the stored index against the knowledge base and itself.
+        Returns:
+            list[str]: problems found (empty when the index is consistent)
+        """
+        problems = []
+        files = self.manifest["files"]
+        current = list_kb_files(self.kb_dir)
+        for name in sorted(set(current) - set(files)):
+            problems.append(f"not indexed: {name}")
+        for name in sorted(set(files) - set(current)):
+            problems.append(f"indexed but deleted: {name}")
+        for name in sorted(set(current) & set(files)):
+            if file_sha256(os.path.join(self.kb_dir, name)) != files[name]["sha256"]:
+                problems.append(f"stale: {name}")
+
+        expected_ids = {cid for entry in files.values() for cid in entry["chunk_ids"]}
+        stored_ids = set(self.vectordb.index_to_docstore_id.values()) if self.vectordb else set()
+        ntotal = self.vectordb.index.ntotal if self.vectordb else 0
+        if ntotal != len(expected_ids):
+            problems.append(f"index holds {ntotal} vectors, manifest lists {len(expected_ids)} chunks")
+        for cid in sorted(expected_ids - stored_ids):
+            problems.append(f"missing chunk: {cid}")
+        for cid in sorted(stored_ids - expected_ids):
+            problems.append(f"orphan chunk: {cid}")
+        if len(self.bm25) != ntotal or set(self.bm25.id_to_row) != stored_ids:
+            problems.append(f"BM25 index holds {len(self.bm25)} chunks, FAISS holds {ntotal}")
+        return problems
+
+
+def default_index_dir(kb_dir):
+    slug = hashlib.sha1(os.path.abspath(kb_dir).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(INDEX_ROOT, slug)
+
+
+_STORES = {}
+
+
+def get_index_store(kb_dir=KB_DIR, embeddings=None):
+    """Process-wide store per knowledge base folder, loaded once and synced on demand."""
+    key = os.path.abspath(kb_dir)
+    if key not in _STORES:
+        _STORES[key] = IndexStore(kb_dir, embeddings=embeddings)
+    return _STORES[key]
+
+
+# === CLI ===
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, update or verify the RAG vector index.")
+    parser.add_argument("command", choices=["rebuild", "update", "verify"])
+    parser.add_argument("--kb", default=KB_DIR, help="knowledge base folder")
+    parser.add_argument("--index-dir", default=None, help="where the index is stored")
+    parser.add_argument("--embeddings", default=None, help="embeddings backend (openai, huggingface, hash)")
+    args = parser.parse_args()
+
+    store = IndexStore(args.kb, index_dir=args.index_dir, embeddings=get_embeddings(args.embeddings))
+    if args.command == "rebuild":
+        print("✅ Rebuilt:", store.rebuild())
+    elif args.command == "update":
+        print("✅ Updated:", store.sync())
+    else:
+        issues = store.verify()
+        for issue in issues:
+            print("❌", issue)
+        print("✅ Index is consistent." if not issues else f"⚠️ {len(issues)} problem(s) found.")
+        raise SystemExit(1 if issues else 0)
@@ -0,0 +1,266 @@
+"""
+Lightweight timing instrumentation for the pipeline.
+- @instrument() decorator and track("stage") context manager
+- Per stage: call count, errors, wall time, CPU time, peak Python memory
+  (tracemalloc, opt-in since it slows allocation), recent latencies for p50/p95
+- Disabled by default: a disabled decorator costs one flag check per call
+- Export as JSON or Prometheus text exposition format
+- Stages timed in job processes are drained there and merged into the parent
+  (job_manager process jobs), so they show up next to thread jobs
+Enable with TRENDWATCH_PROFILE=1 (timings) or TRENDWATCH_PROFILE=memory (timings + peak memory),
+or call enable() at runtime.
+"""
+
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+RECENT_SAMPLES = 256
+
+
+class _Config:
+    enabled = False
+    memory = False
+
+
+_config = _Config()
+_stats = {}
+_lock = threading.Lock()
+_local = threading.local()
+
+
+def enable(memory=False):
+    _config.enabled = True
+    _config.memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable():
+    _config.enabled = False
+    if _config.memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _config.memory = False
+
+
+def is_enabled():
+    return _config.enabled
+
+
+def reset():
+    with _lock:
+        _stats.clear()
+
+
+def mode():
+    """None (disabled), "timings" or "memory", to mirror in a job process."""
+    if not _config.enabled:
+        return None
+    return "memory" if _config.memory else "timings"
+
+
+def set_mode(value):
+    if value is None:
+        disable()
+    else:
+        enable(memory=value == "memory")
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.wall_total = 0.0
+        self.wall_max = 0.0
+        self.cpu_total = 0.0
+        self.peak_memory = 0
+        self.parents = set()
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def record(self, wall, cpu, peak, parent, failed):
+        self.calls += 1
+        self.errors += int(failed)
+        self.wall_total += wall
+        self.wall_max = max(self.wall_max, wall)
+        self.cpu_total += cpu
+        self.peak_memory = max(self.peak_memory, peak)
+        if parent:
+            self.parents.add(parent)
+        self.recent.append(wall)
+
+    def merge(self, other):
+        """Add the calls recorded by another StageStats (e.g. from a job process)."""
+        self.calls += other.calls
+        self.errors += other.errors
+        self.wall_total += other.wall_total
+        self.wall_max = max(self.wall_max, other.wall_max)
+        self.cpu_total += other.cpu_total
+        self.peak_memory = max(self.peak_memory, other.peak_memory)
+        self.parents |= other.parents
+        self.recent.extend(other.recent)
+
+    def as_dict(self):
+        recent = np.asarray(self.recent)
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "wall_total_s": self.wall_total,
+            "wall_mean_s": self.wall_total / self.calls if self.calls else 0.0,
+            "wall_p50_s": float(np.percentile(recent, 50)) if recent.size else 0.0,
+            "wall_p95_s": float(np.percentile(recent, 95)) if recent.size else 0.0,
+            "wall_max_s": self.wall_max,
+            "cpu_total_s": self.cpu_total,
+            "peak_memory_bytes": self.peak_memory,
+            "parents": sorted(self.parents),
+        }
+
+
+def _stack():
+    if not hasattr(_local, "stack"):
+        _local.stack = []
+    return _local.stack
+
+
+@contextlib.contextmanager
+def _tracked(name):
+    stack = _stack()
+    parent = stack[-1] if stack else None
+    frame = {"name": name, "child_peak": 0}
+    memory = _config.memory and tracemalloc.is_tracing()
+    if memory:
+        current, peak_so_far = tracemalloc.get_traced_memory()
+        if parent:
+            # reset_peak() below would lose the parent's peak so far: hand it over first
+            parent["child_peak"] = max(parent["child_peak"], peak_so_far)
+        tracemalloc.reset_peak()
+        frame["start_memory"] = current
+    stack.append(frame)
+    failed = False
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        yield
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        wall, cpu = time.perf_counter() - wall_start, time.thread_time() - cpu_start
+        stack.pop()
+        peak = 0
+        if memory and tracemalloc.is_tracing():
+            absolute = max(tracemalloc.get_traced_memory()[1], frame["child_peak"])
+            peak = max(absolute - frame["start_memory"], 0)
+            if parent:
+                parent["child_peak"] = max(parent["child_peak"], absolute)
+        with _lock:
+            if name not in _stats:
+                _stats[name] = StageStats(name)
+            _stats[name].record(wall, cpu, peak, parent["name"] if parent else None, failed)
+
+
+def track(name):
+    """Context manager timing a named stage (a no-op while instrumentation is disabled)."""
+    if not _config.enabled:
+        return contextlib.nullcontext()
+    return _tracked(name)
+
+
+def instrument(stage=None):
+    """Decorator: time every call of the function as `stage` (default: module.qualname)."""
+    def decorator(fn):
+        name = stage or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _config.enabled:
+                return fn(*args, **kwargs)
+            with _tracked(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# === Export ===
+def drain():
+    """{stage: StageStats} recorded so far (picklable), cleared from this process."""
+    with _lock:
+        stats = dict(_stats)
+        _stats.clear()
+    return stats
+
+
+def merge(stats):
+    """Fold StageStats drained in another process into this one."""
+    with _lock:
+        for name, other in stats.items():
+            if name not in _stats:
+                _stats[name] = StageStats(name)
+            _stats[name].merge(other)
+
+
+def snapshot():
+    with _lock:
+        return {name: stats.as_dict() for name, stats in sorted(_stats.items())}
+
+
+def to_json(indent=2):
+    return json.dumps({"enabled": _config.enabled, "memory": _config.memory, "stages": snapshot()}, indent=indent)
+
+
+def _label(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def to_prometheus(prefix="trendwatch_stage"):
+    """Prometheus text exposition format (version 0.0.4)."""
+    metrics = [
+        ("calls_total", "counter", "Calls per stage", "calls"),
+        ("errors_total", "counter", "Calls that raised", "errors"),
+        ("wall_seconds_total", "counter", "Wall-clock seconds spent in the stage", "wall_total_s"),
+        ("cpu_seconds_total", "counter", "CPU seconds (calling thread) spent in the stage", "cpu_total_s"),
+        ("wall_seconds_max", "gauge", "Slowest call in seconds", "wall_max_s"),
+        ("wall_seconds_p95", "gauge", "95th percentile of recent calls in seconds", "wall_p95_s"),
+        ("peak_memory_bytes", "gauge", "Peak traced Python memory above the stage's starting point", "peak_memory_bytes"),
+    ]
+    stages = snapshot()
+    lines = []
+    for suffix, kind, help_text, key in metrics:
+        lines.append(f"# HELP {prefix}_{suffix} {help_text}")
+        lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+        for name, stats in stages.items():
+            lines.append(f'{prefix}_{suffix}{{stage="{_label(name)}"}} {stats[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def breakdown(parent):
+    """Child stages of `parent` with their wall time (seconds), slowest first."""
+    rows = [(name, stats["wall_total_s"]) for name, stats in snapshot().items() if parent in stats["parents"]]
+    return sorted(rows, key=lambda r: r[1], reverse=True)
+
+
+_env = os.getenv("TRENDWATCH_PROFILE", "").lower()
+if _env in ("1", "true", "yes", "memory"):
+    enable(memory=_env == "memory")
+
+
+if __name__ == "__main__":
+    def _work(n):
+        return n + 1
+
+    plain = _work
+    wrapped = instrument("bench.work")(_work)
+    for label, setup in (("disabled", disable), ("enabled", enable), ("enabled+memory", lambda: enable(True))):
+        setup()
+        for fn_label, fn in (("plain", plain), ("instrumented", wrapped)):
+            start = time.perf_counter()
+            for _ in range(100_000):
+                fn(10)
+            print(f"{label:15s} {fn_label:12s}: {(time.perf_counter() - start) / 100_000 * 1e6:7.2f} µs/call")
+    print(to_prometheus())
@@ -0,0 +1,424 @@
+"""
+Local background jobs for the Streamlit app and nightly precomputation.
+- Bounded pools: threads for I/O-bound work (news, RAG sync, LLM calls, FinBERT,
+  which releases the GIL), spawned processes for CPU-heavy fits (LSTM, Prophet)
+- Identical in-flight jobs are deduplicated: the same kind + key returns the running job
+- Jobs report progress through an optional callback; status() / result() are polled
+- session_job() keeps job ids in st.session_state, so Streamlit reruns poll
+  the same job instead of starting the work again
+- The manager is process-wide (get_job_manager), finished jobs are kept up to keep_finished
+- A process pool broken by a dying worker is replaced on the next submit; a job the pool
+  refuses is marked failed instead of staying queued (and deduplicating later submits)
+- Every job is timed as the instrumentation stage "job.<kind>"; process jobs run with the
+  parent's instrumentation mode and send their stages back with the result
+Headless nightly precompute (anomaly models, forecasts, news, sentiment, RAG index):
+    python job_manager.py nightly --csv data/cleaned_google_stock.csv --tickers GOOG,AAPL
+"""
+
+import os
+import sys
+import time
+import uuid
+import argparse
+import threading
+import traceback
+import multiprocessing as mp
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import joblib
+
+import instrumentation
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+EXECUTORS = ("thread", "process")
+MAX_THREADS = 4
+MAX_PROCESSES = max(1, (os.cpu_count() or 2) - 1)
+KEEP_FINISHED = 256
+MP_CONTEXT = "spawn"  # forking a process that already runs TensorFlow / Tornado threads is unsafe
+
+JobStatus = namedtuple("JobStatus", ["id", "kind", "state", "progress", "message", "error",
+                                     "submitted", "started", "finished"])
+
+_PROGRESS_QUEUE = None
+
+
+class Job:
+    def __init__(self, job_id, kind, key):
+        self.id = job_id
+        self.kind = kind
+        self.key = key
+        self.state = QUEUED
+        self.progress = 0.0
+        self.message = ""
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+        self.executor = "thread"
+        self.future = None
+        self.done_event = threading.Event()
+
+    def status(self):
+        return JobStatus(self.id, self.kind, self.state, self.progress, self.message, self.error,
+                         self.submitted, self.started, self.finished)
+
+
+# === Process-side entry points (must be importable top-level functions) ===
+def _init_process_worker(queue):
+    global _PROGRESS_QUEUE
+    _PROGRESS_QUEUE = queue
+
+
+def _process_entry(job_id, kind, fn, args, kwargs, with_progress, profile):
+    """
+    Returns:
+        (fn's result, {stage: StageStats} timed in this process); on failure the
+        stages travel on the exception as `.stages`
+    """
+    # enable() / disable() at runtime only reach this process through `profile`
+    instrumentation.set_mode(profile)
+    instrumentation.reset()  # workers are reused: drop anything a previous job left behind
+    _PROGRESS_QUEUE.put((job_id, 0.0, "running"))
+    if with_progress:
+        kwargs = dict(kwargs, progress=lambda fraction, message="": _PROGRESS_QUEUE.put((job_id, fraction, message)))
+    try:
+        with instrumentation.track(f"job.{kind}"):
+            result = fn(*args, **kwargs)
+    except Exception as e:
+        e.stages = instrumentation.drain()
+        raise
+    return result, instrumentation.drain()
+
+
+def job_key(fn, args=(), kwargs=None):
+    """Content hash of the call (DataFrames and arrays hash by value)."""
+    return joblib.hash((getattr(fn, "__module__", ""), getattr(fn, "__qualname__", repr(fn)), args, kwargs or {}))
+
+
+class JobManager:
+    def __init__(self, max_threads=MAX_THREADS, max_processes=MAX_PROCESSES, keep_finished=KEEP_FINISHED):
+        self.max_threads = max_threads
+        self.max_processes = max_processes
+        self.keep_finished = keep_finished
+        self._jobs = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._threads = None
+        self._processes = None
+        self._progress_queue = None
+
+    # --- pools ---
+    def _thread_pool(self):
+        if self._threads is None:
+            self._threads = ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix="job")
+        return self._threads
+
+    def _process_pool(self):
+        if self._processes is None:
+            ctx = mp.get_context(MP_CONTEXT)
+            self._progress_queue = ctx.Queue()
+            self._processes = ProcessPoolExecutor(max_workers=self.max_processes, mp_context=ctx,
+                                                  initializer=_init_process_worker, initargs=(self._progress_queue,))
+            threading.Thread(target=self._drain_progress, args=(self._progress_queue,),
+                             name="job-progress", daemon=True).start()
+        return self._processes
+
+    def _discard_process_pool(self, pool):
+        """Drop a broken pool so the next process job starts a fresh one."""
+        with self._lock:
+            if pool is None or self._processes is not pool:
+                return
+            self._processes, queue = None, self._progress_queue
+            self._progress_queue = None
+        pool.shutdown(wait=False, cancel_futures=True)
+        queue.put(None)
+
+    def _drain_progress(self, queue):
+        while True:
+            try:
+                item = queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            self._report(*item)
+
+    # --- submission ---
+    def submit(self, fn, *args, kind=None, key=None, executor="thread", with_progress=False, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the background.
+        Parameters:
+            kind: label shown in status (default: function name)
+            key: identity for deduplication (default: content hash of fn and its arguments)
+            executor: "thread" for I/O-bound work, "process" for CPU-heavy fits
+                      (fn and its arguments must then be picklable)
+            with_progress: pass progress(fraction, message="") to fn
+        Returns:
+            job id; an identical queued / running job returns its existing id.
+            If the pool refuses the job, the id of a failed job (status().error says why)
+        """
+        if executor not in EXECUTORS:
+            raise ValueError(f"Unknown executor: {executor}; choose from {EXECUTORS}")
+        kind = kind or getattr(fn, "__name__", "job")
+        key = key if key is not None else job_key(fn, args, kwargs)
+        with self._lock:
+            existing = self._inflight.get((kind, key))
+            if existing is not None:
+                return existing
+            job = Job(uuid.uuid4().hex[:12], kind, key)
+            self._jobs[job.id] = job
+            self._inflight[(kind, key)] = job.id
+            self._prune()
+
+        job.executor = executor
+        try:
+            if executor == "process":
+                for retry in (False, True):
+                    pool = self._process_pool()
+                    try:
+                        job.future = pool.submit(_process_entry, job.id, kind, fn, args, kwargs, with_progress,
+                                                 instrumentation.mode())
+                        break
+                    except BrokenProcessPool:
+                        # a worker died after an earlier job: retry once on a fresh pool
+                        self._discard_process_pool(pool)
+                        if retry:
+                            raise
+            else:
+                pool = self._thread_pool()
+                job.future = pool.submit(self._thread_entry, job, fn, args, kwargs, with_progress)
+        except Exception as error:
+            self._fail(job, error)
+            return job.id
+        job.future.add_done_callback(lambda future, job=job, pool=pool: self._finish(job, future, pool))
+        return job.id
+
+    def _thread_entry(self, job, fn, args, kwargs, with_progress):
+        self._report(job.id, 0.0, "running")
+        if with_progress:
+            kwargs = dict(kwargs, progress=lambda fraction, message="": self._report(job.id, fraction, message))
+        with instrumentation.track(f"job.{job.kind}"):
+            return fn(*args, **kwargs)
+
+    def _report(self, job_id, fraction, message=""):
+        job = self._jobs.get(job_id)
+        if job is None or job.state not in (QUEUED, RUNNING):
+            return
+        if job.state == QUEUED:
+            job.state, job.started = RUNNING, time.time()
+        job.progress = min(max(float(fraction), job.progress), 1.0)
+        job.message = message
+
+    def _finish(self, job, future, pool=None):
+        if future.cancelled():
+            job.state = CANCELLED
+        else:
+            error = future.exception()
+            if error is None:
+                result = future.result()
+                if job.executor == "process":
+                    result, stages = result
+                    instrumentation.merge(stages)
+                job.result, job.state, job.progress = result, DONE, 1.0
+            else:
+                if isinstance(error, BrokenProcessPool):
+                    self._discard_process_pool(pool)
+                instrumentation.merge(getattr(error, "stages", {}))
+                job.error = "".join(traceback.format_exception_only(type(error), error)).strip()
+                job.state = FAILED
+        self._close(job)
+
+    def _fail(self, job, error):
+        """Mark a job the pool never accepted as failed."""
+        job.error = "".join(traceback.format_exception_only(type(error), error)).strip()
+        job.state = FAILED
+        self._close(job)
+
+    def _close(self, job):
+        job.started = job.started or time.time()
+        job.finished = time.time()
+        with self._lock:
+            if self._inflight.get((job.kind, job.key)) == job.id:
+                del self._inflight[(job.kind, job.key)]
+        job.done_event.set()
+
+    def _prune(self):
+        finished = [jid for jid, job in self._jobs.items() if job.finished is not None]
+        for jid in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self._jobs[jid]
+
+    # --- polling API ---
+    def status(self, job_id):
+        """JobStatus, or None for unknown (pruned) ids."""
+        job = self._jobs.get(job_id)
+        return job.status() if job else None
+
+    def result(self, job_id, timeout=None):
+        """Block until the job finishes; returns its result or raises RuntimeError with the job's error."""
+        job = self._jobs[job_id]
+        if not job.done_event.wait(timeout):
+            raise TimeoutError(f"job {job_id} ({job.kind}) still {job.state}")
+        if job.state != DONE:
+            raise RuntimeError(f"job {job_id} ({job.kind}) {job.state}: {job.error or ''}")
+        return job.result
+
+    def cancel(self, job_id):
+        """Cancel a job that has not started yet. Returns True on success."""
+        job = self._jobs.get(job_id)
+        return bool(job and job.future and job.future.cancel())
+
+    def jobs(self):
+        return [job.status() for job in list(self._jobs.values())]
+
+    def shutdown(self, wait=True):
+        for pool in (self._threads, self._processes):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=not wait)
+        if self._progress_queue is not None:
+            self._progress_queue.put(None)
+        self._threads = self._processes = self._progress_queue = None
+
+    # --- Streamlit session handles ---
+    def session_job(self, state, slot, fn, *args, key=None, **submit_kwargs):
+        """
+        Job id for `slot`, kept in `state` (st.session_state) across reruns.
+        A job is submitted only when the slot is empty, its key changed (new inputs)
+        or the manager no longer knows the id (pruned, server restarted).
+        Parameters:
+            submit_kwargs: as for submit (kind, executor, with_progress and fn's kwargs)
+        """
+        fn_kwargs = {k: v for k, v in submit_kwargs.items() if k not in ("kind", "executor", "with_progress")}
+        key = key if key is not None else job_key(fn, args, fn_kwargs)
+        handle = state.get(f"job:{slot}")
+        if handle and handle["key"] == key and handle["id"] in self._jobs:
+            return handle["id"]
+        job_id = self.submit(fn, *args, key=key, **submit_kwargs)
+        state[f"job:{slot}"] = {"id": job_id, "key": key}
+        return job_id
+
+    def clear_session_job(self, state, slot):
+        state.pop(f"job:{slot}", None)
+
+    def session_busy(self, state):
+        """True while any job referenced from this session is queued or running."""
+        for name, handle in list(state.items()):
+            if isinstance(name, str) and name.startswith("job:"):
+                status = self.status(handle["id"])
+                if status and status.state in (QUEUED, RUNNING):
+                    return True
+        return False
+
+
+_MANAGER = None
+_MANAGER_LOCK = threading.Lock()
+
+
+def get_job_manager():
+    """Process-wide manager; Streamlit reruns reuse it since the module stays imported."""
+    global _MANAGER
+    with _MANAGER_LOCK:
+        if _MANAGER is None:
+            _MANAGER = JobManager()
+        return _MANAGER
+
+
+# === Nightly precompute ===
+def nightly_anomalies(csv=None, out="models/all_anomalies_combined.csv"):
+    """Fit / refresh registry models for every detector and regenerate the combined CSV."""
+    import importlib.util
+    from data_loader import load_data
+    from anomaly_ensemble import detect_anomalies_ensemble, FLAG_COLUMNS
+    detectors = ("zscore", "isolation", "lstm") if importlib.util.find_spec("tensorflow") else ("zscore", "isolation")
+    df, timings = detect_anomalies_ensemble(load_data(csv), detectors, min_votes=min(2, len(detectors)))
+    columns = ['Close', 'Volume'] + [c for c in FLAG_COLUMNS.values() if c in df] + \
+              ['ensemble_score', 'ensemble_votes', 'anomaly_ensemble']
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    df[columns].to_csv(out)
+    return {"detectors": list(detectors), "anomalies": int(df['anomaly_ensemble'].sum()), "seconds": timings["total"]}
+
+
+def nightly_forecast(csv=None, model="prophet", days=30):
+    """Warm the forecast cache the Forecasting tab reads (same data fingerprint -> cache hit)."""
+    from data_loader import load_data
+    from forecast_cache import cached_prophet_forecast, cached_arima_forecast
+    df = load_data(csv)
+    forecast = cached_prophet_forecast(df, days)[0] if model == "prophet" else cached_arima_forecast(df, days)
+    return {"model": model, "rows": len(forecast)}
+
+
+def nightly_news(tickers, kb_dir="knowledge_base", sentiment="vader", embeddings=None, progress=None):
+    """Fetch news into the article store, update sentiment features, export to the KB and sync the RAG index."""
+    from article_store import get_article_store, export_new_to_kb
+    from news_async import get_latest_news_many
+    from sentiment_features import get_sentiment_store
+    from embedding_backends import get_embeddings
+    from index_store import get_index_store
+
+    progress = progress or (lambda fraction, message="": None)
+    store = get_article_store()
+    progress(0.05, "fetching news")
+    inserted = 0
+    for ticker, articles in get_latest_news_many(tickers).items():
+        inserted += store.add_articles(articles, ticker=ticker)["inserted"]
+    progress(0.4, f"scoring sentiment ({sentiment})")
+    scored = get_sentiment_store(sentiment).update(store)["scored"]
+    progress(0.6, "exporting to knowledge base")
+    exported = export_new_to_kb(store, kb_dir)
+    progress(0.7, "syncing RAG index")
+    index_stats = get_index_store(kb_dir, embeddings=get_embeddings(embeddings)).sync() if os.path.isdir(kb_dir) else None
+    return {"inserted": inserted, "scored": scored, "exported": exported, "index": index_stats}
+
+
+def run_nightly(csv=None, tickers=("GOOG",), kb_dir="knowledge_base", sentiment="vader",
+                embeddings=None, forecast_models=("prophet", "arima"), manager=None, poll=1.0):
+    """
+    Submit every precompute job, print progress until all finish.
+    Returns:
+        {job kind: JobStatus}
+    """
+    manager = manager or get_job_manager()
+    job_ids = [
+        manager.submit(nightly_anomalies, csv, kind="anomalies", executor="process"),
+        *[manager.submit(nightly_forecast, csv, model, kind=f"forecast.{model}", executor="process")
+          for model in forecast_models],
+        manager.submit(nightly_news, list(tickers), kb_dir, sentiment, embeddings, kind="news+rag",
+                       executor="thread", with_progress=True),
+    ]
+    while True:
+        statuses = [manager.status(jid) for jid in job_ids]
+        line = "  ".join(f"{s.kind}: {s.state} {s.progress:.0%}" for s in statuses)
+        print(f"\r{line}", end="", flush=True)
+        if all(s.state in (DONE, FAILED, CANCELLED) for s in statuses):
+            print()
+            break
+        time.sleep(poll)
+    for jid in job_ids:
+        s = manager.status(jid)
+        elapsed = (s.finished or time.time()) - (s.started or s.submitted)
+        detail = manager.result(jid) if s.state == DONE else s.error
+        print(f"{'✅' if s.state == DONE else '❌'} {s.kind:18s} {elapsed:7.1f}s  {detail}")
+    return {manager.status(jid).kind: manager.status(jid) for jid in job_ids}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Background jobs / nightly precompute.")
+    parser.add_argument("command", choices=["nightly"])
+    parser.add_argument("--csv", default=None, help="price CSV (default: bundled GOOG data)")
+    parser.add_argument("--tickers", default="GOOG", help="comma-separated tickers for the news job")
+    parser.add_argument("--kb", default="knowledge_base")
+    parser.add_argument("--sentiment", default="vader", choices=["vader", "finbert"])
+    parser.add_argument("--embeddings", default=None, help="embeddings backend for the RAG index (openai, huggingface, hash)")
+    parser.add_argument("--forecasts", default="prophet,arima")
+    parser.add_argument("--processes", type=int, default=MAX_PROCESSES)
+    args = parser.parse_args()
+
+    manager = JobManager(max_processes=args.processes)
+    try:
+        results = run_nightly(args.csv, args.tickers.split(","), args.kb, args.sentiment, args.embeddings,
+                              tuple(m for m in args.forecasts.split(",") if m), manager)
+    finally:
+        manager.shutdown()
+    sys.exit(0 if all(s.state == DONE for s in results.values()) else 1)
@@ -1,6 +1,10 @@
 from newspaper import Article
 from newspaper import build
 import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from article_store import save_articles, save_summary
 
 def scrape_google_news_articles(max_articles=10):
     print("🔍 Scraping Google-related news using newspaper3k...")
@@ -16,22 +20,17 @@ def scrape_google_news_articles(max_articles=10):
             if "Google" in article.text or "Alphabet" in article.text:
                 results.append({
                     "title": article.title,
-                    "summary": article.text[:400].replace("\n", " ") + "..."
+                    "summary": article.text[:400].replace("\n", " ") + "...",
+                    "source": "Yahoo Finance",
+                    "url": article.url,
+                    "published_at": article.publish_date
                 })
         except:
             continue
 
     return results
 
-def save_to_txt(news, filename="knowledge_base/goog_news.txt"):
-    os.makedirs("knowledge_base", exist_ok=True)
-    with open(filename, "w", encoding="utf-8") as f:
-        for i, item in enumerate(news):
-            f.write(f"📰 News {i+1}\n")
-            f.write(f"Title: {item['title']}\n")
-            f.write(f"Summary: {item['summary']}\n\n")
-
 if __name__ == "__main__":
     news = scrape_google_news_articles(max_articles=15)
-    save_to_txt(news)
-    print("✅ News successfully saved to knowledge_base/goog_news.txt")
+    stats, exported = save_articles(news, "GOOG")
+    print(save_summary(stats, exported))
@@ -0,0 +1,120 @@
+"""
+Lazy loader registry for heavy backends.
+- FinBERT, TensorFlow/Keras, Prophet and statsmodels ARIMA are imported on first use,
+  so the app starts fast for users who only need VADER or Z-Score
+- Each backend loads once per process (thread-safe)
+- Optional background pre-warming, e.g. PREWARM=finbert,tensorflow
+CLI:
+    python model_loader.py bench    # import time and RSS per tab code path
+"""
+
+import os
+import sys
+import json
+import importlib
+import threading
+import subprocess
+
+_LOADERS = {}
+_INSTANCES = {}
+_LOCKS = {}
+_REGISTRY_LOCK = threading.Lock()
+
+
+def register_loader(name, factory):
+    """Register a zero-argument factory; it runs on the first load(name)."""
+    with _REGISTRY_LOCK:
+        _LOADERS[name] = factory
+        _LOCKS.setdefault(name, threading.Lock())
+
+
+def load(name):
+    if name in _INSTANCES:
+        return _INSTANCES[name]
+    if name not in _LOADERS:
+        raise KeyError(f"No loader registered for '{name}'. Known: {sorted(_LOADERS)}")
+    with _LOCKS[name]:
+        if name not in _INSTANCES:
+            _INSTANCES[name] = _LOADERS[name]()
+    return _INSTANCES[name]
+
+
+def is_loaded(name):
+    return name in _INSTANCES
+
+
+def prewarm(names, background=True):
+    """Load backends ahead of first use; failures are printed, never raised."""
+    names = [n.strip() for n in names if n and n.strip()]
+    if not names:
+        return None
+
+    def _run():
+        for name in names:
+            try:
+                load(name)
+            except Exception as e:
+                print(f"[Prewarm Error] {name}: {e}")
+
+    if not background:
+        _run()
+        return None
+    thread = threading.Thread(target=_run, name="model-prewarm", daemon=True)
+    thread.start()
+    return thread
+
+
+# === Built-in backends ===
+def _finbert():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model="yiyanghkust/finbert-tone")
+
+
+register_loader("finbert", _finbert)
+register_loader("tensorflow", lambda: importlib.import_module("tensorflow"))
+register_loader("prophet", lambda: importlib.import_module("prophet"))
+register_loader("arima", lambda: importlib.import_module("statsmodels.tsa.arima.model"))
+
+
+# === Startup benchmark: each tab's code path in a fresh interpreter ===
+TAB_PATHS = {
+    "App imports": "import app_modules",
+    "Z-Score": "from data_loader import load_data; from utils import detect_anomalies_zscore; "
+               "detect_anomalies_zscore(load_data(None))",
+    "Isolation Forest": "from utils import detect_anomalies_isolation; import sklearn.ensemble",
+    "LSTM Autoencoder": "import utils, model_loader; model_loader.load('tensorflow')",
+    "Prophet": "import forecast_engine, model_loader; model_loader.load('prophet')",
+    "ARIMA": "import forecast_engine, model_loader; model_loader.load('arima')",
+    "VADER": "from sentiment_model import analyze_sentiment; analyze_sentiment('Shares rally', 'vader')",
+    "FinBERT": "import sentiment_model, model_loader; model_loader.load('finbert')",
+}
+
+_PROBE = """
+import json, resource, sys, time
+start = time.perf_counter()
+exec(sys.argv[1])
+print(json.dumps({"seconds": time.perf_counter() - start,
+                  "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+"""
+
+
+def benchmark_startup(paths=None):
+    here = os.path.dirname(os.path.abspath(__file__))
+    app_modules = ("import data_loader, utils, forecast_cache, plots, rag_assistant, "
+                   "portfolio_analyzer, news_fetcher, sentiment_model")
+    print(f"{'Code path':20s} {'seconds':>8s} {'peak RSS MB':>12s}")
+    for label, code in (paths or TAB_PATHS).items():
+        code = code.replace("import app_modules", app_modules)
+        proc = subprocess.run([sys.executable, "-c", _PROBE, code], cwd=here, capture_output=True, text=True)
+        if proc.returncode != 0:
+            print(f"{label:20s} failed: {proc.stderr.strip().splitlines()[-1] if proc.stderr else proc.returncode}")
+            continue
+        result = json.loads(proc.stdout.strip().splitlines()[-1])
+        print(f"{label:20s} {result['seconds']:8.2f} {result['rss_mb']:12.1f}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["bench"]:
+        benchmark_startup()
+    else:
+        print(__doc__)
@@ -0,0 +1,190 @@
+"""
+Model registry for the anomaly detectors (train once, score many).
+- Fitted models live under models/registry/<kind>/<ticker>/<params>/<data>/
+- Entries are keyed by ticker, hyperparameters and a fingerprint of the training data
+- Cached models keep scoring new data until a retrain policy fires
+  (model age, drift in reconstruction error, Isolation Forest flag rate far above
+  contamination or inputs outside the training range); a model fitted on other data
+  is only reused for an explicit ticker, never for ticker=None
+"""
+
+import os
+import re
+import json
+import time
+import shutil
+import hashlib
+from collections import namedtuple
+
+import joblib
+import pandas as pd
+
+import model_loader
+
+REGISTRY_ROOT = "models/registry"
+
+RegistryEntry = namedtuple("RegistryEntry", ["artifacts", "meta", "path"])
+
+
+def data_fingerprint(df, columns=("Close",)):
+    hashed = pd.util.hash_pandas_object(df[list(columns)], index=True).to_numpy()
+    return hashlib.sha256(hashed.tobytes()).hexdigest()
+
+
+def params_key(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:12]
+
+
+class RetrainPolicy:
+    """
+    Parameters:
+        max_age_days: refit once the cached model is older than this (None = never)
+        max_error_ratio: refit when mean reconstruction error on new data exceeds
+            the training error by this factor (None = never)
+        max_flag_ratio: refit when the share of flagged rows exceeds the training
+            flag rate (contamination) by this factor (None = never)
+        max_out_of_range: refit when more than this share of rows lies outside the
+            feature ranges seen in training (None = never)
+    """
+
+    def __init__(self, max_age_days=30, max_error_ratio=1.5, max_flag_ratio=3.0, max_out_of_range=0.05):
+        self.max_age_days = max_age_days
+        self.max_error_ratio = max_error_ratio
+        self.max_flag_ratio = max_flag_ratio
+        self.max_out_of_range = max_out_of_range
+
+    def is_expired(self, meta):
+        if self.max_age_days is None:
+            return False
+        return (time.time() - meta["created_at"]) / 86400 > self.max_age_days
+
+    def has_drifted(self, meta, error_mean):
+        baseline = meta.get("stats", {}).get("train_error_mean")
+        if self.max_error_ratio is None or not baseline:
+            return False
+        return error_mean / baseline > self.max_error_ratio
+
+    def flags_drifted(self, meta, flag_rate, out_of_range=0.0):
+        """Flag rate / out-of-range share of new data against an Isolation Forest's training."""
+        baseline = meta.get("stats", {}).get("train_flag_rate", meta.get("params", {}).get("contamination"))
+        if (self.max_flag_ratio is not None and isinstance(baseline, (int, float)) and baseline > 0
+                and flag_rate > baseline * self.max_flag_ratio):
+            return True
+        return self.max_out_of_range is not None and out_of_range > self.max_out_of_range
+
+
+DEFAULT_POLICY = RetrainPolicy()
+
+
+class ModelRegistry:
+    def __init__(self, root=REGISTRY_ROOT, keep=3):
+        self.root = root
+        self.keep = keep
+        self._loaded = {}
+
+    def _params_dir(self, kind, ticker, params):
+        safe_ticker = re.sub(r"[^A-Za-z0-9_.-]", "_", ticker or "default")
+        return os.path.join(self.root, kind, safe_ticker, params_key(params))
+
+    # --- Persistence ---
+    def save(self, kind, ticker, params, fingerprint, artifacts, stats=None):
+        path = os.path.join(self._params_dir(kind, ticker, params), fingerprint[:16])
+        os.makedirs(path, exist_ok=True)
+        formats = {}
+        for name, obj in artifacts.items():
+            if hasattr(obj, "save_weights"):
+                obj.save(os.path.join(path, f"{name}.keras"))
+                formats[name] = "keras"
+            else:
+                joblib.dump(obj, os.path.join(path, f"{name}.joblib"))
+                formats[name] = "joblib"
+        meta = {
+            "kind": kind,
+            "ticker": ticker or "default",
+            "params": params,
+            "fingerprint": fingerprint,
+            "created_at": time.time(),
+            "formats": formats,
+            "stats": stats or {},
+        }
+        # meta.json is written last: a directory without it is an unfinished save
+        with open(os.path.join(path, "meta.json.tmp"), "w") as f:
+            json.dump(meta, f, indent=2, default=str)
+        os.replace(os.path.join(path, "meta.json.tmp"), os.path.join(path, "meta.json"))
+
+        entry = RegistryEntry(artifacts, meta, path)
+        self._loaded[path] = entry
+        self._prune(os.path.dirname(path))
+        return entry
+
+    def load(self, path):
+        if path in self._loaded:
+            return self._loaded[path]
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        artifacts = {}
+        for name, fmt in meta["formats"].items():
+            if fmt == "keras":
+                keras = model_loader.load("tensorflow").keras
+                artifacts[name] = keras.models.load_model(os.path.join(path, f"{name}.keras"))
+            else:
+                artifacts[name] = joblib.load(os.path.join(path, f"{name}.joblib"))
+        entry = RegistryEntry(artifacts, meta, path)
+        self._loaded[path] = entry
+        return entry
+
+    def _versions(self, params_dir):
+        if not os.path.isdir(params_dir):
+            return []
+        versions = []
+        for name in os.listdir(params_dir):
+            meta_path = os.path.join(params_dir, name, "meta.json")
+            if os.path.exists(meta_path):
+                versions.append((os.path.getmtime(meta_path), os.path.join(params_dir, name)))
+        return [path for _, path in sorted(versions, reverse=True)]
+
+    def _prune(self, params_dir):
+        for path in self._versions(params_dir)[self.keep:]:
+            self._loaded.pop(path, None)
+            shutil.rmtree(path, ignore_errors=True)
+
+    # --- Lookup ---
+    def find(self, kind, ticker, params, fingerprint):
+        path = os.path.join(self._params_dir(kind, ticker, params), fingerprint[:16])
+        if os.path.exists(os.path.join(path, "meta.json")):
+            return self.load(path)
+        return None
+
+    def latest(self, kind, ticker, params):
+        versions = self._versions(self._params_dir(kind, ticker, params))
+        return self.load(versions[0]) if versions else None
+
+    def fit(self, kind, ticker, params, df, fit_fn, columns=("Close",)):
+        """fit_fn(df, **params) must return (artifacts dict, stats dict)."""
+        artifacts, stats = fit_fn(df, **params)
+        return self.save(kind, ticker, params, data_fingerprint(df, columns), artifacts, stats)
+
+    def get_or_fit(self, kind, ticker, params, df, fit_fn, policy=None, columns=("Close",)):
+        """
+        Model for this exact data if cached, else (only for an explicit ticker) the
+        newest model for the same ticker and params, else a fresh fit. Without a
+        ticker there is no provenance linking the data to an earlier fit, so a
+        fingerprint miss refits. Expired models are refit.
+        """
+        policy = policy or DEFAULT_POLICY
+        entry = self.find(kind, ticker, params, data_fingerprint(df, columns))
+        if entry is None and ticker is not None:
+            entry = self.latest(kind, ticker, params)
+        if entry is None or policy.is_expired(entry.meta):
+            entry = self.fit(kind, ticker, params, df, fit_fn, columns)
+        return entry
+
+
+_REGISTRY = None
+
+
+def get_registry():
+    global _REGISTRY
+    if _REGISTRY is None:
+        _REGISTRY = ModelRegistry()
+    return _REGISTRY
@@ -0,0 +1,245 @@
+"""
+Concurrent news ingestion for many tickers.
+- One pooled aiohttp session per batch, with total and per-host connection limits
+- Conditional requests (ETag / Last-Modified): a 304 reuses the stored page
+- Retry with exponential backoff on timeouts, connection errors, 429 and 5xx
+- Short-TTL response cache, so Streamlit reruns don't refetch
+Returns the same article dicts as news_fetcher.get_latest_news.
+Benchmark (local stub server, no network):
+    python news_async.py bench --tickers 500
+"""
+
+import time
+import random
+import asyncio
+import argparse
+import threading
+
+import aiohttp
+
+from instrumentation import instrument
+from news_fetcher import parse_yahoo_finance_news, parse_marketwatch_news
+
+# name -> (URL template, parser, one page per ticker?)
+SOURCES = {
+    "yahoo": ("https://finance.yahoo.com/quote/{ticker}/news?p={ticker}", parse_yahoo_finance_news, True),
+    "marketwatch": ("https://www.marketwatch.com/latest-news", parse_marketwatch_news, False),
+}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+HEADERS = {"User-Agent": "Mozilla/5.0"}
+
+
+class RetryableStatus(Exception):
+    pass
+
+
+class AsyncNewsFetcher:
+    def __init__(self, sources=None, total_limit=64, per_host_limit=8, timeout=10,
+                 retries=3, backoff=0.5, cache_ttl=60):
+        self.sources = sources or SOURCES
+        self.total_limit = total_limit
+        self.per_host_limit = per_host_limit
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.cache_ttl = cache_ttl
+        self.stats = {"requests": 0, "cache_hits": 0, "not_modified": 0, "retries": 0, "errors": 0}
+        # url -> {"body", "etag", "last_modified", "fetched_at"}; kept across batches
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    async def _fetch_url(self, session, url):
+        cached = self._pages.get(url)
+        if cached and time.time() - cached["fetched_at"] < self.cache_ttl:
+            self.stats["cache_hits"] += 1
+            return cached["body"]
+
+        headers = dict(HEADERS)
+        if cached and cached["etag"]:
+            headers["If-None-Match"] = cached["etag"]
+        if cached and cached["last_modified"]:
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        for attempt in range(self.retries + 1):
+            try:
+                self.stats["requests"] += 1
+                async with session.get(url, headers=headers) as resp:
+                    if resp.status == 304 and cached:
+                        self.stats["not_modified"] += 1
+                        cached["fetched_at"] = time.time()
+                        return cached["body"]
+                    if resp.status in RETRY_STATUSES:
+                        raise RetryableStatus(f"HTTP {resp.status}")
+                    resp.raise_for_status()
+                    body = await resp.read()
+                    self._pages[url] = {
+                        "body": body,
+                        "etag": resp.headers.get("ETag"),
+                        "last_modified": resp.headers.get("Last-Modified"),
+                        "fetched_at": time.time(),
+                    }
+                    return body
+            except (aiohttp.ClientError, asyncio.TimeoutError, RetryableStatus) as e:
+                if attempt == self.retries:
+                    self.stats["errors"] += 1
+                    print(f"[Async News Error] {url}: {e}")
+                    return None
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.backoff * 2 ** attempt * (1 + random.random() / 2))
+
+    async def _fetch_source(self, session, name, ticker=None):
+        template, parser, per_ticker = self.sources[name]
+        body = await self._fetch_url(session, template.format(ticker=ticker) if per_ticker else template)
+        if body is None:
+            return []
+        try:
+            return parser(body)
+        except Exception as e:
+            print(f"[Async News Error] {name} parse: {e}")
+            return []
+
+    async def fetch_many_async(self, tickers, sources=None):
+        names = list(sources or self.sources)
+        connector = aiohttp.TCPConnector(limit=self.total_limit, limit_per_host=self.per_host_limit, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            # Sources without a ticker in the URL are fetched once and shared
+            shared_names = [n for n in names if not self.sources[n][2]]
+            ticker_names = [n for n in names if self.sources[n][2]]
+            shared, per_ticker = await asyncio.gather(
+                asyncio.gather(*(self._fetch_source(session, n) for n in shared_names)),
+                asyncio.gather(*(
+                    asyncio.gather(*(self._fetch_source(session, n, t) for n in ticker_names)) for t in tickers
+                )),
+            )
+        shared_articles = [a for articles in shared for a in articles]
+        return {
+            t: [a for articles in results for a in articles] + [dict(a) for a in shared_articles]
+            for t, results in zip(tickers, per_ticker)
+        }
+
+    def fetch_many(self, tickers, sources=None):
+        """
+        Returns:
+            dict: ticker -> list of { title, summary, source, url }
+        """
+        with self._lock:
+            return asyncio.run(self.fetch_many_async(list(dict.fromkeys(tickers)), sources))
+
+
+_FETCHER = None
+
+
+def get_news_fetcher():
+    global _FETCHER
+    if _FETCHER is None:
+        _FETCHER = AsyncNewsFetcher()
+    return _FETCHER
+
+
+@instrument()
+def get_latest_news_many(tickers):
+    return get_news_fetcher().fetch_many(tickers)
+
+
+@instrument()
+def get_latest_news(ticker="GOOG"):
+    """Drop-in for news_fetcher.get_latest_news, served from the short-TTL cache on reruns."""
+    return get_latest_news_many([ticker])[ticker]
+
+
+# === Local stub server + benchmark ===
+def _stub_yahoo_page(ticker):
+    items = "".join(
+        f'<li class="js-stream-content"><a href="/news/{ticker.lower()}-{i}.html"><h3>{ticker} headline {i}</h3></a>'
+        f"<p>{ticker} summary {i}</p></li>" for i in range(10)
+    )
+    return f"<html><body><ul>{items}</ul></body></html>".encode("utf-8")
+
+
+def _stub_marketwatch_page():
+    items = "".join(
+        f'<div class="article__content"><h3 class="article__headline"><a href="https://mw.example/{i}">'
+        f"Market headline {i}</a></h3><p>Market summary {i}</p></div>" for i in range(10)
+    )
+    return f"<html><body>{items}</body></html>".encode("utf-8")
+
+
+def serve_stub_pages(latency=0.0):
+    """
+    Threaded local HTTP server with canned Yahoo / MarketWatch pages and ETag support.
+    Returns:
+        (server, sources dict pointing at it); call server.shutdown() when done
+    """
+    import hashlib
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if latency:
+                time.sleep(latency)
+            if self.path.startswith("/yahoo/"):
+                body = _stub_yahoo_page(self.path.split("/")[2])
+            elif self.path == "/marketwatch":
+                body = _stub_marketwatch_page()
+            else:
+                self.send_error(404)
+                return
+            etag = '"%s"' % hashlib.md5(body).hexdigest()
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    sources = {
+        "yahoo": (base + "/yahoo/{ticker}", parse_yahoo_finance_news, True),
+        "marketwatch": (base + "/marketwatch", parse_marketwatch_news, False),
+    }
+    return server, sources
+
+
+def benchmark(n_tickers=500, latency=0.02):
+    server, sources = serve_stub_pages(latency=latency)
+    tickers = [f"T{i:04d}" for i in range(n_tickers)]
+    try:
+        fetcher = AsyncNewsFetcher(sources=sources, cache_ttl=0)
+        for label in ("cold", "conditional (304)"):
+            start = time.perf_counter()
+            news = fetcher.fetch_many(tickers)
+            elapsed = time.perf_counter() - start
+            headlines = sum(len(v) for v in news.values())
+            print(f"{label:18s}: {n_tickers} tickers, {headlines} headlines in {elapsed:.2f}s "
+                  f"-> {headlines / elapsed:,.0f} headlines/sec")
+        print(fetcher.stats)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent news fetcher.")
+    parser.add_argument("command", choices=["fetch", "bench"])
+    parser.add_argument("--tickers", default=None, help="comma-separated tickers (fetch) or a count (bench)")
+    parser.add_argument("--latency", type=float, default=0.02, help="stub server latency per request (bench)")
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark(int(args.tickers or 500), args.latency)
+    else:
+        for ticker, articles in get_latest_news_many((args.tickers or "GOOG").split(",")).items():
+            print(f"\n=== {ticker}")
+            for h in articles:
+                print(f"📰 {h['title']}\n🔗 {h['url']}")
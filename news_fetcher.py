@@ -4,12 +4,20 @@ Includes:
 - Yahoo Finance
 - MarketWatch
 - Keyword filtering
+- Many tickers concurrently: see news_async.py
+- Selectors and parser backends: see news_parsing.py
 Returns:
     List of dictionaries with title, summary, source, and URL for use in Streamlit
 """
 
 import requests
-from bs4 import BeautifulSoup
+
+from instrumentation import instrument
+from news_parsing import parse_articles
+
+
+def parse_yahoo_finance_news(html):
+    return parse_articles(html, "yahoo")
 
 
 def fetch_yahoo_finance_news(ticker="AAPL"):
@@ -17,55 +25,28 @@ def fetch_yahoo_finance_news(ticker="AAPL"):
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
         response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        articles = soup.select("li.js-stream-content")
-
-        news = []
-        for a in articles[:10]:
-            title_tag = a.find("h3")
-            summary_tag = a.find("p")
-            link_tag = a.find("a", href=True)
-
-            if title_tag and link_tag:
-                news.append({
-                    "title": title_tag.get_text(strip=True),
-                    "summary": summary_tag.get_text(strip=True) if summary_tag else "",
-                    "source": "Yahoo Finance",
-                    "url": "https://finance.yahoo.com" + link_tag["href"]
-                })
-        return news
+        return parse_yahoo_finance_news(response.content)
     except Exception as e:
         print(f"[Yahoo Error] {e}")
         return []
 
 
+def parse_marketwatch_news(html):
+    return parse_articles(html, "marketwatch")
+
+
 def fetch_marketwatch_news():
     url = "https://www.marketwatch.com/latest-news"
     headers = {"User-Agent": "Mozilla/5.0"}
     try:
         response = requests.get(url, headers=headers, timeout=10)
-        soup = BeautifulSoup(response.content, "html.parser")
-        articles = soup.select("div.article__content")
-
-        news = []
-        for a in articles[:10]:
-            title_tag = a.find("h3", class_="article__headline")
-            summary_tag = a.find("p")
-            link_tag = a.find("a", href=True)
-
-            if title_tag and link_tag:
-                news.append({
-                    "title": title_tag.get_text(strip=True),
-                    "summary": summary_tag.get_text(strip=True) if summary_tag else "",
-                    "source": "MarketWatch",
-                    "url": link_tag["href"]
-                })
-        return news
+        return parse_marketwatch_news(response.content)
     except Exception as e:
         print(f"[MarketWatch Error] {e}")
         return []
 
 
+@instrument()
 def get_latest_news(ticker="GOOG"):
     yahoo = fetch_yahoo_finance_news(ticker)
     mw = fetch_marketwatch_news()
@@ -0,0 +1,211 @@
+"""
+HTML parsing layer for the news scrapers.
+- Extraction rules for every source live in PARSE_RULES (CSS selectors)
+- Fast path: lxml.html + compiled cssselect selectors
+- Fallbacks: BeautifulSoup with the lxml tree builder, then the pure-Python html.parser
+Benchmark over saved pages (synthetic pages are generated if the folder is empty):
+    python news_parsing.py bench --fixtures ./fixtures/news
+    python news_parsing.py save-fixtures --tickers GOOG,AAPL
+"""
+
+import os
+import glob
+import time
+import argparse
+from functools import lru_cache
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+try:
+    import lxml.html
+    from lxml.cssselect import CSSSelector
+    HAS_LXML_CSS = True
+except ImportError:
+    HAS_LXML_CSS = False
+
+try:
+    import lxml  # noqa: F401
+    BS4_FEATURES = "lxml"
+except ImportError:
+    BS4_FEATURES = "html.parser"
+
+FIXTURE_DIR = "./fixtures/news"
+
+# source -> where each article is and which fields to pull out of it
+PARSE_RULES = {
+    "yahoo": {
+        "item": "li.js-stream-content",
+        "title": "h3",
+        "summary": "p",
+        "link": "a[href]",
+        "source": "Yahoo Finance",
+        "base_url": "https://finance.yahoo.com",
+        "limit": 10,
+    },
+    "marketwatch": {
+        "item": "div.article__content",
+        "title": "h3.article__headline",
+        "summary": "p",
+        "link": "a[href]",
+        "source": "MarketWatch",
+        "base_url": "https://www.marketwatch.com",
+        "limit": 10,
+    },
+}
+
+BACKENDS = ("lxml", "bs4-lxml", "html.parser")
+SELECTOR_FIELDS = ("item", "title", "summary", "link")
+
+
+def default_backend():
+    if HAS_LXML_CSS:
+        return "lxml"
+    return "bs4-lxml" if BS4_FEATURES == "lxml" else "html.parser"
+
+
+@lru_cache(maxsize=64)
+def _compile_selectors(selectors):
+    return dict(zip(SELECTOR_FIELDS, (CSSSelector(css) for css in selectors)))
+
+
+def _compiled(rules):
+    # Keyed by the selector strings, so ad-hoc rules dicts share entries and cannot collide
+    return _compile_selectors(tuple(rules[field] for field in SELECTOR_FIELDS))
+
+
+def _text(el):
+    # Same result as BeautifulSoup's get_text(strip=True)
+    return "".join(s.strip() for s in el.itertext())
+
+
+def _make_article(rules, title, summary, href):
+    return {
+        "title": title,
+        "summary": summary,
+        "source": rules["source"],
+        "url": urljoin(rules["base_url"], href),
+    }
+
+
+def _parse_lxml(html, rules, limit, require_summary):
+    if not html or not html.strip():
+        return []
+    sel = _compiled(rules)
+    news = []
+    for item in sel["item"](lxml.html.fromstring(html)):
+        title, summary, link = sel["title"](item), sel["summary"](item), sel["link"](item)
+        if title and link and (summary or not require_summary):
+            news.append(_make_article(rules, _text(title[0]), _text(summary[0]) if summary else "", link[0].get("href")))
+            if len(news) == limit:
+                break
+    return news
+
+
+def _parse_bs4(html, rules, limit, require_summary, features):
+    soup = BeautifulSoup(html, features)
+    news = []
+    for item in soup.select(rules["item"]):
+        title, summary, link = (item.select_one(rules[f]) for f in ("title", "summary", "link"))
+        if title and link and (summary or not require_summary):
+            news.append(_make_article(rules, title.get_text(strip=True),
+                                      summary.get_text(strip=True) if summary else "", link["href"]))
+            if len(news) == limit:
+                break
+    return news
+
+
+def parse_articles(html, source, limit=None, require_summary=False, backend=None):
+    """
+    Extract articles from a page using PARSE_RULES[source] (or a rules dict).
+    Returns:
+        list of { title, summary, source, url }
+    """
+    rules = PARSE_RULES[source] if isinstance(source, str) else source
+    limit = rules.get("limit") if limit is None else limit
+    backend = backend or default_backend()
+    if backend == "lxml" and HAS_LXML_CSS:
+        return _parse_lxml(html, rules, limit, require_summary)
+    if backend == "html.parser" or BS4_FEATURES == "html.parser":
+        return _parse_bs4(html, rules, limit, require_summary, "html.parser")
+    return _parse_bs4(html, rules, limit, require_summary, "lxml")
+
+
+# === Fixtures + benchmark ===
+def _synthetic_page(source, n_items=40, noise=400):
+    """A page shaped like the live one: the article list buried in lots of unrelated markup."""
+    nav = "".join(f'<div class="nav-{i}"><a href="/x/{i}"><span>menu {i}</span></a><script>var x{i}=1;</script></div>'
+                  for i in range(noise))
+    if source == "yahoo":
+        items = "".join(
+            f'<li class="js-stream-content"><div><a href="/news/story-{i}.html"><h3>Alphabet headline {i}</h3></a>'
+            f"<p>Summary text for story {i} with <b>markup</b> inside.</p></div></li>" for i in range(n_items)
+        )
+        body = f"<ul>{items}</ul>"
+    else:
+        body = "".join(
+            f'<div class="article__content"><h3 class="article__headline"><a href="https://www.marketwatch.com/story/{i}">'
+            f"Market headline {i}</a></h3><p>Market summary {i}</p></div>" for i in range(n_items)
+        )
+    return f"<html><head><title>{source}</title></head><body>{nav}{body}{nav}</body></html>".encode("utf-8")
+
+
+def load_fixtures(folder=FIXTURE_DIR):
+    """
+    Returns:
+        list of (source, html bytes); files are named <source>_<anything>.html
+    """
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(folder, "*.html"))):
+        source = os.path.basename(path).split("_", 1)[0]
+        if source in PARSE_RULES:
+            with open(path, "rb") as f:
+                fixtures.append((source, f.read()))
+    if not fixtures:
+        fixtures = [(s, _synthetic_page(s)) for s in PARSE_RULES]
+    return fixtures
+
+
+def save_fixtures(tickers, folder=FIXTURE_DIR):
+    import requests
+    os.makedirs(folder, exist_ok=True)
+    headers = {"User-Agent": "Mozilla/5.0"}
+    pages = {f"yahoo_{t}.html": f"https://finance.yahoo.com/quote/{t}/news?p={t}" for t in tickers}
+    pages["marketwatch_latest.html"] = "https://www.marketwatch.com/latest-news"
+    for name, url in pages.items():
+        response = requests.get(url, headers=headers, timeout=10)
+        with open(os.path.join(folder, name), "wb") as f:
+            f.write(response.content)
+        print(f"saved {name} ({len(response.content) / 1024:.0f} KB)")
+
+
+def benchmark(folder=FIXTURE_DIR, repeat=20):
+    fixtures = load_fixtures(folder)
+    total_mb = sum(len(html) for _, html in fixtures) / 1e6
+    print(f"{len(fixtures)} pages, {total_mb:.2f} MB, x{repeat}")
+    baseline = None
+    for backend in reversed(BACKENDS):
+        if backend == "lxml" and not HAS_LXML_CSS or backend == "bs4-lxml" and BS4_FEATURES != "lxml":
+            print(f"{backend:12s}: unavailable")
+            continue
+        start = time.perf_counter()
+        for _ in range(repeat):
+            n = sum(len(parse_articles(html, source, backend=backend)) for source, html in fixtures)
+        elapsed = time.perf_counter() - start
+        baseline = baseline or elapsed
+        print(f"{backend:12s}: {len(fixtures) * repeat / elapsed:8.1f} pages/sec, "
+              f"{total_mb * repeat / elapsed:6.1f} MB/sec, x{baseline / elapsed:.1f} ({n} articles/pass)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="News HTML parsing layer.")
+    parser.add_argument("command", choices=["bench", "save-fixtures"])
+    parser.add_argument("--fixtures", default=FIXTURE_DIR)
+    parser.add_argument("--tickers", default="GOOG")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    if args.command == "bench":
+        benchmark(args.fixtures, args.repeat)
+    else:
+        save_fixtures(args.tickers.split(","), args.fixtures)
@@ -1,18 +1,216 @@
-import matplotlib.pyplot as plt
+"""
+Plotly figures for the Streamlit tabs.
+- Long series are downsampled before they reach the browser: LTTB (keeps the
+  visual shape) or min/max per bucket (keeps every extreme), computed over the
+  visible x-range only
+- Anomaly points are always kept, so the line still passes through every marker
+- Traces switch to WebGL (Scattergl) above WEBGL_THRESHOLD points
+- Functions return figures for st.plotly_chart instead of calling fig.show()
+Benchmark (serialized size and build time):
+    python plots.py --points 1000000
+"""
+
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
 import plotly.graph_objects as go
 
-def plot_anomalies(df, col):
+MAX_POINTS = 4000
+WEBGL_THRESHOLD = 10_000
+MINMAX_PRESELECT = 4  # LTTB runs on min/max candidates when the series is this many times larger
+
+
+# === Downsampling ===
+def _as_float(x):
+    x = np.asarray(x)
+    if np.issubdtype(x.dtype, np.datetime64):
+        return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64)
+    return x.astype(np.float64)
+
+
+def minmax_indices(y, n_out):
+    """Indices of the min and max of each of n_out // 2 equal buckets (first and last always kept)."""
+    y = np.asarray(y, dtype=np.float64)
+    n = len(y)
+    n_buckets = max(n_out // 2, 1)
+    if n <= n_out:
+        return np.arange(n)
+    size = -(-n // n_buckets)
+    padded = np.full(n_buckets * size, np.nan)
+    padded[:n] = y
+    buckets = padded.reshape(n_buckets, size)
+    starts = np.arange(n_buckets) * size
+    valid = starts < n
+    missing = np.isnan(buckets)  # padding (and gaps) never win a bucket
+    lo = np.argmin(np.where(missing, np.inf, buckets), axis=1) + starts
+    hi = np.argmax(np.where(missing, -np.inf, buckets), axis=1) + starts
+    return np.unique(np.concatenate([[0, n - 1], lo[valid], hi[valid]]))
+
+
+def lttb_indices(x, y, n_out):
+    """
+    Largest-Triangle-Three-Buckets: from each bucket keep the point forming the
+    largest triangle with the previously kept point and the next bucket's mean.
+    """
+    x, y = _as_float(x), np.asarray(y, dtype=np.float64)
+    n = len(y)
+    if n <= n_out or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # bucket means up front (the last "next bucket" is the final point); only the argmax stays sequential
+    bounds = np.append(edges, n)
+    counts = np.diff(bounds)
+    mean_x = np.add.reduceat(x, bounds[:-1]) / counts
+    mean_y = np.add.reduceat(y, bounds[:-1]) / counts
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        px, py = x[prev], y[prev]
+        area = np.abs((px - mean_x[i + 1]) * (y[lo:hi] - py) - (px - x[lo:hi]) * (mean_y[i + 1] - py))
+        prev = lo + int(area.argmax())
+        selected[i + 1] = prev
+    return selected
+
+
+def downsample_indices(x, y, n_out=MAX_POINTS, method="lttb", keep=None):
+    """
+    Parameters:
+        method: "lttb", "minmax" or None (no downsampling)
+        keep: boolean mask or indices that must survive (e.g. anomalies)
+    Returns:
+        sorted row indices to plot
+    """
+    n = len(y)
+    if method is None or n <= n_out:
+        idx = np.arange(n)
+    elif method == "minmax":
+        idx = minmax_indices(y, n_out)
+    elif method == "lttb":
+        if n > MINMAX_PRESELECT * n_out:
+            # MinMax-LTTB: LTTB over the bucket extremes gives the same picture at a fraction of the cost
+            candidates = minmax_indices(y, MINMAX_PRESELECT * n_out)
+            idx = candidates[lttb_indices(np.asarray(x)[candidates], np.asarray(y)[candidates], n_out)]
+        else:
+            idx = lttb_indices(x, y, n_out)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    if keep is not None:
+        keep = np.asarray(keep)
+        keep = np.flatnonzero(keep) if keep.dtype == bool else keep
+        idx = np.union1d(idx, keep)
+    return idx
+
+
+def visible_slice(index, x_range):
+    """Positional slice of a sorted index covering x_range = (start, end); None = everything."""
+    if x_range is None:
+        return slice(None)
+    start, end = (pd.Timestamp(v) if v is not None and isinstance(index, pd.DatetimeIndex) else v for v in x_range)
+    lo = 0 if start is None else index.searchsorted(start)
+    hi = len(index) if end is None else index.searchsorted(end, side="right")
+    return slice(lo, hi)
+
+
+def _trace(n_points, **kwargs):
+    return (go.Scattergl if n_points > WEBGL_THRESHOLD else go.Scatter)(**kwargs)
+
+
+# === Figures ===
+def plot_anomalies(df, col, x_range=None, max_points=MAX_POINTS, method="lttb"):
+    """
+    Close price with anomaly markers.
+    Parameters:
+        x_range: (start, end) visible window; points outside it are not sent
+        max_points: line points after downsampling (anomalies come on top)
+        method: "lttb", "minmax" or None
+    Returns:
+        plotly Figure
+    """
+    view = df.iloc[visible_slice(df.index, x_range)]
+    close = view['Close'].to_numpy()
+    flags = view[col].to_numpy() == 1
+    idx = downsample_indices(view.index.to_numpy(), close, max_points, method, keep=flags)
+    anomalies = np.flatnonzero(flags)
+
+    fig = go.Figure()
+    fig.add_trace(_trace(len(idx), x=view.index[idx], y=close[idx], name='Close', mode='lines'))
+    fig.add_trace(_trace(len(anomalies), x=view.index[anomalies], y=close[anomalies],
+                         mode='markers', name='Anomaly', marker=dict(color='red', size=8)))
+    title = f"Anomaly Detection – {col}"
+    if len(idx) < len(view):
+        title += f" ({len(idx):,} of {len(view):,} points)"
+    fig.update_layout(title=title, template="plotly_white")
+    return fig
+
+
+def plot_forecast(forecast, changepoints=None, x_range=None, max_points=MAX_POINTS, method="lttb"):
+    """
+    Forecast with its confidence band; the three traces share one set of rows
+    (yhat's shape plus the band's extremes) so the band fill stays aligned.
+    Returns:
+        plotly Figure
+    """
+    dates = pd.DatetimeIndex(forecast['ds'])
+    view = forecast.iloc[visible_slice(dates, x_range)]
+    x = view['ds'].to_numpy()
+    budget = max(max_points // 3, 2)
+    idx = np.union1d(
+        downsample_indices(x, view['yhat'].to_numpy(), budget, method),
+        np.union1d(downsample_indices(x, view['yhat_upper'].to_numpy(), budget, method),
+                   downsample_indices(x, view['yhat_lower'].to_numpy(), budget, method)),
+    )
+    x = x[idx]
+
+    fig = go.Figure()
+    fig.add_trace(_trace(len(idx), x=x, y=view['yhat'].to_numpy()[idx], name='Forecast'))
+    fig.add_trace(_trace(len(idx), x=x, y=view['yhat_upper'].to_numpy()[idx], name='Upper', line=dict(dash='dot')))
+    fig.add_trace(_trace(len(idx), x=x, y=view['yhat_lower'].to_numpy()[idx], name='Lower', fill='tonexty'))
+    fig.update_layout(title='Prophet Forecast with Confidence Intervals', template='plotly_white')
+    return fig
+
+
+# === Benchmark ===
+def _naive_anomaly_figure(df, col):
+    """The previous plot_anomalies: every point in SVG traces."""
     fig = go.Figure()
     fig.add_trace(go.Scatter(x=df.index, y=df['Close'], name='Close', mode='lines'))
     fig.add_trace(go.Scatter(x=df[df[col] == 1].index, y=df[df[col] == 1]['Close'],
                              mode='markers', name='Anomaly', marker=dict(color='red', size=8)))
     fig.update_layout(title=f"Anomaly Detection – {col}", template="plotly_white")
-    return fig.show()
+    return fig
 
-def plot_forecast(forecast, changepoints):
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat'], name='Forecast'))
-    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat_upper'], name='Upper', line=dict(dash='dot')))
-    fig.add_trace(go.Scatter(x=forecast['ds'], y=forecast['yhat_lower'], name='Lower', fill='tonexty'))
-    fig.update_layout(title='Prophet Forecast with Confidence Intervals', template='plotly_white')
-    fig.show()
+
+def benchmark(n_points=1_000_000, anomaly_rate=0.001, seed=0):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2015-01-01", periods=n_points, freq="min", name="Date")
+    df = pd.DataFrame({'Close': 100 * np.exp(np.cumsum(rng.standard_normal(n_points) * 1e-3))}, index=index)
+    df['anomaly'] = (rng.random(n_points) < anomaly_rate).astype(int)
+    print(f"{n_points:,} points, {df['anomaly'].sum():,} anomalies")
+
+    cases = {
+        "all points (previous)": lambda: _naive_anomaly_figure(df, 'anomaly'),
+        "all points, Scattergl": lambda: plot_anomalies(df, 'anomaly', method=None),
+        "LTTB": lambda: plot_anomalies(df, 'anomaly'),
+        "min/max": lambda: plot_anomalies(df, 'anomaly', method="minmax"),
+        "LTTB, last 30 days": lambda: plot_anomalies(df, 'anomaly', x_range=(index[-30 * 1440], None)),
+    }
+    for label, build in cases.items():
+        start = time.perf_counter()
+        fig = build()
+        built = time.perf_counter() - start
+        payload = fig.to_json()
+        total = time.perf_counter() - start
+        points = sum(len(trace.x) for trace in fig.data)
+        print(f"  {label:24s} {points:>9,} points  {len(payload) / 1e6:8.2f} MB  "
+              f"build {built * 1e3:8.1f} ms  build+serialize {total * 1e3:8.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Figure downsampling benchmark.")
+    parser.add_argument("--points", type=int, default=1_000_000)
+    args = parser.parse_args()
+    benchmark(args.points)
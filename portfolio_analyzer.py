@@ -2,6 +2,7 @@
 Module to analyze uploaded stock portfolios:
 - Calculates portfolio value, volatility
 - Flags stocks with recent anomalies
+- VaR / CVaR and risk contributions via risk_engine.py
 - Useful for personalized financial risk detection
 """
 
@@ -10,6 +11,9 @@ import numpy as np
 import matplotlib.pyplot as plt
 import seaborn as sns
 
+from instrumentation import instrument
+from risk_engine import returns_matrix, portfolio_weights, portfolio_risk, rolling_portfolio_risk
+
 
 def load_portfolio(file):
     df = pd.read_csv(file)
@@ -25,7 +29,7 @@ def merge_with_anomalies(portfolio_df, anomaly_df):
 
 
 def compute_risk_metrics(prices_df):
-    returns = prices_df.pivot(columns='Ticker', values='Close').pct_change().dropna()
+    returns = returns_matrix(prices_df)
     volatility = returns.std()
     correlation = returns.corr()
     return volatility, correlation
@@ -47,6 +51,7 @@ def calculate_portfolio_value(portfolio_df, current_prices):
 
 
 # === ✅ New function: For Streamlit use ===
+@instrument()
 def analyze_portfolio_risk(file):
     try:
         df = pd.read_csv(file)
@@ -67,6 +72,45 @@ def analyze_portfolio_risk(file):
         return f"❌ Error analyzing portfolio: {e}"
 
 
+@instrument()
+def analyze_portfolio_var(portfolio_file, prices_file, alpha=0.95, window=252):
+    """
+    Portfolio risk from positions (Ticker, Qty, ...) and price history (Date, Ticker, Close).
+    Returns:
+        dict with "summary" (metric -> value), "contributions" and "rolling" DataFrames,
+        or an error string like analyze_portfolio_risk
+    """
+    try:
+        portfolio = load_portfolio(portfolio_file)
+        prices = pd.read_csv(prices_file, parse_dates=['Date'])
+        if not {'Date', 'Ticker', 'Close'}.issubset(prices.columns):
+            return "❌ Price CSV must include: Date, Ticker, Close"
+
+        returns = returns_matrix(prices)
+        latest = prices.sort_values('Date').groupby('Ticker')['Close'].last()
+        weights = portfolio_weights(portfolio, latest)
+        returns = returns[weights.index.intersection(returns.columns)]
+        if returns.empty:
+            return "❌ No price history for the portfolio tickers"
+
+        risk = portfolio_risk(returns, weights, alpha)
+        pct = int(round(alpha * 100))
+        summary = {
+            "📉 Daily Volatility": round(risk["volatility"], 5),
+            "📈 Annualized Volatility": round(risk["annualized_volatility"], 4),
+            f"⚠️ Historical VaR {pct}%": round(risk["hist_var"], 5),
+            f"🔥 Historical CVaR {pct}%": round(risk["hist_cvar"], 5),
+            f"⚠️ Parametric VaR {pct}%": round(risk["param_var"], 5),
+            f"🔥 Parametric CVaR {pct}%": round(risk["param_cvar"], 5),
+        }
+        rolling = rolling_portfolio_risk(returns, weights, window, alpha) if len(returns) >= window else None
+        contributions = risk["contributions"].sort_values("component_vol", ascending=False)
+        return {"summary": summary, "contributions": contributions, "rolling": rolling}
+
+    except Exception as e:
+        return f"❌ Error analyzing portfolio: {e}"
+
+
 # === CLI Test (Optional) ===
 if __name__ == '__main__':
     portfolio = pd.DataFrame({
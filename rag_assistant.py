@@ -1,56 +1,75 @@
 import os
 from dotenv import load_dotenv
-from langchain.embeddings import OpenAIEmbeddings
 from langchain.vectorstores import FAISS
-from langchain.text_splitter import CharacterTextSplitter
 from langchain.document_loaders import TextLoader
 from langchain.chains import RetrievalQA
 from langchain.chat_models import ChatOpenAI
 
+from embedding_backends import get_embeddings
+from instrumentation import instrument
+from index_store import get_index_store, list_kb_files, split_documents
+from hybrid_retriever import HybridRetriever
+
 # Load environment variables
 load_dotenv()
 
-
-embeddings = OpenAIEmbeddings()  
-
 # === Load all .txt/.md documents from a folder ===
 def load_docs_from_folder(folder_path):
     docs = []
-    for file in os.listdir(folder_path):
-        if file.endswith(".txt") or file.endswith(".md"):
-            try:
-                docs.extend(TextLoader(os.path.join(folder_path, file), encoding="utf-8").load())
-            except Exception as e:
-                print(f"❌ Failed to load {file}: {e}")
+    for file in list_kb_files(folder_path):
+        try:
+            docs.extend(TextLoader(os.path.join(folder_path, file), encoding="utf-8").load())
+        except Exception as e:
+            print(f"❌ Failed to load {file}: {e}")
     return docs
 
-# === Create FAISS vector store from docs ===
-def create_vectorstore(docs):
-    splitter = CharacterTextSplitter(chunk_size=1000, chunk_overlap=100)
-    chunks = splitter.split_documents(docs)
-    return FAISS.from_documents(chunks, embeddings)
+# === Create in-memory FAISS vector store from docs (no persistence) ===
+def create_vectorstore(docs, embeddings=None):
+    return FAISS.from_documents(split_documents(docs), embeddings or get_embeddings())
+
+# === Load persisted FAISS index, embedding only new/changed files ===
+@instrument()
+def get_vectorstore(file_path="./knowledge_base"):
+    store = get_index_store(file_path)
+    store.sync()
+    return store.vectordb
+
+# === Hybrid BM25 + vector retriever over the persisted index (ticker/date aware) ===
+_RETRIEVERS = {}
+
+def get_retriever(file_path="./knowledge_base", embeddings=None, **kwargs):
+    store = get_index_store(file_path, embeddings=embeddings)
+    store.sync()
+    if store.vectordb is None:
+        return None
+    key = (os.path.abspath(file_path), tuple(sorted(kwargs.items())))
+    retriever = _RETRIEVERS.get(key)
+    # sync() may have replaced vectordb / bm25 (rebuild, first build): cached position maps would be stale
+    if retriever is None or retriever.vectordb is not store.vectordb or retriever.bm25 is not store.bm25:
+        retriever = _RETRIEVERS[key] = HybridRetriever.from_index_store(store, **kwargs)
+    return retriever
 
 # === Create RAG chain ===
-def create_rag_chain(vectordb):
-    llm = ChatOpenAI(temperature=0, model_name="gpt-4")
-    retriever = vectordb.as_retriever()
+def create_rag_chain(vectordb, llm=None, retriever=None):
+    llm = llm or ChatOpenAI(temperature=0, model_name="gpt-4")
+    retriever = retriever or vectordb.as_retriever()
     return RetrievalQA.from_chain_type(llm=llm, retriever=retriever, chain_type="stuff")
 
 # === Final RAG Assistant callable ===
-def ask_question(query, file_path="./knowledge_base"):
+@instrument()
+def ask_question(query, file_path="./knowledge_base", llm=None, embeddings=None):
+    """
+    llm / embeddings default to OpenAI; pass e.g. langchain's FakeListLLM and
+    embedding_backends.HashEmbeddings to run fully offline.
+    """
     try:
-        # 1. Load documents from folder
-        docs = load_docs_from_folder(file_path)
-        if not docs:
+        # 1-2. Load the persisted index, syncing changed documents
+        retriever = get_retriever(file_path, embeddings)
+        if not retriever:
             return "❌ No documents found in the specified knowledge base."
 
-        # 2. Create vector store
-        vectordb = create_vectorstore(docs)
-        if not vectordb:
-            return "❌ Failed to create or load vector store."
-
-        # 3. Create RAG chain
-        qa_chain = create_rag_chain(vectordb)
+        # 3. Create RAG chain: hybrid retrieval, capped context
+        qa_chain = create_rag_chain(retriever.vectordb, llm, retriever.as_langchain())
         if not qa_chain:
             return "❌ Failed to initialize RAG chain."
 
@@ -0,0 +1,354 @@
+"""
+News sentiment as a price-aligned feature.
+- update() scores only the articles appended to the article store since its
+  last run (its own cursor), so each update costs O(new articles)
+- New scores are bucketed per (ticker, bar) in one vectorized group-by into a
+  sum and a count, and appended as a small Parquet part per ticker; parts are
+  compacted into a base file once a ticker has more than COMPACT_AFTER of them
+- Bars are labeled by their right edge: bar T holds articles published in (T - bar, T]
+- join_sentiment() is an as-of join onto a load_data frame (no look-ahead):
+    sentiment_count / sentiment_mean: articles published since the previous price bar
+    sentiment_decayed: sum of scores with exponential decay (half-life), as of the price bar
+  Article times are UTC; naive price timestamps are compared as if UTC, which for
+  US-listed closes only ever excludes news, never leaks it
+- Features live next to the price dataset: ./data/features/sentiment/<method>/Ticker=<T>/
+CLI:
+    python sentiment_features.py update --method vader
+    python sentiment_features.py show --ticker GOOG --csv data/cleaned_google_stock.csv
+    python sentiment_features.py bench --history 1000000 --new 1000
+"""
+
+import os
+import re
+import glob
+import json
+import time
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import instrument
+
+FEATURES_DIR = "./data/features/sentiment"
+DEFAULT_BAR = "1h"
+DEFAULT_HALF_LIFE = "3D"
+COMPACT_AFTER = 32
+MAX_EXP2 = 900.0  # decay is rebased every MAX_EXP2 half-lives so 2**t stays inside float64
+SENTIMENT_COLUMNS = ["sentiment_count", "sentiment_mean", "sentiment_decayed"]
+LABEL_SIGN = {"positive": 1.0, "negative": -1.0, "neutral": 0.0}
+
+_FILE_ID = re.compile(r"-(\d+)\.parquet$")
+
+
+def _file_id(path):
+    return int(_FILE_ID.search(path).group(1))
+
+
+def _write(frame, path):
+    pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), path + ".tmp")
+    os.replace(path + ".tmp", path)
+
+
+def signed_scores(results, method="vader"):
+    """
+    VADER compound scores are already signed; FinBERT returns a confidence for
+    its label, mapped to +score / -score / 0.
+    """
+    if method == "vader":
+        return np.array([r["score"] for r in results], dtype=np.float64)
+    return np.array([r["score"] * LABEL_SIGN.get(r["label"], 0.0) for r in results], dtype=np.float64)
+
+
+def bucket_scores(tickers, published_at, scores, bar=DEFAULT_BAR):
+    """
+    Returns:
+        DataFrame (Ticker, bar, sentiment_sum, sentiment_count), one row per ticker and bar
+    """
+    frame = pd.DataFrame({
+        "Ticker": tickers,
+        "bar": pd.to_datetime(published_at).dt.ceil(bar),
+        "sentiment_sum": np.asarray(scores, dtype=np.float64),
+    }).dropna(subset=["Ticker"])
+    return (frame.groupby(["Ticker", "bar"], sort=True)["sentiment_sum"]
+            .agg(["sum", "count"])
+            .rename(columns={"sum": "sentiment_sum", "count": "sentiment_count"})
+            .reset_index())
+
+
+def decayed_sums(times, values, half_life):
+    """
+    x_k = x_{k-1} * 2**(-(t_k - t_{k-1}) / half_life) + v_k, vectorized as a rebased
+    cumulative sum (one numpy pass per MAX_EXP2 half-lives of history).
+    Parameters:
+        times: sorted datetime64 array; half_life: Timedelta
+    """
+    t = (np.asarray(times, dtype="datetime64[ns]").astype(np.int64) / pd.Timedelta(half_life).value)
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty_like(values)
+    carry, t_carry, start = 0.0, t[0] if len(t) else 0.0, 0
+    while start < len(t):
+        end = int(np.searchsorted(t, t[start] + MAX_EXP2, side="right"))
+        seg = t[start:end] - t[start]
+        weights = np.exp2(seg)
+        out[start:end] = (np.cumsum(values[start:end] * weights) + carry * np.exp2(t_carry - t[start])) / weights
+        carry, t_carry, start = out[end - 1], t[end - 1], end
+    return out
+
+
+def as_of_features(bars, timestamps, half_life=DEFAULT_HALF_LIFE):
+    """
+    Sentiment features at each price timestamp using only bars labeled at or before it.
+    Parameters:
+        bars: DataFrame indexed by bar label with sentiment_sum / sentiment_count
+        timestamps: sorted price timestamps
+    Returns:
+        DataFrame of SENTIMENT_COLUMNS aligned with timestamps
+    """
+    ts = np.asarray(timestamps, dtype="datetime64[ns]")
+    labels = bars.index.to_numpy(dtype="datetime64[ns]")
+    sums = bars["sentiment_sum"].to_numpy(dtype=np.float64)
+    counts = bars["sentiment_count"].to_numpy(dtype=np.float64)
+
+    pos = np.searchsorted(labels, ts, side="right")  # bars visible at each timestamp
+    # the first price bar looks back one typical bar spacing
+    first_lookback = np.median(np.diff(ts)) if len(ts) > 1 else np.timedelta64(1, "D")
+    prev = np.concatenate([np.searchsorted(labels, ts[:1] - first_lookback, side="right"), pos[:-1]])
+    cum_sum = np.concatenate([[0.0], np.cumsum(sums)])
+    cum_count = np.concatenate([[0.0], np.cumsum(counts)])
+    count = cum_count[pos] - cum_count[prev]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = np.where(count > 0, (cum_sum[pos] - cum_sum[prev]) / count, np.nan)
+
+    decayed = np.zeros(len(ts))
+    if len(labels):
+        state = decayed_sums(labels, sums, half_life)
+        seen = pos > 0
+        last = pos[seen] - 1
+        elapsed = (ts[seen] - labels[last]) / pd.Timedelta(half_life).to_timedelta64()
+        decayed[seen] = state[last] * np.exp2(-elapsed)
+    return pd.DataFrame({"sentiment_count": count, "sentiment_mean": mean, "sentiment_decayed": decayed})
+
+
+class SentimentFeatureStore:
+    def __init__(self, root=FEATURES_DIR, method="vader", bar=DEFAULT_BAR, half_life=DEFAULT_HALF_LIFE):
+        self.method = method
+        self.bar = bar
+        self.half_life = half_life
+        self.root = os.path.join(root, method)
+        self.consumer = f"features-{method}"
+        self._lock = threading.Lock()
+        self._bars = {}
+        os.makedirs(self.root, exist_ok=True)
+        meta_path = os.path.join(self.root, "_meta.json")
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored = json.load(f)["bar"]
+            if pd.Timedelta(stored) != pd.Timedelta(bar):
+                raise ValueError(f"{self.root} holds {stored} bars; use bar='{stored}' or another root")
+        else:
+            with open(meta_path, "w") as f:
+                json.dump({"method": method, "bar": bar}, f)
+
+    def _ticker_dir(self, ticker):
+        return os.path.join(self.root, f"Ticker={ticker}")
+
+    def _files(self, ticker, prefix="part"):
+        return sorted(glob.glob(os.path.join(self._ticker_dir(ticker), f"{prefix}-*.parquet")))
+
+    def _live_files(self, ticker):
+        """Newest compacted base plus the parts appended after it."""
+        bases = self._files(ticker, "base")
+        base_id = _file_id(bases[-1]) if bases else 0
+        return bases[-1:] + [p for p in self._files(ticker) if _file_id(p) > base_id]
+
+    def tickers(self):
+        return sorted(d.split("=", 1)[1] for d in os.listdir(self.root) if d.startswith("Ticker="))
+
+    # --- writes ---
+    def _drop_uncommitted(self, committed_id):
+        """Parts written after the last committed cursor (an interrupted update) would double count."""
+        for ticker in self.tickers():
+            for path in self._files(ticker):
+                if _file_id(path) > committed_id:
+                    os.remove(path)
+
+    def ingest(self, buckets, last_id):
+        """
+        Append bucketed scores (bucket_scores output) as part-<last_id> per ticker.
+        Returns:
+            list of tickers written
+        """
+        written = []
+        with self._lock:
+            for ticker, group in buckets.groupby("Ticker", sort=False):
+                os.makedirs(self._ticker_dir(ticker), exist_ok=True)
+                _write(group.drop(columns="Ticker"), os.path.join(self._ticker_dir(ticker), f"part-{last_id:012d}.parquet"))
+                written.append(ticker)
+        return written
+
+    def compact(self, ticker):
+        """
+        Merge a ticker's live files into base-<newest id>. Only call after the cursor
+        covering those parts is committed; older files are removed once the base is in place.
+        """
+        with self._lock:
+            files = self._live_files(ticker)
+            if len(files) < 2:
+                return
+            base = os.path.join(self._ticker_dir(ticker), f"base-{_file_id(files[-1]):012d}.parquet")
+            _write(self._read(files).reset_index(), base)
+            for path in self._files(ticker) + self._files(ticker, "base"):
+                if _file_id(path) <= _file_id(base) and path != base:
+                    os.remove(path)
+
+    @instrument()
+    def update(self, article_store=None, limit=None):
+        """
+        Score and aggregate the articles added since the last update.
+        Returns:
+            dict: articles scored and tickers updated
+        """
+        from article_store import get_article_store
+        from sentiment_model import score_new_articles
+
+        article_store = article_store or get_article_store()
+        self._drop_uncommitted(article_store.cursor(self.consumer))
+        scored = score_new_articles(article_store, self.method, self.consumer, commit=False, limit=limit)
+        if not scored:
+            return {"scored": 0, "tickers": []}
+        articles, results = zip(*scored)
+        buckets = bucket_scores([a["ticker"] for a in articles],
+                                pd.Series([a["published_at"] for a in articles]),
+                                signed_scores(results, self.method), self.bar)
+        tickers = self.ingest(buckets, articles[-1]["id"])
+        # cursor moves only after the parts are on disk: a crash re-scores instead of losing articles
+        article_store.commit_cursor(self.consumer, articles[-1]["id"])
+        for ticker in tickers:
+            if len(self._live_files(ticker)) > COMPACT_AFTER:
+                self.compact(ticker)
+        return {"scored": len(articles), "tickers": tickers}
+
+    # --- reads ---
+    @staticmethod
+    def _read(files):
+        if not files:
+            return pd.DataFrame({"sentiment_sum": [], "sentiment_count": []},
+                                index=pd.DatetimeIndex([], name="bar"))
+        frame = pd.concat([pq.read_table(path).to_pandas() for path in files], ignore_index=True)
+        # late articles land in old bars, so the same bar can appear in several files
+        return frame.groupby("bar", sort=True)[["sentiment_sum", "sentiment_count"]].sum()
+
+    def bars(self, ticker):
+        """Per-bar sentiment_sum / sentiment_count for one ticker, indexed by bar label (right edge)."""
+        files = self._live_files(ticker)
+        key = tuple(files)
+        cached = self._bars.get(ticker)
+        if cached is None or cached[0] != key:
+            cached = (key, self._read(files))
+            self._bars[ticker] = cached
+        return cached[1]
+
+    def features(self, ticker, timestamps, half_life=None):
+        return as_of_features(self.bars(ticker), timestamps, half_life or self.half_life)
+
+
+_STORES = {}
+
+
+def get_sentiment_store(method="vader"):
+    if method not in _STORES:
+        _STORES[method] = SentimentFeatureStore(method=method)
+    return _STORES[method]
+
+
+@instrument()
+def join_sentiment(df, ticker, store=None, half_life=None, fill=True):
+    """
+    Add SENTIMENT_COLUMNS to a Date-indexed price frame (as-of, no look-ahead).
+    Parameters:
+        fill: 0 for bars without news (models need complete regressors); False keeps NaN means
+    Returns:
+        copy of df with the sentiment columns
+    """
+    store = store or get_sentiment_store()
+    order = np.argsort(df.index.to_numpy(), kind="stable")
+    features = store.features(ticker, df.index.to_numpy()[order], half_life)
+    out = df.copy()
+    for col in SENTIMENT_COLUMNS:
+        values = np.empty(len(df))
+        values[order] = features[col].to_numpy()
+        out[col] = values
+    if fill:
+        out[SENTIMENT_COLUMNS] = out[SENTIMENT_COLUMNS].fillna(0.0)
+    return out
+
+
+# === Benchmark ===
+def _synthetic_scores(n, tickers, start, end, rng):
+    times = pd.Series(pd.to_datetime(rng.integers(start.value, end.value, size=n)))
+    return rng.choice(tickers, size=n), times, rng.uniform(-1, 1, size=n)
+
+
+def benchmark(history=1_000_000, new=1_000, n_tickers=50, bar=DEFAULT_BAR, seed=0):
+    """Cost of one update (new articles) vs re-aggregating the full history, plus the as-of join."""
+    import shutil
+    import tempfile
+    rng = np.random.default_rng(seed)
+    tickers = np.array([f"T{i:03d}" for i in range(n_tickers)])
+    start, end = pd.Timestamp("2015-01-01"), pd.Timestamp("2025-01-01")
+    root = tempfile.mkdtemp(prefix="sentiment_bench_")
+    try:
+        store = SentimentFeatureStore(root, bar=bar)
+        hist = _synthetic_scores(history, tickers, start, end, rng)
+        for i, chunk in enumerate(np.array_split(np.arange(history), 20)):
+            store.ingest(bucket_scores(hist[0][chunk], hist[1].iloc[chunk], hist[2][chunk], bar), i + 1)
+        fresh = _synthetic_scores(new, tickers, end - pd.Timedelta("1D"), end, rng)
+
+        t0 = time.perf_counter()
+        store.ingest(bucket_scores(*fresh, bar), 10_000)
+        incremental = time.perf_counter() - t0
+
+        # what a non-incremental rebuild costs: re-aggregate all history and rewrite every ticker
+        rebuild = SentimentFeatureStore(os.path.join(root, "rebuild"), bar=bar)
+        t0 = time.perf_counter()
+        rebuild.ingest(bucket_scores(np.concatenate([hist[0], fresh[0]]),
+                                     pd.concat([hist[1], fresh[1]], ignore_index=True),
+                                     np.concatenate([hist[2], fresh[2]]), bar), 10_000)
+        full = time.perf_counter() - t0
+
+        prices = pd.DataFrame({"Close": 1.0}, index=pd.bdate_range(start, end, name="Date") + pd.Timedelta("16h"))
+        store.bars(tickers[0])
+        t0 = time.perf_counter()
+        joined = join_sentiment(prices, tickers[0], store)
+        join = time.perf_counter() - t0
+        print(f"history {history:,} articles, {new:,} new, {n_tickers} tickers, bar {bar}")
+        print(f"  incremental update  {incremental * 1e3:9.1f} ms")
+        print(f"  full rebuild        {full * 1e3:9.1f} ms  ({full / incremental:.0f}x)")
+        print(f"  as-of join          {join * 1e3:9.1f} ms  ({len(joined):,} price bars, "
+              f"{len(store.bars(tickers[0])):,} news bars)")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sentiment feature store.")
+    parser.add_argument("command", choices=["update", "show", "bench"])
+    parser.add_argument("--method", default="vader", choices=["vader", "finbert"])
+    parser.add_argument("--ticker", default="GOOG")
+    parser.add_argument("--csv", default=None, help="price CSV to join (default: bundled GOOG data)")
+    parser.add_argument("--history", type=int, default=1_000_000)
+    parser.add_argument("--new", type=int, default=1_000)
+    args = parser.parse_args()
+
+    if args.command == "update":
+        print("✅ Updated:", get_sentiment_store(args.method).update())
+    elif args.command == "show":
+        from data_loader import load_data
+        joined = join_sentiment(load_data(args.csv), args.ticker, get_sentiment_store(args.method))
+        print(joined[SENTIMENT_COLUMNS][joined["sentiment_count"] > 0].tail(20).to_string())
+    else:
+        benchmark(args.history, args.new)
@@ -0,0 +1,23 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def make_prices(n=500, level=100.0, volume=1e6, seed=0):
+    """Random-walk Close and uniform Volume on business days."""
+    rng = np.random.default_rng(seed)
+    close = level * np.exp(np.cumsum(rng.standard_normal(n) * 0.01))
+    return pd.DataFrame({
+        'Close': close,
+        'Volume': volume * rng.uniform(0.5, 1.5, n),
+    }, index=pd.date_range("2020-01-01", periods=n, freq="B", name="Date"))
+
+
+@pytest.fixture
+def prices():
+    return make_prices
@@ -0,0 +1,21 @@
+import numpy as np
+
+from anomaly_ensemble import detect_anomalies_ensemble
+from model_registry import ModelRegistry
+from utils import ISO_PARAMS, detect_anomalies_zscore
+
+
+def test_ensemble_isolation_vote_uses_a_model_fitted_on_this_data(tmp_path, prices):
+    registry = ModelRegistry(str(tmp_path))
+    detect_anomalies_ensemble(prices(seed=0), ("zscore", "isolation"), registry=registry)
+    other, _ = detect_anomalies_ensemble(prices(level=1_000.0, volume=1e8, seed=1), ("zscore", "isolation"),
+                                         registry=registry)
+    assert other['anomaly_iso'].mean() <= 3 * ISO_PARAMS["contamination"]
+
+
+def test_ensemble_zscore_matches_single_detector(tmp_path, prices):
+    df = prices(seed=2)
+    ensemble, _ = detect_anomalies_ensemble(df.copy(), ("zscore",), registry=ModelRegistry(str(tmp_path)))
+    single = detect_anomalies_zscore(df.copy())
+    np.testing.assert_array_equal(ensemble['z_score'].to_numpy(), single['z_score'].to_numpy())
+    np.testing.assert_array_equal(ensemble['anomaly_zscore'].to_numpy(), single['anomaly_zscore'].to_numpy())
@@ -0,0 +1,27 @@
+from anomaly_stream import StreamingAnomalyService, make_bar
+from model_registry import ModelRegistry
+
+
+def flag_rate(service, df, ticker="GOOG"):
+    events = []
+    for start in range(0, len(df), 25):
+        chunk = df.iloc[start:start + 25]
+        events += service.process([make_bar(ticker, ts, c, c, c, c, v)
+                                   for ts, c, v in zip(chunk.index, chunk['Close'], chunk['Volume'])])
+    return len(events) / len(df)
+
+
+def test_streaming_isolation_forest_is_refit_when_its_flags_drift(tmp_path, prices):
+    history, shifted = prices(seed=0), prices(n=400, level=1_000.0, volume=1e8, seed=1)
+    shifted.index = shifted.index + (history.index[-1] - shifted.index[0]) + shifted.index.freq
+
+    frozen = StreamingAnomalyService(detectors=("isolation",), registry=ModelRegistry(str(tmp_path)),
+                                     iso_check_every=10_000)
+    frozen.preload("GOOG", history)
+    refit = StreamingAnomalyService(detectors=("isolation",), registry=ModelRegistry(str(tmp_path)))
+    refit.preload("GOOG", history)
+
+    assert flag_rate(frozen, shifted) > 0.9
+    flag_rate(refit, shifted.iloc[:300])
+    assert refit.iso_refits >= 1
+    assert flag_rate(refit, shifted.iloc[300:]) < 0.1
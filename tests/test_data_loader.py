@@ -0,0 +1,20 @@
+import pandas as pd
+import pytest
+
+from data_loader import load_data
+
+
+@pytest.fixture
+def csv_path(tmp_path):
+    dates = pd.date_range("2020-01-01 16:00", periods=10, freq="D")
+    path = tmp_path / "prices.csv"
+    pd.DataFrame({'Date': dates, 'Close': range(10), 'Volume': 1.0}).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_end_date_includes_that_days_bar(csv_path, tmp_path, monkeypatch, use_cache):
+    monkeypatch.chdir(tmp_path)  # Parquet cache lands under ./cache
+    df = load_data(csv_path, start="2020-01-02", end="2020-01-05", use_cache=use_cache)
+    assert df.index.max() == pd.Timestamp("2020-01-05 16:00")
+    assert len(load_data(csv_path, end="2020-01-05 12:00", use_cache=use_cache)) == 4
@@ -0,0 +1,140 @@
+import os
+import time
+import threading
+
+import pytest
+
+import instrumentation
+from instrumentation import instrument
+from job_manager import JobManager, DONE, FAILED, RUNNING
+
+
+@instrument("test.square")
+def square(x):
+    return x * x
+
+
+@instrument("test.boom")
+def boom():
+    raise ValueError("boom")
+
+
+def die():
+    os._exit(1)
+
+
+def wait_for(release, progress=None):
+    if progress:
+        progress(0.5, "half way")
+    release.wait(10)
+    return "released"
+
+
+@pytest.fixture
+def timings():
+    instrumentation.reset()
+    instrumentation.enable()
+    yield
+    instrumentation.disable()
+    instrumentation.reset()
+
+
+def test_process_job_stages_reach_the_parent(timings):
+    manager = JobManager(max_processes=1)
+    try:
+        ok = manager.submit(square, 7, kind="square", executor="process")
+        failed = manager.submit(boom, kind="boom", executor="process")
+        assert manager.result(ok, timeout=60) == 49
+        with pytest.raises(RuntimeError):
+            manager.result(failed, timeout=60)
+        assert manager.status(ok).state == DONE and manager.status(failed).state == FAILED
+    finally:
+        manager.shutdown()
+    stages = instrumentation.snapshot()
+    assert stages["job.square"]["calls"] == 1
+    assert stages["test.square"]["parents"] == ["job.square"]
+    assert stages["test.boom"]["errors"] == 1 and stages["job.boom"]["errors"] == 1
+
+
+def test_process_job_follows_the_parents_mode():
+    instrumentation.reset()
+    manager = JobManager(max_processes=1)
+    try:
+        manager.result(manager.submit(square, 3, kind="square", executor="process"), timeout=60)
+    finally:
+        manager.shutdown()
+    assert instrumentation.snapshot() == {}
+
+
+def test_dead_worker_does_not_leave_a_phantom_job():
+    manager = JobManager(max_processes=1)
+    try:
+        dead = manager.submit(die, kind="die", executor="process")
+        with pytest.raises(RuntimeError, match="BrokenProcessPool"):
+            manager.result(dead, timeout=60)
+        again = manager.submit(die, kind="die", executor="process")
+        assert again != dead
+        with pytest.raises(RuntimeError):
+            manager.result(again, timeout=60)
+        ok = manager.submit(square, 5, kind="square", executor="process")
+        assert manager.result(ok, timeout=60) == 25
+        state = {f"job:{i}": {"id": jid, "key": None} for i, jid in enumerate((dead, again, ok))}
+        assert not manager.session_busy(state)
+    finally:
+        manager.shutdown()
+
+
+def test_unknown_executor_registers_nothing():
+    manager = JobManager()
+    with pytest.raises(ValueError):
+        manager.submit(square, 2, executor="gpu")
+    assert manager.jobs() == []
+
+
+def test_identical_inflight_jobs_are_deduplicated():
+    manager = JobManager()
+    release = threading.Event()
+    try:
+        first = manager.submit(wait_for, release)
+        assert manager.submit(wait_for, release) == first
+        release.set()
+        assert manager.result(first, timeout=10) == "released"
+        assert manager.submit(wait_for, release) != first
+    finally:
+        release.set()
+        manager.shutdown()
+
+
+def test_session_job_reuses_the_id_until_the_inputs_change_or_it_is_pruned():
+    manager = JobManager(keep_finished=0)
+    state = {}
+    try:
+        first = manager.session_job(state, "calc", square, 2)
+        assert manager.result(first, timeout=10) == 4
+        assert manager.session_job(state, "calc", square, 2) == first
+        changed = manager.session_job(state, "calc", square, 3)
+        assert changed != first and manager.result(changed, timeout=10) == 9
+        manager.submit(square, 4)  # prunes the finished jobs
+        assert manager.status(changed) is None
+        assert manager.session_job(state, "calc", square, 3) != changed
+    finally:
+        manager.shutdown()
+
+
+def test_progress_is_reported_while_the_job_runs():
+    manager = JobManager()
+    release = threading.Event()
+    try:
+        job_id = manager.submit(wait_for, release, with_progress=True)
+        deadline = time.time() + 10
+        while manager.status(job_id).progress < 0.5 and time.time() < deadline:
+            time.sleep(0.01)
+        status = manager.status(job_id)
+        assert status.state == RUNNING and status.progress == 0.5 and status.message == "half way"
+        assert manager.session_busy({"job:wait": {"id": job_id, "key": None}})
+        release.set()
+        manager.result(job_id, timeout=10)
+        assert manager.status(job_id).progress == 1.0
+    finally:
+        release.set()
+        manager.shutdown()
@@ -0,0 +1,34 @@
+from model_registry import ModelRegistry, RetrainPolicy
+from utils import ISO_PARAMS, detect_anomalies_isolation, fit_isolation_forest
+
+
+def test_untickered_data_is_not_scored_by_another_datasets_model(tmp_path, prices):
+    registry = ModelRegistry(str(tmp_path))
+    detect_anomalies_isolation(prices(seed=0), registry=registry)
+    other = detect_anomalies_isolation(prices(level=1_000.0, volume=1e8, seed=1), registry=registry)
+    rate = other['anomaly_iso'].mean()
+    assert rate <= 3 * ISO_PARAMS["contamination"]
+
+
+def test_explicit_ticker_reuses_latest_model(tmp_path, prices):
+    registry = ModelRegistry(str(tmp_path))
+    first = registry.get_or_fit("isolation_forest", "GOOG", ISO_PARAMS, prices(seed=0),
+                                fit_isolation_forest, columns=['Close', 'Volume'])
+    again = registry.get_or_fit("isolation_forest", "GOOG", ISO_PARAMS, prices(seed=1),
+                                fit_isolation_forest, columns=['Close', 'Volume'])
+    assert again.path == first.path
+
+
+def test_ticker_model_is_refit_when_new_data_leaves_its_range(tmp_path, prices):
+    registry = ModelRegistry(str(tmp_path))
+    detect_anomalies_isolation(prices(seed=0), ticker="GOOG", registry=registry)
+    shifted = detect_anomalies_isolation(prices(level=1_000.0, volume=1e8, seed=1), ticker="GOOG", registry=registry)
+    assert shifted['anomaly_iso'].mean() <= 3 * ISO_PARAMS["contamination"]
+
+
+def test_flag_drift_policy():
+    meta = {"params": ISO_PARAMS, "stats": {"train_flag_rate": 0.01}}
+    policy = RetrainPolicy()
+    assert not policy.flags_drifted(meta, 0.02)
+    assert policy.flags_drifted(meta, 0.32)
+    assert policy.flags_drifted(meta, 0.0, out_of_range=0.5)
@@ -1,56 +1,168 @@
 import pandas as pd
 import numpy as np
-from sklearn.ensemble import IsolationForest
-from prophet import Prophet
-from sklearn.preprocessing import MinMaxScaler
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import LSTM, RepeatVector, TimeDistributed, Dense
-
-def detect_anomalies_zscore(df):
-    rolling_mean = df['Close'].rolling(window=30).mean()
-    rolling_std = df['Close'].rolling(window=30).std()
-    df['z_score'] = (df['Close'] - rolling_mean) / rolling_std
-    df['anomaly_zscore'] = df['z_score'].apply(lambda x: 1 if abs(x) > 3 else 0)
+from numpy.lib.stride_tricks import sliding_window_view
+import model_loader
+from instrumentation import instrument
+from zscore_engine import rolling_zscore_matrix
+from model_registry import get_registry, DEFAULT_POLICY
+
+@instrument()
+def detect_anomalies_zscore(df, window=30, threshold=3):
+    # Many tickers at once: zscore_engine.rolling_zscore_long / StreamingZScore
+    z_score, flags = rolling_zscore_matrix(df['Close'].to_numpy(dtype='float64'), window, threshold)
+    df['z_score'] = z_score
+    df['anomaly_zscore'] = flags.astype(int)
     return df
 
-def detect_anomalies_isolation(df):
-    features = df[['Close', 'Volume']].copy().fillna(method='bfill')
-    iso = IsolationForest(contamination=0.01, random_state=42)
-    df['anomaly_iso'] = iso.fit_predict(features)
-    df['anomaly_iso'] = df['anomaly_iso'].map({1: 0, -1: 1})
+# === Isolation Forest ===
+ISO_PARAMS = {"contamination": 0.01, "random_state": 42}
+ISO_FEATURES = ['Close', 'Volume']
+
+def iso_params(extra_features=()):
+    """Registry params; extra feature columns (e.g. sentiment_features.SENTIMENT_COLUMNS) get their own models."""
+    return dict(ISO_PARAMS, features=ISO_FEATURES + list(extra_features)) if extra_features else ISO_PARAMS
+
+def _iso_features(df, features=ISO_FEATURES):
+    return df[list(features)].copy().bfill()
+
+def fit_isolation_forest(df, contamination=0.01, random_state=42, features=ISO_FEATURES):
+    from sklearn.ensemble import IsolationForest
+    X = _iso_features(df, features)
+    iso = IsolationForest(contamination=contamination, random_state=random_state)
+    iso.fit(X)
+    stats = {"feature_min": X.min().tolist(), "feature_max": X.max().tolist()}
+    if contamination == "auto":
+        # offset_ is fixed at -0.5, so the training flag rate needs a scoring pass; otherwise
+        # offset_ is the contamination quantile and flags_drifted uses contamination directly
+        stats["train_flag_rate"] = float((iso.predict(X) == -1).mean())
+    return {"model": iso}, stats
+
+def predict_isolation_forest(df, iso):
+    return (iso.predict(_iso_features(df, iso.feature_names_in_)) == -1).astype(int)
+
+def iso_out_of_range(X, meta):
+    """Share of rows with a feature outside the range the Isolation Forest was trained on."""
+    stats = meta.get("stats", {})
+    if "feature_min" not in stats or not len(X):
+        return 0.0
+    values = np.asarray(X, dtype='float64')
+    outside = (values < np.asarray(stats["feature_min"])) | (values > np.asarray(stats["feature_max"]))
+    return float(outside.any(axis=1).mean())
+
+def iso_drifted(X, flags, meta, policy=None):
+    """RetrainPolicy.flags_drifted for Isolation Forest flags on feature frame X."""
+    policy = policy or DEFAULT_POLICY
+    return policy.flags_drifted(meta, float(np.mean(flags)) if len(flags) else 0.0, iso_out_of_range(X, meta))
+
+@instrument()
+def detect_anomalies_isolation(df, ticker=None, registry=None, policy=None, extra_features=()):
+    registry = registry or get_registry()
+    params = iso_params(extra_features)
+    columns = params.get("features", ISO_FEATURES)
+    entry = registry.get_or_fit("isolation_forest", ticker, params, df, fit_isolation_forest,
+                                policy, columns=columns)
+    flags = predict_isolation_forest(df, entry.artifacts["model"])
+    if iso_drifted(_iso_features(df, columns), flags, entry.meta, policy):
+        # Reused model (explicit ticker) no longer fits this data: out of range or mass-flagging
+        entry = registry.fit("isolation_forest", ticker, params, df, fit_isolation_forest, columns)
+        flags = predict_isolation_forest(df, entry.artifacts["model"])
+    df['anomaly_iso'] = flags
     return df
 
-def detect_anomalies_lstm(df):
-    scaler = MinMaxScaler()
-    scaled = scaler.fit_transform(df[['Close']])
-    
-    def create_sequences(data, window=30):
-        return np.array([data[i:i+window] for i in range(len(data) - window)])
-    
-    X = create_sequences(scaled)
-    X = X.reshape((X.shape[0], X.shape[1], 1))
-
-    model = Sequential([
-        LSTM(64, activation='relu', input_shape=(X.shape[1], 1), return_sequences=False),
-        RepeatVector(X.shape[1]),
-        LSTM(64, activation='relu', return_sequences=True),
-        TimeDistributed(Dense(1))
-    ])
+# === LSTM Autoencoder ===
+LSTM_PARAMS = {"window": 30, "units": 64, "epochs": 10, "batch_size": 32}
+
+def create_sequences(data, window=30):
+    """
+    Zero-copy (n_windows, window, 1) strided view over a single column.
+    Window i covers rows i..i+window-1 and is flagged at row i+window.
+    """
+    series = np.ascontiguousarray(np.asarray(data, dtype='float32').reshape(-1))
+    if len(series) <= window:
+        return np.empty((0, window, 1), dtype='float32')
+    return sliding_window_view(series, window)[:-1, :, None]
+
+def window_dataset(series, window=30, batch_size=32, shuffle=True):
+    """
+    tf.data pipeline of (X, X) batches gathered from the 1-D series on the fly,
+    so only one batch of windows is materialized at a time.
+    """
+    tf = model_loader.load("tensorflow")
+    series_t = tf.constant(np.asarray(series, dtype='float32').reshape(-1))
+    n_windows = max(int(series_t.shape[0]) - window, 0)
+    offsets = tf.range(window, dtype=tf.int64)
 
+    def gather(idx):
+        X = tf.expand_dims(tf.gather(series_t, idx[:, None] + offsets), -1)
+        return X, X
+
+    ds = tf.data.Dataset.range(n_windows)
+    if shuffle:
+        ds = ds.shuffle(n_windows, reshuffle_each_iteration=True)
+    return ds.batch(batch_size).map(gather, num_parallel_calls=tf.data.AUTOTUNE).prefetch(tf.data.AUTOTUNE)
+
+def build_lstm_autoencoder(window=30, units=64):
+    keras = model_loader.load("tensorflow").keras
+    layers = keras.layers
+    model = keras.Sequential([
+        layers.LSTM(units, activation='relu', input_shape=(window, 1), return_sequences=False),
+        layers.RepeatVector(window),
+        layers.LSTM(units, activation='relu', return_sequences=True),
+        layers.TimeDistributed(layers.Dense(1))
+    ])
     model.compile(optimizer='adam', loss='mse')
-    model.fit(X, X, epochs=10, batch_size=32, verbose=0)
-    X_pred = model.predict(X)
-    mse = np.mean(np.power(X - X_pred, 2), axis=(1, 2))
+    return model
+
+def lstm_reconstruction_errors(model, X, chunk_size=8192):
+    """Per-window MSE computed chunk by chunk; model may be a Keras model or a plain callable."""
+    predict = model.predict_on_batch if hasattr(model, 'predict_on_batch') else model
+    errors = np.empty(len(X), dtype='float32')
+    for start in range(0, len(X), chunk_size):
+        chunk = np.asarray(X[start:start + chunk_size])
+        X_pred = np.asarray(predict(chunk))
+        errors[start:start + len(chunk)] = np.mean(np.power(chunk - X_pred, 2), axis=(1, 2))
+    return errors
+
+def fit_lstm_autoencoder(df, window=30, units=64, epochs=10, batch_size=32):
+    from sklearn.preprocessing import MinMaxScaler
+    scaler = MinMaxScaler()
+    scaled = scaler.fit_transform(df[['Close']]).astype('float32').ravel()
+
+    model = build_lstm_autoencoder(window, units)
+    model.fit(window_dataset(scaled, window, batch_size), epochs=epochs, verbose=0)
+    errors = lstm_reconstruction_errors(model, create_sequences(scaled, window))
+    stats = {
+        "train_error_mean": float(errors.mean()),
+        "train_error_p95": float(np.percentile(errors, 95)),
+    }
+    return {"model": model, "scaler": scaler}, stats
+
+def score_lstm_autoencoder(df, model, scaler, window=30):
+    X = create_sequences(scaler.transform(df[['Close']]), window)
+    return lstm_reconstruction_errors(model, X)
+
+@instrument()
+def detect_anomalies_lstm(df, ticker=None, registry=None, policy=None):
+    registry = registry or get_registry()
+    policy = policy or DEFAULT_POLICY
+    window = LSTM_PARAMS["window"]
+
+    entry = registry.get_or_fit("lstm_autoencoder", ticker, LSTM_PARAMS, df, fit_lstm_autoencoder, policy)
+    mse = score_lstm_autoencoder(df, entry.artifacts["model"], entry.artifacts["scaler"], window)
+    if policy.has_drifted(entry.meta, mse.mean()):
+        entry = registry.fit("lstm_autoencoder", ticker, LSTM_PARAMS, df, fit_lstm_autoencoder)
+        mse = score_lstm_autoencoder(df, entry.artifacts["model"], entry.artifacts["scaler"], window)
     threshold = np.percentile(mse, 95)
 
     df['anomaly_lstm'] = 0
-    df.iloc[30:, df.columns.get_loc('anomaly_lstm')] = (mse > threshold).astype(int)
+    df.iloc[window:, df.columns.get_loc('anomaly_lstm')] = (mse > threshold).astype(int)
     return df
 
 def forecast_prophet(df):
     prophet_df = df.reset_index().rename(columns={'Date': 'ds', 'Close': 'y'})
-    model = Prophet()
+    model = model_loader.load("prophet").Prophet()
     model.fit(prophet_df)
     future = model.make_future_dataframe(periods=30)
     forecast = model.predict(future)
     return forecast, model.changepoints
+